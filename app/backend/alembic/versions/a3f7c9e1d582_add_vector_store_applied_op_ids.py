@@ -0,0 +1,24 @@
+"""add_vector_store_applied_op_ids
+
+Revision ID: a3f7c9e1d582
+Revises: d8f4b2e6a391
+Create Date: 2026-10-17 21:04:19.532871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f7c9e1d582'
+down_revision = 'd8f4b2e6a391'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('vector_store_sync_states', sa.Column('applied_op_ids', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('vector_store_sync_states', 'applied_op_ids')
@@ -0,0 +1,26 @@
+"""thread_maps_nullable_thread_id
+
+Revision ID: a4d81e6f2c37
+Revises: f3c9a1d7b254
+Create Date: 2026-10-17 16:40:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d81e6f2c37'
+down_revision = 'f3c9a1d7b254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Conversations on the chat completions backend have no OpenAI thread
+    op.alter_column('thread_maps', 'thread_id', existing_type=sa.String(length=255), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM thread_maps WHERE thread_id IS NULL")
+    op.alter_column('thread_maps', 'thread_id', existing_type=sa.String(length=255), nullable=False)
@@ -0,0 +1,49 @@
+"""add_thread_pool_and_conversation_id_seq
+
+Revision ID: a8e5c1f7d420
+Revises: f6b0d3c8e147
+Create Date: 2026-10-17 22:41:09.118604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e5c1f7d420'
+down_revision = 'f6b0d3c8e147'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pooled_threads',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('thread_id', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('thread_id')
+    )
+    op.create_index(op.f('ix_pooled_threads_id'), 'pooled_threads', ['id'], unique=False)
+    op.create_index(op.f('ix_pooled_threads_created_at'), 'pooled_threads', ['created_at'], unique=False)
+
+    # New conversation IDs continue above both the old timestamp-derived IDs
+    # and anything already stored
+    op.execute("CREATE SEQUENCE conversation_id_seq START WITH 1000000000")
+    op.execute(
+        """
+        SELECT setval('conversation_id_seq', GREATEST(
+            1000000000,
+            (SELECT COALESCE(MAX(conversation_id), 0) + 1 FROM thread_maps),
+            (SELECT COALESCE(MAX(conversation_id), 0) + 1 FROM chat_messages)
+        ), false)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE conversation_id_seq")
+    op.drop_index(op.f('ix_pooled_threads_created_at'), table_name='pooled_threads')
+    op.drop_index(op.f('ix_pooled_threads_id'), table_name='pooled_threads')
+    op.drop_table('pooled_threads')
@@ -0,0 +1,50 @@
+"""add_analytics_rollups
+
+Revision ID: b3d7f9a2c514
+Revises: a8e5c1f7d420
+Create Date: 2026-10-17 23:18:44.560217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d7f9a2c514'
+down_revision = 'a8e5c1f7d420'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing history is loaded with: python -m app.backend.rebuild_analytics
+    op.create_table(
+        'student_daily_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('graded_attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('score_sum', sa.Float(), server_default='0', nullable=False),
+        sa.Column('modules_completed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('modules_in_progress', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    op.create_table(
+        'cohort_stats',
+        sa.Column('cohort_id', sa.Integer(), nullable=False),
+        sa.Column('total_students', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('graded_attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('score_sum', sa.Float(), server_default='0', nullable=False),
+        sa.Column('modules_completed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['cohort_id'], ['cohorts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('cohort_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('cohort_stats')
+    op.drop_table('student_daily_stats')
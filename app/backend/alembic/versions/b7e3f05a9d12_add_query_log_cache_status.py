@@ -0,0 +1,24 @@
+"""add_query_log_cache_status
+
+Revision ID: b7e3f05a9d12
+Revises: a4d81e6f2c37
+Create Date: 2026-10-17 18:12:44.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f05a9d12'
+down_revision = 'a4d81e6f2c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('query_logs', sa.Column('cache_status', sa.String(length=10), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('query_logs', 'cache_status')
@@ -0,0 +1,40 @@
+"""add_document_storage_name
+
+Revision ID: c2f6a8d13e95
+Revises: b7e3f05a9d12
+Create Date: 2026-10-17 19:05:31.664920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f6a8d13e95'
+down_revision = 'b7e3f05a9d12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Citations are resolved by exact match on filename or storage_name
+    op.add_column('documents', sa.Column('storage_name', sa.String(length=255), nullable=True))
+
+    documents = sa.table('documents', sa.column('id', sa.Integer), sa.column('storage_path', sa.Text), sa.column('storage_name', sa.String))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(documents.c.id, documents.c.storage_path)).all()
+    for document_id, storage_path in rows:
+        bind.execute(
+            documents.update()
+            .where(documents.c.id == document_id)
+            .values(storage_name=storage_path.replace('\\', '/').rsplit('/', 1)[-1])
+        )
+
+    op.create_index(op.f('ix_documents_storage_name'), 'documents', ['storage_name'], unique=False)
+    op.create_index(op.f('ix_documents_filename'), 'documents', ['filename'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_documents_filename'), table_name='documents')
+    op.drop_index(op.f('ix_documents_storage_name'), table_name='documents')
+    op.drop_column('documents', 'storage_name')
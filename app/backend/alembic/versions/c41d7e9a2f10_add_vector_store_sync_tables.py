@@ -0,0 +1,56 @@
+"""add_vector_store_sync_tables
+
+Revision ID: c41d7e9a2f10
+Revises: b6682b59c3a1
+Create Date: 2026-10-17 09:12:05.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2f10'
+down_revision = 'b6682b59c3a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create vector_store_sync_ops table
+    op.create_table(
+        'vector_store_sync_ops',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_vector_store_sync_ops_id'), 'vector_store_sync_ops', ['id'], unique=False)
+    op.create_index(op.f('ix_vector_store_sync_ops_user_id'), 'vector_store_sync_ops', ['user_id'], unique=False)
+    op.create_index(op.f('ix_vector_store_sync_ops_document_id'), 'vector_store_sync_ops', ['document_id'], unique=False)
+
+    # Create vector_store_sync_states table
+    op.create_table(
+        'vector_store_sync_states',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('vector_store_id', sa.String(length=255), nullable=False),
+        sa.Column('last_op_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_full_sync_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    # Drop tables
+    op.drop_table('vector_store_sync_states')
+
+    op.drop_index(op.f('ix_vector_store_sync_ops_document_id'), table_name='vector_store_sync_ops')
+    op.drop_index(op.f('ix_vector_store_sync_ops_user_id'), table_name='vector_store_sync_ops')
+    op.drop_index(op.f('ix_vector_store_sync_ops_id'), table_name='vector_store_sync_ops')
+    op.drop_table('vector_store_sync_ops')
@@ -0,0 +1,51 @@
+"""add_activity_events
+
+Revision ID: c5e2a8d4f713
+Revises: b3d7f9a2c514
+Create Date: 2026-10-17 02:41:09.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2a8d4f713'
+down_revision = 'b3d7f9a2c514'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing submissions, forum posts and chat turns are loaded with:
+    # python -m app.backend.rebuild_analytics
+    op.create_table(
+        'activity_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_activity_events_id'), 'activity_events', ['id'], unique=False)
+    op.create_index(op.f('ix_activity_events_occurred_at'), 'activity_events', ['occurred_at'], unique=False)
+    op.create_index('ix_activity_events_user_occurred', 'activity_events', ['user_id', 'occurred_at'], unique=False)
+    op.create_table(
+        'user_activity_months',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('active_days', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+    op.create_index('ix_user_activity_months_month', 'user_activity_months', ['month'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_activity_months_month', table_name='user_activity_months')
+    op.drop_table('user_activity_months')
+    op.drop_index('ix_activity_events_user_occurred', table_name='activity_events')
+    op.drop_index(op.f('ix_activity_events_occurred_at'), table_name='activity_events')
+    op.drop_index(op.f('ix_activity_events_id'), table_name='activity_events')
+    op.drop_table('activity_events')
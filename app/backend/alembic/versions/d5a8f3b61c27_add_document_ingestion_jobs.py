@@ -0,0 +1,60 @@
+"""add_document_ingestion_jobs
+
+Revision ID: d5a8f3b61c27
+Revises: c41d7e9a2f10
+Create Date: 2026-10-17 11:40:52.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8f3b61c27'
+down_revision = 'c41d7e9a2f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Add ingestion status to documents
+    op.add_column('documents', sa.Column('ingestion_status', sa.String(length=20), nullable=False, server_default='pending'))
+    op.create_index(op.f('ix_documents_ingestion_status'), 'documents', ['ingestion_status'], unique=False)
+
+    # Create document_ingestion_jobs table
+    op.create_table(
+        'document_ingestion_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_document_ingestion_jobs_id'), 'document_ingestion_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_document_ingestion_jobs_document_id'), 'document_ingestion_jobs', ['document_id'], unique=False)
+    op.create_index(op.f('ix_document_ingestion_jobs_status'), 'document_ingestion_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_document_ingestion_jobs_next_attempt_at'), 'document_ingestion_jobs', ['next_attempt_at'], unique=False)
+
+    # Backfill: documents already uploaded to OpenAI are ready; queue the rest
+    op.execute("UPDATE documents SET ingestion_status = 'ready' WHERE openai_file_id IS NOT NULL")
+    op.execute(
+        "INSERT INTO document_ingestion_jobs (document_id, status, attempts) "
+        "SELECT id, 'pending', 0 FROM documents WHERE openai_file_id IS NULL AND is_deleted = false"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_document_ingestion_jobs_next_attempt_at'), table_name='document_ingestion_jobs')
+    op.drop_index(op.f('ix_document_ingestion_jobs_status'), table_name='document_ingestion_jobs')
+    op.drop_index(op.f('ix_document_ingestion_jobs_document_id'), table_name='document_ingestion_jobs')
+    op.drop_index(op.f('ix_document_ingestion_jobs_id'), table_name='document_ingestion_jobs')
+    op.drop_table('document_ingestion_jobs')
+
+    op.drop_index(op.f('ix_documents_ingestion_status'), table_name='documents')
+    op.drop_column('documents', 'ingestion_status')
@@ -0,0 +1,53 @@
+"""add_analytics_exports
+
+Revision ID: d8f4b2e6a391
+Revises: c5e2a8d4f713
+Create Date: 2026-10-17 04:12:37.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f4b2e6a391'
+down_revision = 'c5e2a8d4f713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_exports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cohort_id', sa.Integer(), nullable=False),
+        sa.Column('requested_by', sa.Integer(), nullable=False),
+        sa.Column('dataset', sa.String(length=20), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('rows_total', sa.Integer(), nullable=True),
+        sa.Column('rows_written', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('claim_token', sa.String(length=32), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=True),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['cohort_id'], ['cohorts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['requested_by'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_exports_id'), 'analytics_exports', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_exports_cohort_id'), 'analytics_exports', ['cohort_id'], unique=False)
+    op.create_index(op.f('ix_analytics_exports_requested_by'), 'analytics_exports', ['requested_by'], unique=False)
+    op.create_index(op.f('ix_analytics_exports_status'), 'analytics_exports', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_analytics_exports_status'), table_name='analytics_exports')
+    op.drop_index(op.f('ix_analytics_exports_requested_by'), table_name='analytics_exports')
+    op.drop_index(op.f('ix_analytics_exports_cohort_id'), table_name='analytics_exports')
+    op.drop_index(op.f('ix_analytics_exports_id'), table_name='analytics_exports')
+    op.drop_table('analytics_exports')
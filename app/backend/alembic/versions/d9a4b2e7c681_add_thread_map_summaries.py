@@ -0,0 +1,44 @@
+"""add_thread_map_summaries
+
+Revision ID: d9a4b2e7c681
+Revises: c2f6a8d13e95
+Create Date: 2026-10-17 20:31:09.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4b2e7c681'
+down_revision = 'c2f6a8d13e95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('thread_maps', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('thread_maps', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Backfill from the stored messages
+    op.execute("""
+        UPDATE thread_maps SET
+            message_count = (
+                SELECT count(*) FROM chat_messages
+                WHERE chat_messages.conversation_id = thread_maps.conversation_id
+                  AND chat_messages.user_id = thread_maps.user_id
+            ),
+            last_message_at = (
+                SELECT max(chat_messages.created_at) FROM chat_messages
+                WHERE chat_messages.conversation_id = thread_maps.conversation_id
+                  AND chat_messages.user_id = thread_maps.user_id
+            )
+    """)
+
+    op.create_index('ix_thread_maps_user_id_last_used_at', 'thread_maps', ['user_id', 'last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_thread_maps_user_id_last_used_at', table_name='thread_maps')
+    op.drop_column('thread_maps', 'last_message_at')
+    op.drop_column('thread_maps', 'message_count')
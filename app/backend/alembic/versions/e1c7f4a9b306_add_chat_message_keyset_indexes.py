@@ -0,0 +1,31 @@
+"""add_chat_message_keyset_indexes
+
+Revision ID: e1c7f4a9b306
+Revises: d9a4b2e7c681
+Create Date: 2026-10-17 21:14:52.903771
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c7f4a9b306'
+down_revision = 'd9a4b2e7c681'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_chat_messages_user_conversation_created_id',
+        'chat_messages',
+        ['user_id', 'conversation_id', 'created_at', 'id'],
+        unique=False,
+    )
+    op.create_index('ix_chat_messages_user_created_id', 'chat_messages', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_user_created_id', table_name='chat_messages')
+    op.drop_index('ix_chat_messages_user_conversation_created_id', table_name='chat_messages')
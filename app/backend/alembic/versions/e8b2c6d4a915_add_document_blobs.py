@@ -0,0 +1,46 @@
+"""add_document_blobs
+
+Revision ID: e8b2c6d4a915
+Revises: d5a8f3b61c27
+Create Date: 2026-10-17 13:05:21.774609
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b2c6d4a915'
+down_revision = 'd5a8f3b61c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create document_blobs table
+    op.create_table(
+        'document_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('storage_path', sa.Text(), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('openai_file_id', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+
+    # Existing documents keep their own files (content_hash stays NULL)
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_documents_content_hash'), 'documents', ['content_hash'], unique=False)
+    op.create_foreign_key(
+        'fk_documents_content_hash_document_blobs',
+        'documents', 'document_blobs',
+        ['content_hash'], ['sha256'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_documents_content_hash_document_blobs', 'documents', type_='foreignkey')
+    op.drop_index(op.f('ix_documents_content_hash'), table_name='documents')
+    op.drop_column('documents', 'content_hash')
+    op.drop_table('document_blobs')
@@ -0,0 +1,36 @@
+"""add_user_context_snapshots
+
+Revision ID: f3c9a1d7b254
+Revises: e8b2c6d4a915
+Create Date: 2026-10-17 14:02:51.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9a1d7b254'
+down_revision = 'e8b2c6d4a915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Snapshots are built lazily on a user's first chat message, so no backfill
+    op.create_table(
+        'user_context_snapshots',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('progress', sa.JSON(), nullable=False),
+        sa.Column('recent_assessments', sa.JSON(), nullable=False),
+        sa.Column('achievements', sa.JSON(), nullable=False),
+        sa.Column('recent_forum_activity', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_context_snapshots')
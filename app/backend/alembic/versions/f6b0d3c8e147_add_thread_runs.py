@@ -0,0 +1,32 @@
+"""add_thread_runs
+
+Revision ID: f6b0d3c8e147
+Revises: e1c7f4a9b306
+Create Date: 2026-10-17 22:02:37.451290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b0d3c8e147'
+down_revision = 'e1c7f4a9b306'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Runs started before this migration are found by the remote-listing fallback
+    op.create_table(
+        'thread_runs',
+        sa.Column('thread_id', sa.String(length=255), nullable=False),
+        sa.Column('run_id', sa.String(length=255), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('thread_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('thread_runs')
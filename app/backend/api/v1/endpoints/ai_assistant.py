@@ -1,21 +1,32 @@
 """AI Learning Assistant endpoints"""
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, func, desc, and_, delete
 from typing import Optional
 import logging
 import json
-from datetime import datetime, timedelta, timezone
 
-from app.backend.core.database import get_db
+from app.backend.core.database import get_db, get_session_factory
 from app.backend.core.security import get_current_user
-from app.backend.models.user import User
+from app.backend.core.openai_utils import openai_resource_cache
+from app.backend.core.pagination import InvalidCursorError, before_cursor, encode_cursor
+from app.backend.api.v1.endpoints.auth import require_role
+from app.backend.models.user import User, UserRole
 from app.backend.models.notification import ChatMessage
 from app.backend.models.thread_map import ThreadMap
 from app.backend.models.query_log import QueryLog
-from app.backend.services.llm_service import send_message, send_message_stream
-from app.backend.core.chat_utils import extract_conversation_title
+from app.backend.services.llm_service import send_message, send_message_stream, next_conversation_id
+from app.backend.services.run_tracker import run_tracker
+from app.backend.services.ingestion_worker import ingestion_worker
+from app.backend.services.context_service import check_context_snapshots, context_snapshot_metrics
+from app.backend.services.context_encoder import context_encoder_metrics
+from app.backend.services.answer_cache import answer_cache_metrics
+from app.backend.services.log_writer import log_writer
+from app.backend.services.run_registry import run_registry
+from app.backend.services.thread_pool import thread_pool
+from app.backend.services.admission import AdmissionRejected, ChatSlot, chat_admission
 from app.backend.schemas.notification import (
     ChatMessageCreate,
     ChatMessageResponse,
@@ -30,9 +41,16 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-def generate_conversation_id() -> int:
-    """Generate a new conversation ID (simple timestamp-based)"""
-    return int(datetime.now().timestamp() * 1000) % (10 ** 9)  # 9-digit ID
+async def _admit_chat(user: User) -> ChatSlot:
+    """Take a chat slot, or refuse with 429 and Retry-After when over the user's rate or capacity"""
+    try:
+        return await chat_admission.acquire(user.id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many chat requests ({e.reason}), please retry shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 
 @router.post("/chat", response_model=ChatMessageResponse, status_code=status.HTTP_201_CREATED)
@@ -41,14 +59,22 @@ async def chat_with_assistant(
     chat_data: ChatMessageCreate,
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
 ):
     """Chat with the AI learning assistant (non-streaming)"""
+    # Return the auth lookup's connection to the pool; the chat pipeline opens
+    # short sessions per phase and holds none while waiting on OpenAI
+    await db.close()
+    # Queue for a slot only after the connection is back in the pool
+    slot = await _admit_chat(current_user)
+    
     try:
         # Generate conversation_id if not provided
         conversation_id = chat_data.conversation_id
         if not conversation_id:
-            conversation_id = generate_conversation_id()
+            async with session_factory() as id_db:
+                conversation_id = await next_conversation_id(id_db)
     
         # Extract context from request
         context = chat_data.context or {}
@@ -58,9 +84,9 @@ async def chat_with_assistant(
         # Get IP address for logging
         ip_address = request.client.host if request.client else None
         
-        # Call LLM service
+        # Call LLM service (stores the chat message when the run completes)
         result = await send_message(
-            db=db,
+            session_factory=session_factory,
             user=current_user,
             message=chat_data.message,
             conversation_id=conversation_id,
@@ -71,35 +97,7 @@ async def chat_with_assistant(
             image_document_ids=chat_data.image_document_ids,
         )
         
-        response_text = result["response"]
-        
-        # Save chat message
-        chat_message = ChatMessage(
-            user_id=current_user.id,
-            message=chat_data.message,
-            response=response_text,
-            context=context,
-            suggested_lessons=None,
-            escalated=False,
-            conversation_id=conversation_id
-        )
-        
-        db.add(chat_message)
-        
-        # Update thread map title if this is the first message
-        thread_map_result = await db.execute(
-            select(ThreadMap)
-            .where(ThreadMap.conversation_id == conversation_id)
-            .where(ThreadMap.user_id == current_user.id)
-        )
-        thread_map = thread_map_result.scalar_one_or_none()
-        if thread_map and not thread_map.title:
-            # Generate title from first message
-            title = extract_conversation_title(chat_data.message)
-            thread_map.title = title
-        
-        await db.commit()
-        await db.refresh(chat_message)
+        chat_message = result["chat_message"]
         
         return ChatMessageResponse(
             id=chat_message.id,
@@ -115,11 +113,12 @@ async def chat_with_assistant(
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
-        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing chat message: {str(e)}"
         )
+    finally:
+        slot.release()
 
 
 @router.post("/chat/stream")
@@ -128,14 +127,22 @@ async def chat_with_assistant_stream(
     chat_data: ChatMessageCreate,
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
 ):
     """Chat with the AI learning assistant (streaming)"""
+    # Return the auth lookup's connection to the pool before streaming starts;
+    # otherwise it stays checked out until the response finishes
+    await db.close()
+    # The slot is held until the stream finishes
+    slot = await _admit_chat(current_user)
+    
     try:
         # Generate conversation_id if not provided
         conversation_id = chat_data.conversation_id
         if not conversation_id:
-            conversation_id = generate_conversation_id()
+            async with session_factory() as id_db:
+                conversation_id = await next_conversation_id(id_db)
         
         # Extract context
         context = chat_data.context or {}
@@ -146,14 +153,13 @@ async def chat_with_assistant_stream(
         ip_address = request.client.host if request.client else None
         
         async def generate():
-            full_response = ""
             try:
                 # Send initial conversation_id
                 yield f"data: {json.dumps({'type': 'conversation_id', 'conversation_id': conversation_id})}\n\n"
                 
-                # Stream response
+                # Stream response (the chat message is stored once streaming completes)
                 async for chunk in send_message_stream(
-                    db=db,
+                    session_factory=session_factory,
                     user=current_user,
                     message=chat_data.message,
                     conversation_id=conversation_id,
@@ -163,41 +169,16 @@ async def chat_with_assistant_stream(
                     context_payload=context,
                     image_document_ids=chat_data.image_document_ids,
                 ):
-                    full_response += chunk
                     yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
                 
-                # Save chat message after streaming completes
-                chat_message = ChatMessage(
-                    user_id=current_user.id,
-                    message=chat_data.message,
-                    response=full_response,
-                    context=context,
-                    suggested_lessons=None,
-                    escalated=False,
-                    conversation_id=conversation_id
-                )
-                db.add(chat_message)
-                
-                # Update thread map title if needed
-                thread_map_result = await db.execute(
-                    select(ThreadMap)
-                    .where(ThreadMap.conversation_id == conversation_id)
-                    .where(ThreadMap.user_id == current_user.id)
-                )
-                thread_map = thread_map_result.scalar_one_or_none()
-                if thread_map and not thread_map.title:
-                    title = extract_conversation_title(chat_data.message)
-                    thread_map.title = title
-                
-                await db.commit()
-                
                 # Send completion
                 yield f"data: {json.dumps({'type': 'done'})}\n\n"
                 
             except Exception as e:
                 logger.error(f"Error in streaming: {str(e)}", exc_info=True)
                 yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                await db.rollback()
+            finally:
+                slot.release()
         
         return StreamingResponse(
             generate(),
@@ -206,10 +187,13 @@ async def chat_with_assistant_stream(
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
                 "X-Conversation-Id": str(conversation_id),
-            }
+            },
+            # Also releases the slot if the client disconnects before the stream starts
+            background=BackgroundTask(slot.release),
         )
         
     except Exception as e:
+        slot.release()
         logger.error(f"Error in stream endpoint: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -226,51 +210,35 @@ async def get_conversations(
     db: AsyncSession = Depends(get_db)
 ):
     """Get list of all conversations for the user"""
-    # Get thread maps (conversations)
+    # One query over ix_thread_maps_user_id_last_used_at; the window count gives the total
     result = await db.execute(
-        select(ThreadMap)
+        select(ThreadMap, func.count().over().label("total"))
         .where(ThreadMap.user_id == current_user.id)
-        .order_by(desc(ThreadMap.last_used_at))
+        .order_by(desc(ThreadMap.last_used_at), desc(ThreadMap.id))
         .limit(limit)
         .offset(offset)
     )
-    thread_maps = result.scalars().all()
+    rows = result.all()
     
-    # Get total count
-    count_result = await db.execute(
-        select(func.count()).where(ThreadMap.user_id == current_user.id)
-    )
-    total = count_result.scalar() or 0
-    
-    # Get message counts and last message times for each conversation
-    conversations = []
-    for thread_map in thread_maps:
-        # Get message count
-        msg_count_result = await db.execute(
-            select(func.count())
-            .where(ChatMessage.conversation_id == thread_map.conversation_id)
-            .where(ChatMessage.user_id == current_user.id)
+    if rows:
+        total = rows[0].total
+    else:
+        # Past the last page: the window count has no row to ride on
+        count_result = await db.execute(
+            select(func.count()).where(ThreadMap.user_id == current_user.id)
         )
-        message_count = msg_count_result.scalar() or 0
-        
-        # Get last message time
-        last_msg_result = await db.execute(
-            select(ChatMessage)
-            .where(ChatMessage.conversation_id == thread_map.conversation_id)
-            .where(ChatMessage.user_id == current_user.id)
-            .order_by(desc(ChatMessage.created_at))
-            .limit(1)
-        )
-        last_message = last_msg_result.scalar_one_or_none()
-        last_message_at = last_message.created_at if last_message else thread_map.created_at
-        
-        conversations.append(ConversationResponse(
+        total = count_result.scalar() or 0
+    
+    conversations = [
+        ConversationResponse(
             conversation_id=thread_map.conversation_id,
             title=thread_map.title,
-            last_message_at=last_message_at,
-            message_count=message_count,
+            last_message_at=thread_map.last_message_at or thread_map.created_at,
+            message_count=thread_map.message_count,
             created_at=thread_map.created_at
-        ))
+        )
+        for thread_map, _ in rows
+    ]
     
     return ConversationListResponse(
         conversations=conversations,
@@ -282,10 +250,18 @@ async def get_conversations(
 @router.get("/ai-assistant/conversations/{conversation_id}", response_model=ConversationDetailResponse)
 async def get_conversation(
     conversation_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get conversation details with all messages"""
+    """
+    Get conversation details with its messages.
+    
+    Without limit or cursor every message is returned. With them, the newest
+    `limit` messages before `cursor` are returned (oldest first) and
+    next_cursor pages further back.
+    """
     # Verify conversation belongs to user
     thread_map_result = await db.execute(
         select(ThreadMap)
@@ -300,17 +276,31 @@ async def get_conversation(
             detail="Conversation not found"
         )
     
-    # Get all messages for this conversation
-    messages_result = await db.execute(
+    query = (
         select(ChatMessage)
-        .where(ChatMessage.conversation_id == conversation_id)
         .where(ChatMessage.user_id == current_user.id)
-        .order_by(ChatMessage.created_at)
+        .where(ChatMessage.conversation_id == conversation_id)
     )
-    messages = messages_result.scalars().all()
-    
-    # Get last message time
-    last_message_at = messages[-1].created_at if messages else thread_map.created_at
+    next_cursor = None
+    if limit is None and cursor is None:
+        # Whole conversation (original behaviour)
+        messages_result = await db.execute(query.order_by(ChatMessage.created_at, ChatMessage.id))
+        messages = messages_result.scalars().all()
+    else:
+        limit = limit or 50
+        if cursor:
+            try:
+                query = query.where(before_cursor(ChatMessage.created_at, ChatMessage.id, cursor))
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        messages_result = await db.execute(
+            query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id)).limit(limit + 1)
+        )
+        messages = messages_result.scalars().all()
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+        messages.reverse()
     
     message_responses = [
         ChatMessageResponse(
@@ -331,9 +321,10 @@ async def get_conversation(
         conversation_id=conversation_id,
         title=thread_map.title,
         created_at=thread_map.created_at,
-        last_message_at=last_message_at,
-        message_count=len(messages),
-        messages=message_responses
+        last_message_at=thread_map.last_message_at or thread_map.created_at,
+        message_count=thread_map.message_count,
+        messages=message_responses,
+        next_cursor=next_cursor
     )
 
 
@@ -418,30 +409,11 @@ async def update_conversation_title(
     await db.commit()
     await db.refresh(thread_map)
     
-    # Get message count for response
-    msg_count_result = await db.execute(
-        select(func.count())
-        .where(ChatMessage.conversation_id == conversation_id)
-        .where(ChatMessage.user_id == current_user.id)
-    )
-    message_count = msg_count_result.scalar() or 0
-    
-    # Get last message time
-    last_msg_result = await db.execute(
-        select(ChatMessage)
-        .where(ChatMessage.conversation_id == conversation_id)
-        .where(ChatMessage.user_id == current_user.id)
-        .order_by(desc(ChatMessage.created_at))
-        .limit(1)
-    )
-    last_message = last_msg_result.scalar_one_or_none()
-    last_message_at = last_message.created_at if last_message else thread_map.created_at
-    
     return ConversationResponse(
         conversation_id=thread_map.conversation_id,
         title=thread_map.title,
-        last_message_at=last_message_at,
-        message_count=message_count,
+        last_message_at=thread_map.last_message_at or thread_map.created_at,
+        message_count=thread_map.message_count,
         created_at=thread_map.created_at
     )
 
@@ -449,28 +421,62 @@ async def update_conversation_title(
 @router.get("/chat/history", response_model=ChatHistoryResponse)
 @router.get("/ai-assistant/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     conversation_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get user's chat history, optionally filtered by conversation"""
+    """
+    Get user's chat history (newest first), optionally filtered by conversation.
+    
+    Pass next_cursor from the previous page as `cursor` to page with an index
+    seek; `offset` is still accepted for older clients. `total` is only
+    computed for the first page and in offset mode.
+    """
     query = select(ChatMessage).where(ChatMessage.user_id == current_user.id)
     
     if conversation_id:
         query = query.where(ChatMessage.conversation_id == conversation_id)
     
+    if cursor:
+        try:
+            query = query.where(before_cursor(ChatMessage.created_at, ChatMessage.id, cursor))
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    elif offset:
+        query = query.offset(offset)
+    
     result = await db.execute(
-        query.order_by(desc(ChatMessage.created_at)).limit(limit)
+        query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id)).limit(limit + 1)
     )
     messages = result.scalars().all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
     
-    # Get total count
-    count_query = select(func.count()).where(ChatMessage.user_id == current_user.id)
-    if conversation_id:
-        count_query = count_query.where(ChatMessage.conversation_id == conversation_id)
-    count_result = await db.execute(count_query)
-    total = count_result.scalar() or 0
+    # Cursor pages skip the count; clients keep the total from the first page
+    total = None
+    if not cursor:
+        thread_map = None
+        if conversation_id:
+            thread_map_result = await db.execute(
+                select(ThreadMap).where(
+                    ThreadMap.conversation_id == conversation_id,
+                    ThreadMap.user_id == current_user.id
+                )
+            )
+            thread_map = thread_map_result.scalar_one_or_none()
+        if thread_map:
+            total = thread_map.message_count
+        else:
+            count_query = select(func.count()).where(ChatMessage.user_id == current_user.id)
+            if conversation_id:
+                count_query = count_query.where(ChatMessage.conversation_id == conversation_id)
+            count_result = await db.execute(count_query)
+            total = count_result.scalar() or 0
     
     message_responses = [
         ChatMessageResponse(
@@ -489,5 +495,36 @@ async def get_chat_history(
     
     return ChatHistoryResponse(
         messages=message_responses,
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
+
+
+@router.get("/ai-assistant/metrics")
+async def get_ai_metrics(
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+):
+    """Get AI pipeline metrics for capacity planning (admin only)"""
+    return {
+        "run_tracker": run_tracker.metrics(),
+        "openai_resource_cache": openai_resource_cache.stats(),
+        "ingestion_worker": ingestion_worker.metrics(),
+        "context_snapshots": context_snapshot_metrics(),
+        "context_encoder": context_encoder_metrics(),
+        "answer_cache": answer_cache_metrics(),
+        "log_writer": log_writer.metrics(),
+        "run_registry": run_registry.metrics(),
+        "thread_pool": thread_pool.metrics(),
+        "chat_admission": chat_admission.metrics(),
+    }
+
+
+@router.post("/ai-assistant/context-snapshots/check")
+async def check_ai_context_snapshots(
+    user_id: Optional[int] = None,
+    repair: bool = False,
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    db: AsyncSession = Depends(get_db),
+):
+    """Diff stored learning-context snapshots against live data, optionally repairing them (admin only)"""
+    return await check_context_snapshots(db, user_ids=[user_id] if user_id is not None else None, repair=repair)
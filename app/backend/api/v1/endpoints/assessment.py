@@ -21,6 +21,10 @@ from app.backend.schemas.assessment import (
     AssessmentListResponse,
 )
 from app.backend.services.achievement_service import check_achievements
+from app.backend.services.context_service import refresh_context_snapshot
+from app.backend.services.analytics_rollups import progress_deltas, record_student_activity
+from app.backend.services.activity import record_activity
+from app.backend.models.activity import ActivityKind
 
 router = APIRouter()
 
@@ -137,6 +141,15 @@ async def submit_assessment_answer(
     )
     
     db.add(quiz_attempt)
+    graded = points_earned is not None and assessment.points > 0
+    await record_student_activity(
+        db,
+        current_user.id,
+        attempts=1,
+        graded_attempts=int(graded),
+        score_sum=points_earned * 100.0 / assessment.points if graded else 0.0,
+    )
+    await record_activity(db, current_user.id, ActivityKind.SUBMISSION)
     await db.commit()
     await db.refresh(quiz_attempt)
     
@@ -153,6 +166,7 @@ async def submit_assessment_answer(
         event_type="assessment_submitted",
         event_data=event_data
     )
+    await refresh_context_snapshot(db, current_user.id, ("recent_assessments",))
     
     # Prepare response
     response = AssessmentSubmitResponse(
@@ -327,6 +341,13 @@ async def get_module_results(
         )
     )
     user_progress = result.scalar_one_or_none()
+    previous_status = user_progress.status if user_progress else None
+
+    async def _record_progress() -> None:
+        completed, in_progress = progress_deltas(previous_status, progress_status)
+        await record_student_activity(
+            db, current_user.id, modules_completed=completed, modules_in_progress=in_progress
+        )
 
     completion_percentage = 100.0 if progress_status == ProgressStatus.COMPLETED else (
         (attempted / total_questions) * 100 if total_questions > 0 else 0.0
@@ -339,6 +360,7 @@ async def get_module_results(
             user_progress.started_at = None
             user_progress.completed_at = None
             user_progress.last_accessed_at = datetime.now()
+            await _record_progress()
             await db.commit()
     elif progress_status == ProgressStatus.IN_PROGRESS:
         if user_progress:
@@ -359,6 +381,7 @@ async def get_module_results(
                 last_accessed_at=datetime.now()
             )
             db.add(user_progress)
+        await _record_progress()
         await db.commit()
     else:  # progress_status == COMPLETED
         was_completed = user_progress.status == ProgressStatus.COMPLETED if user_progress else False
@@ -380,6 +403,7 @@ async def get_module_results(
                 last_accessed_at=datetime.now()
             )
             db.add(user_progress)
+        await _record_progress()
         await db.commit()
         
         # Check for achievements if module was just completed
@@ -391,6 +415,9 @@ async def get_module_results(
                 event_data={"module_id": module_id, "module_title": module.title}
             )
     
+    if user_progress is not None:
+        await refresh_context_snapshot(db, current_user.id, ("progress",))
+    
     return ModuleResultsResponse(
         module_id=module_id,
         module_title=module.title,
@@ -12,6 +12,7 @@ from app.backend.core.database import get_db
 from app.backend.core.security import get_current_user
 from app.backend.models.user import User, UserRole
 from app.backend.models.cohort import Cohort, CohortMember, CohortRole
+from app.backend.services.analytics_rollups import invalidate_cohort_stats
 from app.backend.schemas.cohort import (
     CohortCreate,
     CohortUpdate,
@@ -804,6 +805,7 @@ async def add_cohort_member(
     )
     
     db.add(new_member)
+    await invalidate_cohort_stats(db, cohort_id)
     await db.commit()
     await db.refresh(new_member)
     
@@ -903,6 +905,7 @@ async def join_cohort(
     
     try:
         db.add(new_member)
+        await invalidate_cohort_stats(db, cohort_id)
         await db.commit()
         await db.refresh(new_member)
     except Exception as e:
@@ -984,6 +987,7 @@ async def leave_cohort(
     # Remove member
     try:
         await db.execute(delete(CohortMember).where(CohortMember.id == member.id))
+        await invalidate_cohort_stats(db, cohort_id)
         await db.commit()
     except Exception as e:
         await db.rollback()
@@ -1052,6 +1056,7 @@ async def remove_cohort_member(
     
     try:
         await db.execute(delete(CohortMember).where(CohortMember.id == member.id))
+        await invalidate_cohort_stats(db, cohort_id)
         await db.commit()
     except Exception as e:
         await db.rollback()
@@ -5,14 +5,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 import logging
 from pathlib import Path
-import uuid
 
 from app.backend.core.config import settings
 from app.backend.core.database import get_db
 from app.backend.core.security import get_current_user
-from app.backend.models.user import User
+from app.backend.core.openai_utils import record_vector_store_change, reconcile_vector_store
+from app.backend.core.chat_utils import invalidate_citation_titles
+from app.backend.api.v1.endpoints.auth import require_role
+from app.backend.models.user import User, UserRole
 from app.backend.models.document import Document
+from app.backend.models.ingestion_job import DocumentIngestionJob
+from app.backend.services.ingestion_worker import enqueue_ingestion, ingestion_worker
+from app.backend.services.document_storage import UploadTooLargeError, release_blob, store_upload
 from app.backend.schemas.document import (
+    DocumentIngestionResponse,
     DocumentListResponse,
     DocumentResponse,
     DocumentUploadResponse,
@@ -47,6 +53,7 @@ def build_document_response(document: Document, owner: str | None = None) -> Doc
         owner=owner_value,
         type=extension,
         tags=None,
+        ingestion_status=document.ingestion_status,
     )
 
 
@@ -87,7 +94,7 @@ async def upload_document(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload a new document and persist metadata"""
+    """Upload a new document and queue it for background ingestion"""
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is required.")
 
@@ -98,26 +105,23 @@ async def upload_document(
             detail=f"Unsupported file type '{extension}'. Allowed types: {', '.join(sorted(ALLOWED_TYPES))}",
         )
 
-    content = await file.read()
+    # Identical content shares one blob on disk (and one OpenAI file)
     max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
-    if len(content) > max_bytes:
+    try:
+        blob = await store_upload(db, file, max_bytes)
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File exceeds {settings.MAX_UPLOAD_SIZE_MB}MB limit.",
         )
 
-    storage_dir = Path(settings.DOCUMENT_STORAGE_PATH)
-    storage_dir.mkdir(parents=True, exist_ok=True)
-
-    safe_name = f"{uuid.uuid4().hex}{Path(file.filename).suffix.lower()}"
-    storage_path = storage_dir / safe_name
-    storage_path.write_bytes(content)
-
     document = Document(
         title=Path(file.filename).stem,
         filename=file.filename,
-        storage_path=str(storage_path.resolve()),
-        file_size=len(content),
+        storage_path=blob.storage_path,
+        content_hash=blob.sha256,
+        openai_file_id=blob.openai_file_id,
+        file_size=blob.file_size,
         mime_type=file.content_type,
         category="user-upload",
         module_id=module_id,
@@ -126,8 +130,13 @@ async def upload_document(
     )
 
     db.add(document)
+    await db.flush()
+    # The ingestion worker uploads the file; vector store sync attaches it once ready
+    enqueue_ingestion(db, document)
     await db.commit()
     await db.refresh(document)
+    await invalidate_citation_titles(document.uploader_id, document.filename, document.storage_name)
+    ingestion_worker.notify()
     logger.info("Stored document %s uploaded by user %s", document.id, current_user.id)
 
     owner = current_user.username or current_user.email
@@ -164,3 +173,97 @@ async def download_document(
         media_type=document.mime_type or "application/octet-stream",
         filename=document.filename or file_path.name,
     )
+
+
+@router.get("/documents/{document_id}/ingestion", response_model=DocumentIngestionResponse)
+async def get_document_ingestion(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get the background ingestion status of a document"""
+    document = await db.get(Document, document_id)
+    if not document or document.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found.")
+
+    if document.uploader_id not in (None, current_user.id) and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You cannot access this document.")
+
+    result = await db.execute(
+        select(DocumentIngestionJob)
+        .where(DocumentIngestionJob.document_id == document_id)
+        .order_by(DocumentIngestionJob.id.desc())
+        .limit(1)
+    )
+    job = result.scalar_one_or_none()
+
+    return DocumentIngestionResponse(
+        document_id=document.id,
+        status=document.ingestion_status,
+        attempts=job.attempts if job else 0,
+        last_error=job.last_error if job else None,
+        next_attempt_at=job.next_attempt_at if job and job.status == "pending" else None,
+        updated_at=job.updated_at if job else document.updated_at,
+    )
+
+
+@router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Soft-delete a document and queue its removal from vector stores"""
+    result = await db.execute(
+        select(Document)
+        .where(Document.id == document_id)
+        .where(Document.is_deleted == False)  # noqa: E712
+    )
+    document = result.scalar_one_or_none()
+
+    if not document:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found.")
+
+    if document.uploader_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You cannot delete this document.")
+
+    document.is_deleted = True
+    record_vector_store_change(db, document, "remove")
+    orphaned_path = await release_blob(db, document)
+    await db.commit()
+    await invalidate_citation_titles(document.uploader_id, document.filename, document.storage_name)
+    if orphaned_path:
+        orphaned_path.unlink(missing_ok=True)
+    logger.info("Deleted document %s by user %s", document.id, current_user.id)
+
+
+@router.post("/documents/vector-store/reconcile")
+async def reconcile_vector_stores(
+    user_id: int | None = None,
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    db: AsyncSession = Depends(get_db),
+):
+    """Fully reconcile one user's vector store, or every user's if no user_id is given (admin only)"""
+    query = select(User).where(User.openai_vector_store_id.isnot(None))
+    if user_id is not None:
+        query = select(User).where(User.id == user_id)
+    result = await db.execute(query)
+    user_ids = [user.id for user in result.scalars().all()]
+
+    if user_id is not None and not user_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+
+    reconciled = {}
+    failed = []
+    for uid in user_ids:
+        # Re-load per user: a rollback after a failure expires loaded objects
+        user = await db.get(User, uid)
+        try:
+            result = await reconcile_vector_store(db, user)
+            reconciled[user.id] = result.summary()
+        except Exception as e:
+            logger.error(f"Vector store reconcile failed for user {user.id}: {e}")
+            await db.rollback()
+            failed.append(user.id)
+
+    return {"reconciled": reconciled, "failed": failed}
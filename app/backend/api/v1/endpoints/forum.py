@@ -23,6 +23,9 @@ from app.backend.schemas.forum import (
 from app.backend.api.v1.endpoints.auth import require_role
 from app.backend.services.notification_service import notify_forum_reply
 from app.backend.services.achievement_service import check_achievements
+from app.backend.services.context_service import refresh_context_snapshot
+from app.backend.services.activity import record_activity
+from app.backend.models.activity import ActivityKind
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -306,6 +309,7 @@ async def create_post(
     )
     
     db.add(new_post)
+    await record_activity(db, current_user.id, ActivityKind.FORUM_POST)
     await db.commit()
     await db.refresh(new_post)
     
@@ -316,6 +320,7 @@ async def create_post(
         event_type="forum_post",
         event_data={"post_id": new_post.id, "module_id": new_post.module_id}
     )
+    await refresh_context_snapshot(db, current_user.id, ("recent_forum_activity",))
     
     # Send notification if this is a reply (and not replying to own post)
     if new_post.parent_post_id and parent.user_id != current_user.id:
@@ -379,6 +384,7 @@ async def update_post(
     post.updated_at = datetime.utcnow()
     
     await db.commit()
+    await refresh_context_snapshot(db, post.user_id, ("recent_forum_activity",))
     await db.refresh(post)
     
     # Get reply count
@@ -467,6 +473,7 @@ async def vote_post(
             post.upvotes = max(0, post.upvotes - 1)
     
     await db.commit()
+    await refresh_context_snapshot(db, post.user_id, ("recent_forum_activity",))
     
     # Get the vote that was created/updated
     vote_result = await db.execute(
@@ -514,6 +521,7 @@ async def mark_solved(
     
     post.is_solved = not post.is_solved
     await db.commit()
+    await refresh_context_snapshot(db, post.user_id, ("recent_forum_activity",))
     await db.refresh(post)
     
     # Get reply count
@@ -19,6 +19,8 @@ from app.backend.schemas.grading import (
     GradingHistoryResponse
 )
 from app.backend.api.v1.endpoints.auth import require_role
+from app.backend.services.context_service import refresh_context_snapshot
+from app.backend.services.analytics_rollups import record_student_activity
 
 router = APIRouter()
 
@@ -168,8 +170,18 @@ async def grade_attempt(
     attempt.feedback = grade_data.feedback
     attempt.partial_credit = grade_data.partial_credit
     attempt.graded_at = datetime.now()
+    if attempt.points_earned is not None and assessment.points > 0:
+        # Counted on the day the student made the attempt
+        await record_student_activity(
+            db,
+            attempt.user_id,
+            attempt.attempted_at,
+            graded_attempts=1,
+            score_sum=attempt.points_earned * 100.0 / assessment.points,
+        )
     
     await db.commit()
+    await refresh_context_snapshot(db, attempt.user_id, ("recent_assessments",))
     await db.refresh(attempt)
     
     return GradedAttemptResponse(
@@ -10,6 +10,8 @@ from app.backend.core.security import get_current_user
 from app.backend.models.user import User
 from app.backend.models.module import Module, Lesson
 from app.backend.models.assessment import Assessment
+from app.backend.models.activity import ActivityKind
+from app.backend.services.activity import record_activity
 from app.backend.schemas.module import (
     ModuleResponse,
     ModuleDetailResponse,
@@ -196,6 +198,9 @@ async def get_lesson(
             detail="Lesson is not active"
         )
     
+    await record_activity(db, current_user.id, ActivityKind.LESSON_VIEW)
+    await db.commit()
+    
     return LessonResponse(
         id=lesson.id,
         module_id=lesson.module_id,
@@ -0,0 +1,159 @@
+"""In-process TTL caches with an optional shared backend"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+import json
+import logging
+import time
+
+from app.backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCacheBackend:
+    """
+    Shared cache backend so several uvicorn workers see the same entries.
+
+    Requires the optional `redis` package; values are stored as JSON.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # Optional dependency
+
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+
+_shared_backend: Optional[RedisCacheBackend] = None
+_shared_backend_checked = False
+
+
+def get_shared_cache_backend() -> Optional[RedisCacheBackend]:
+    """Return the configured shared backend, or None to stay in-process only."""
+    global _shared_backend, _shared_backend_checked
+    if _shared_backend_checked:
+        return _shared_backend
+    _shared_backend_checked = True
+
+    url = settings.CACHE_BACKEND_URL.strip()
+    if not url:
+        return None
+    try:
+        _shared_backend = RedisCacheBackend(url)
+        logger.info("Using shared cache backend at %s", url.split("@")[-1])
+    except ImportError:
+        logger.warning("CACHE_BACKEND_URL is set but the 'redis' package is not installed; using in-process caches only")
+    return _shared_backend
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a TTL.
+
+    Lookups check the local LRU first and then the shared backend (if one is
+    configured). With a shared backend, local entries live at most
+    CACHE_LOCAL_TTL_SECONDS so an invalidation in one worker reaches the
+    others quickly.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        backend: Optional[RedisCacheBackend] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.local_ttl = min(ttl, settings.CACHE_LOCAL_TTL_SECONDS) if backend else ttl
+        self._timer = timer
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _backend_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._timer():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (self._timer() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        value = self._get_local(key)
+        if value is None and self.backend is not None:
+            try:
+                value = await self.backend.get(self._backend_key(key))
+            except Exception as e:
+                logger.warning(f"Shared cache read failed for {self.name}: {e}")
+                value = None
+            if value is not None:
+                self._set_local(key, value, self.local_ttl)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value for the cache TTL."""
+        self._set_local(key, value, self.local_ttl)
+        if self.backend is not None:
+            try:
+                await self.backend.set(self._backend_key(key), value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for {self.name}: {e}")
+
+    async def invalidate(self, key: str) -> None:
+        """Drop a key locally and from the shared backend."""
+        self._entries.pop(key, None)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(self._backend_key(key))
+            except Exception as e:
+                logger.warning(f"Shared cache delete failed for {self.name}: {e}")
+
+    def clear(self) -> None:
+        """Drop every local entry."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "shared_backend": self.backend is not None,
+        }
@@ -1,10 +1,28 @@
 """Chat utilities for message formatting and system prompt generation"""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
 import logging
+import re
+
+from app.backend.core.cache import TTLCache, get_shared_cache_backend
+from app.backend.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# OpenAI file_search citations: 【8:0+filename.txt】
+CITATION_PATTERN = re.compile(r'【(\d+:\d+)\+([^】]+)】')
+
+# "<scope>:<cited filename>" -> {"title": str | None}; a None title caches "no such document".
+# Scopes are "user:<id>" for a user's uploads and "standard" for shared documents.
+citation_title_cache = TTLCache(
+    "citation-titles",
+    maxsize=settings.CITATION_TITLE_CACHE_MAX_ENTRIES,
+    ttl=settings.CITATION_TITLE_CACHE_TTL_SECONDS,
+    backend=get_shared_cache_backend(),
+)
+
 
 def generate_system_prompt() -> str:
     """
@@ -81,24 +99,35 @@ Current time: {current_time}
 Remember: Your goal is to help students become confident, knowledgeable blockchain developers and analysts. Be patient, supportive, and educational."""
 
 
+@lru_cache(maxsize=1)
+def _system_prompt_parts() -> Tuple[str, str, str]:
+    """The static system prompt split around its date and time placeholders, built once"""
+    before_date, rest = generate_system_prompt().split("{current_date}", 1)
+    between, after_time = rest.split("{current_time}", 1)
+    return before_date, between, after_time
+
+
 def format_system_prompt_with_context(context: Optional[Dict[str, Any]] = None) -> str:
     """
     Format the system prompt with current date/time and optional context.
+    
+    The student context is rendered within settings.CONTEXT_TOKEN_BUDGET.
     """
     now = datetime.now()
     current_date = now.strftime("%Y-%m-%d")
     current_time = now.strftime("%H:%M:%S %Z")
     
-    base_prompt = generate_system_prompt().format(
-        current_date=current_date,
-        current_time=current_time
-    )
+    before_date, between, after_time = _system_prompt_parts()
+    base_prompt = f"{before_date}{current_date}{between}{current_time}{after_time}"
     
     if context:
-        from app.backend.services.context_service import format_context_for_instructions
-        context_str = format_context_for_instructions(context)
-        if context_str:
-            base_prompt += f"\n\n## Student Context\n\n{context_str}"
+        from app.backend.services.context_encoder import encode_context
+        encoded = encode_context(context)
+        if encoded.dropped:
+            logger.debug(f"Context for user {context.get('user', {}).get('id')} over budget, dropped {encoded.dropped}")
+        logger.debug(f"Context tokens by section: {encoded.sections} ({encoded.tokens}/{encoded.budget})")
+        if encoded.text:
+            base_prompt += f"\n\n## Student Context\n\n{encoded.text}"
     
     return base_prompt
 
@@ -189,9 +218,115 @@ def extract_conversation_title(first_message: str, max_length: int = 50) -> str:
     return title
 
 
+def _citation_text(filename: str, title: Optional[str]) -> str:
+    if title:
+        return f'[Document: "{title}"]'
+    return f'[Document: "{Path(filename).stem or filename}"]'
+
+
+def _citation_scopes(user_id: Optional[int]) -> List[str]:
+    """Cache scopes a user's citations resolve in: their own uploads first, then standard documents"""
+    scopes = [f"user:{user_id}"] if user_id is not None else []
+    return scopes + ["standard"]
+
+
+async def invalidate_citation_titles(uploader_id: Optional[int], *names: Optional[str]) -> None:
+    """
+    Forget cached citation lookups for these document names.
+    
+    Call after a document is created, renamed or deleted, with its uploader,
+    its filename and the basename of its storage path.
+    """
+    for name in names:
+        if name:
+            for scope in _citation_scopes(uploader_id):
+                await citation_title_cache.invalidate(f"{scope}:{name}")
+
+
+async def resolve_citation_replacements(
+    filenames: List[str],
+    db: Any,
+    user_id: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Look up readable document titles for cited filenames.
+    
+    Only documents the user can see (their uploads and standard documents)
+    are matched, since deduplicated uploads share a storage name across
+    users. Names not in citation_title_cache are resolved together with one
+    exact-match query on the indexed filename and storage_name columns.
+    
+    Args:
+        filenames: Raw filenames captured from OpenAI citations
+        db: Database session for document lookup
+        user_id: User whose vector store produced the citations; None
+            matches standard documents only
+    
+    Returns:
+        Mapping of raw filename to its formatted citation text
+    """
+    from sqlalchemy import select, or_
+    from app.backend.models.document import Document
+    
+    scopes = _citation_scopes(user_id)
+    replacements = {}
+    unresolved = {}
+    for filename in dict.fromkeys(filenames):
+        filename_clean = filename.strip()
+        cached = [await citation_title_cache.get(f"{scope}:{filename_clean}") for scope in scopes]
+        if all(entry is not None for entry in cached):
+            title = next((entry["title"] for entry in cached if entry["title"]), None)
+            replacements[filename] = _citation_text(filename_clean, title)
+        else:
+            # A citation may carry a path; documents are matched on its last component too
+            unresolved[filename] = (filename_clean, Path(filename_clean).name)
+    
+    if not unresolved:
+        return replacements
+    
+    names = {name for candidates in unresolved.values() for name in candidates if name}
+    visible = Document.category == "standard"
+    if user_id is not None:
+        visible = or_(Document.uploader_id == user_id, visible)
+    titles: Dict[str, Dict[str, str]] = {scope: {} for scope in scopes}
+    try:
+        result = await db.execute(
+            select(Document.filename, Document.storage_name, Document.title, Document.uploader_id, Document.category)
+            .where(Document.is_deleted == False)  # noqa: E712
+            .where(visible)
+            .where(or_(Document.filename.in_(names), Document.storage_name.in_(names)))
+            .order_by(Document.id)
+        )
+        for row in result.all():
+            scope_titles = titles["standard" if row.category == "standard" else f"user:{row.uploader_id}"]
+            # The oldest document wins when several in a scope share a name
+            scope_titles.setdefault(row.filename, row.title)
+            if row.storage_name:
+                scope_titles.setdefault(row.storage_name, row.title)
+    except Exception as e:
+        logger.error(f"Error looking up citations {list(unresolved)}: {e}", exc_info=True)
+        for filename, (filename_clean, _) in unresolved.items():
+            replacements[filename] = _citation_text(filename_clean, None)
+        return replacements
+    
+    for filename, (filename_clean, basename) in unresolved.items():
+        title = None
+        for scope in scopes:
+            scope_title = titles[scope].get(filename_clean) or titles[scope].get(basename)
+            await citation_title_cache.set(f"{scope}:{filename_clean}", {"title": scope_title})
+            title = title or scope_title
+        if not title:
+            logger.warning(f"Document not found for citation {filename}, using file name")
+        replacements[filename] = _citation_text(filename_clean, title)
+    
+    return replacements
+
+
 async def format_citations_in_response(
     response_text: str,
-    db: Optional[Any] = None
+    db: Optional[Any] = None,
+    replacements: Optional[Dict[str, str]] = None,
+    user_id: Optional[int] = None,
 ) -> str:
     """
     Replace OpenAI citation format with readable document names.
@@ -202,13 +337,12 @@ async def format_citations_in_response(
     Args:
         response_text: Response text containing citations
         db: Optional database session for document lookup
+        replacements: Optional cache of already resolved citations, updated in place
+        user_id: User whose documents the citations may refer to
     
     Returns:
         Response text with formatted citations
     """
-    import re
-    from pathlib import Path
-    
     if not response_text:
         return response_text
     
@@ -216,75 +350,83 @@ async def format_citations_in_response(
         logger.warning("format_citations_in_response called without database session")
         return response_text
     
-    citation_pattern = r'【(\d+:\d+)\+([^】]+)】'
-    matches = list(re.finditer(citation_pattern, response_text))
+    matches = list(CITATION_PATTERN.finditer(response_text))
     
     if not matches:
         return response_text
     
-    logger.info(f"Found {len(matches)} citation(s) to format in response")
-    
-    from sqlalchemy import select
-    from app.backend.models.document import Document
-    
-    replacements = {}
+    if replacements is None:
+        replacements = {}
     
-    for match in matches:
-        citation_ref = match.group(1)
-        filename = match.group(2)
-        
-        if filename in replacements:
-            continue
-        
-        try:
-            filename_clean = filename.strip()
-            filename_base = Path(filename_clean).stem
-            filename_with_path = f"/{filename_clean}"
-            filename_in_storage = f"storage/documents/{filename_clean}"
-            
-            result = await db.execute(
-                select(Document)
-                .where(Document.is_deleted == False)
-                .where(
-                    (Document.filename == filename_clean) |
-                    (Document.filename.like(f"%{filename_base}%")) |
-                    (Document.storage_path.like(f"%{filename_clean}%")) |
-                    (Document.storage_path.like(f"%{filename_with_path}%")) |
-                    (Document.storage_path.like(f"%{filename_in_storage}%")) |
-                    (Document.storage_path.endswith(filename_clean))
-                )
-                .limit(1)
-            )
-            document = result.scalar_one_or_none()
-            
-            if document:
-                replacements[filename] = f'[Document: "{document.title}"]'
-                logger.info(f"Replaced citation {filename} with document title: {document.title}")
-            else:
-                display_name = filename_base if filename_base else filename_clean
-                replacements[filename] = f'[Document: "{display_name}"]'
-                logger.warning(f"Document not found for citation {filename}, using fallback: {display_name}")
-        except Exception as e:
-            logger.error(f"Error looking up citation {filename}: {e}", exc_info=True)
-            display_name = Path(filename).stem if filename else filename
-            replacements[filename] = f'[Document: "{display_name}"]'
+    unresolved = [m.group(2) for m in matches if m.group(2) not in replacements]
+    if unresolved:
+        replacements.update(await resolve_citation_replacements(unresolved, db, user_id))
     
     def replace_match(match):
         filename = match.group(2)
-        replacement = replacements.get(filename, f'[Document: "{filename}"]')
-        return replacement
+        return replacements.get(filename) or _citation_text(filename, None)
     
-    formatted_text = re.sub(citation_pattern, replace_match, response_text)
+    return CITATION_PATTERN.sub(replace_match, response_text)
+
+
+class StreamingCitationFormatter:
+    """
+    Incrementally rewrite citations in a streamed response.
     
-    if formatted_text == response_text and len(matches) > 0:
-        logger.error("Citation pattern matched but text was not modified - forcing replacement")
-        def simple_replace(m):
-            fn = m.group(2)
-            return f'[Document: "{Path(fn).stem}"]'
-        formatted_text = re.sub(citation_pattern, simple_replace, response_text)
+    Text deltas can split a citation (【8:0+file.pdf】) across chunks, so any
+    unterminated citation at the end of a chunk is held back until its closing
+    bracket arrives. Everything before it is formatted and released immediately.
     
-    if len(replacements) > 0:
-        logger.info(f"Formatted {len(replacements)} citation(s) in response")
+    Pass either a session, or a session factory to open a short-lived session
+    only when an unresolved citation actually needs a lookup.
+    """
     
-    return formatted_text
-
+    # Longest tail we hold back waiting for a closing bracket before giving up
+    max_pending_length = 512
+    
+    def __init__(
+        self,
+        db: Optional[Any] = None,
+        session_factory: Optional[Any] = None,
+        user_id: Optional[int] = None,
+    ):
+        self.db = db
+        self.session_factory = session_factory
+        self.user_id = user_id
+        self._pending = ""
+        self._replacements: Dict[str, str] = {}
+    
+    async def feed(self, text: str) -> str:
+        """Add a text delta and return the portion that is safe to emit."""
+        if not text:
+            return ""
+        
+        self._pending += text
+        open_index = self._pending.rfind("【")
+        
+        if open_index == -1 or "】" in self._pending[open_index:]:
+            ready, self._pending = self._pending, ""
+        elif len(self._pending) - open_index > self.max_pending_length:
+            # Not a citation after all - release the text unchanged
+            ready, self._pending = self._pending, ""
+        else:
+            ready, self._pending = self._pending[:open_index], self._pending[open_index:]
+        
+        return await self._format(ready)
+    
+    async def flush(self) -> str:
+        """Return whatever text is still held back at the end of the stream."""
+        ready, self._pending = self._pending, ""
+        return await self._format(ready)
+    
+    async def _format(self, text: str) -> str:
+        if not text or "【" not in text:
+            return text
+        try:
+            if self.db is None and self.session_factory is not None:
+                async with self.session_factory() as db:
+                    return await format_citations_in_response(text, db, self._replacements, self.user_id)
+            return await format_citations_in_response(text, self.db, self._replacements, self.user_id)
+        except Exception as e:
+            logger.error(f"Error formatting citations in stream: {e}", exc_info=True)
+            return text
@@ -45,6 +45,78 @@ class Settings(BaseSettings):
     BRAVE_API_KEY: str = Field(default="", env="BRAVE_API_KEY")  # Optional, for web search
     OPENAI_ASSISTANT_ID: str = Field(default="", env="OPENAI_ASSISTANT_ID")  # Optional, global fallback assistant
     
+    # Chat backend: 'assistants' (OpenAI threads + file_search) or 'chat_completions'
+    # (one streaming call per message to DEFAULT_LLM_PROVIDER, history from chat_messages)
+    CHAT_BACKEND: str = "assistants"
+    CHAT_COMPLETIONS_BASE_URL: str = ""  # Optional OpenAI-compatible endpoint override (e.g. fake_llm_provider.py)
+    CHAT_HISTORY_MAX_MESSAGES: int = 20  # Previous exchanges replayed to the chat completions backend
+    
+    # Assistants run polling (shared run tracker)
+    RUN_POLL_INITIAL_INTERVAL: float = 0.25  # Seconds before the first poll of a new run
+    RUN_POLL_MAX_INTERVAL: float = 4.0  # Backoff cap for long-running runs
+    RUN_POLL_MAX_CONCURRENCY: int = 16  # Max concurrent runs.retrieve calls
+    RUN_WAIT_TIMEOUT_SECONDS: float = 300.0  # Give up waiting on a run after this long
+    RUN_CLAIM_LEASE_SECONDS: float = 30.0  # A crashed sender's claim on a thread expires after this long
+
+    # Pre-created OpenAI threads for new conversations (opt-in; Assistants backend only)
+    THREAD_POOL_ENABLED: bool = False  # Creates remote threads up to the target size on startup
+    THREAD_POOL_LOW_WATER: int = 5  # Refill when fewer unclaimed threads than this remain
+    THREAD_POOL_TARGET_SIZE: int = 20  # Refill up to this many unclaimed threads
+    THREAD_POOL_REFILL_INTERVAL_SECONDS: float = 30.0  # How often the pool is checked without a claim
+    THREAD_POOL_MAX_AGE_SECONDS: float = 7 * 24 * 3600.0  # Unclaimed threads older than this are deleted
+
+    # Caching of verified OpenAI resource IDs
+    OPENAI_RESOURCE_CACHE_TTL_SECONDS: float = 600.0  # Re-verify assistant/vector store IDs after this long
+    OPENAI_RESOURCE_CACHE_MAX_ENTRIES: int = 10000  # LRU bound for the in-process cache
+    CACHE_BACKEND_URL: str = ""  # Optional redis:// URL so all workers share cache entries
+    CACHE_LOCAL_TTL_SECONDS: float = 5.0  # Local copy lifetime when a shared backend is configured
+    CITATION_TITLE_CACHE_TTL_SECONDS: float = 600.0  # Cited filename -> document title lookups
+    CITATION_TITLE_CACHE_MAX_ENTRIES: int = 10000
+
+    # Background document ingestion (OpenAI upload + vector store attach)
+    INGESTION_POLL_INTERVAL_SECONDS: float = 5.0  # How often the worker checks for due jobs
+    INGESTION_MAX_CONCURRENCY: int = 4  # Documents processed at once per worker
+    INGESTION_MAX_ATTEMPTS: int = 5  # Give up (status 'failed') after this many tries
+    INGESTION_RETRY_BASE_SECONDS: float = 10.0  # Retry backoff doubles from this
+    INGESTION_LEASE_SECONDS: float = 300.0  # A crashed worker's job is picked up again after this
+    VECTOR_STORE_SYNC_CONCURRENCY: int = 8  # Concurrent OpenAI requests during a full vector store reconcile
+    VECTOR_STORE_SYNC_SETTLE_SECONDS: float = 300.0  # Sync ops younger than this may have lower-ID ops still uncommitted
+
+    # Write-behind chat audit log (query_logs)
+    LOG_WRITER_ENABLED: bool = True  # Off: query logs commit with the chat message
+    LOG_WRITER_BATCH_SIZE: int = 200  # Rows per bulk INSERT; a full batch triggers a flush
+    LOG_WRITER_FLUSH_INTERVAL_SECONDS: float = 1.0
+    LOG_WRITER_MAX_PENDING: int = 10000  # Chat turns wait once this many rows are unflushed
+    LOG_WRITER_SPOOL_DIR: str = "storage/log_spool"  # Rows are spooled here until committed
+    LOG_WRITER_FSYNC: bool = False  # fsync each spooled row (survives power loss, not just process crashes)
+    LOG_WRITER_MAX_ATTEMPTS: int = 3  # Failed bulk inserts of a spool file before it is retried row by row
+    LOG_WRITER_SUBMIT_TIMEOUT_SECONDS: float = 5.0  # Longest a chat turn waits for buffer space; then the row is inserted directly
+
+    # AI assistant learning context
+    CONTEXT_MODULE_CATALOG_TTL_SECONDS: float = 300.0  # Published module list is shared by all users' context
+    CONTEXT_TOKEN_BUDGET: int = 1200  # Student context sent with each message; lower-priority sections are cut first
+
+    # AI assistant answer cache (opt-in; personal, follow-up and attachment messages always bypass it)
+    ANSWER_CACHE_ENABLED: bool = False
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+
+    # Admin platform analytics snapshot
+    PLATFORM_ANALYTICS_TTL_SECONDS: float = 300.0  # Dashboard figures are at most this old unless refreshed
+
+    # Cohort performance exports (CSV/Parquet; Parquet needs the optional pyarrow package)
+    EXPORT_CHUNK_ROWS: int = 5000  # Rows per database fetch and encoded chunk (one Parquet row group)
+    EXPORT_MAX_CONCURRENCY: int = 2  # Report files written at once per worker
+    EXPORT_POLL_INTERVAL_SECONDS: float = 5.0  # How often the worker checks for queued reports
+    EXPORT_LEASE_SECONDS: float = 120.0  # Renewed with every chunk; a crashed worker's report restarts after this
+
+    # AI chat admission control (per app process; /chat and /chat/stream)
+    CHAT_USER_RATE_PER_MINUTE: float = 20.0  # Sustained messages per user
+    CHAT_USER_BURST: int = 5  # Messages a user can send back to back
+    CHAT_MAX_CONCURRENT: int = 32  # Chat turns running at once
+    CHAT_MAX_QUEUED: int = 64  # Turns waiting for a slot; beyond this requests get 429 immediately
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 10.0  # A queued turn gets 429 after waiting this long
+    
     # File Upload
     MAX_UPLOAD_SIZE_MB: int = 10
     ALLOWED_FILE_TYPES: str = "jpg,jpeg,png,pdf"
@@ -1,4 +1,5 @@
 """Database configuration and session management"""
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.backend.core.config import settings
@@ -45,6 +46,19 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def get_session_factory() -> async_sessionmaker:
+    """Dependency for code that opens its own short-lived sessions"""
+    return AsyncSessionLocal
+
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def dialect_insert(db: AsyncSession):
+    """The INSERT construct with ON CONFLICT support for the session's database"""
+    return _INSERTS[db.get_bind().dialect.name]
+
+
 async def init_db():
     """Initialize database (create tables)"""
     async with engine.begin() as conn:
@@ -1,21 +1,39 @@
 """OpenAI utilities for managing assistants and vector stores"""
 from typing import Optional, Dict, Any
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import asyncio
 import logging
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, NotFoundError
 from pathlib import Path
-from sqlalchemy import update, inspect, select, or_
+from sqlalchemy import update, inspect, select, or_, func
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.backend.core.cache import TTLCache, get_shared_cache_backend
 from app.backend.core.config import settings
 from app.backend.models.user import User
 from app.backend.models.document import Document
+from app.backend.models.document_blob import DocumentBlob
+from app.backend.models.vector_store_sync import VectorStoreSyncOp, VectorStoreSyncState
 
 logger = logging.getLogger(__name__)
 
+# Max file IDs per vector store file-batch request
+VECTOR_STORE_FILE_BATCH_SIZE = 500
+
 # Initialize OpenAI client
 _client: Optional[AsyncOpenAI] = None
 
+# Assistant/vector store IDs already confirmed to exist remotely, so chat
+# messages skip the retrieve round trips until the entry expires
+openai_resource_cache = TTLCache(
+    "openai-resources",
+    maxsize=settings.OPENAI_RESOURCE_CACHE_MAX_ENTRIES,
+    ttl=settings.OPENAI_RESOURCE_CACHE_TTL_SECONDS,
+    backend=get_shared_cache_backend(),
+)
+
 
 def get_openai_client() -> AsyncOpenAI:
     """Get or create OpenAI client instance"""
@@ -28,6 +46,21 @@ def get_openai_client() -> AsyncOpenAI:
     return _client
 
 
+async def invalidate_openai_resource_cache(user_id: Optional[int] = None, assistant_id: Optional[str] = None) -> None:
+    """
+    Forget verified OpenAI IDs so the next lookup re-checks them remotely.
+    
+    Args:
+        user_id: Drop the user's assistant and vector store entries
+        assistant_id: Drop the entry for a validated global assistant
+    """
+    if user_id is not None:
+        await openai_resource_cache.invalidate(f"assistant:{user_id}")
+        await openai_resource_cache.invalidate(f"vector_store:{user_id}")
+    if assistant_id:
+        await openai_resource_cache.invalidate(f"global_assistant:{assistant_id}")
+
+
 async def get_or_create_user_assistant(user: User, db=None, vector_store_id: Optional[str] = None) -> str:
     """
     Get or create a user-specific OpenAI assistant.
@@ -41,19 +74,28 @@ async def get_or_create_user_assistant(user: User, db=None, vector_store_id: Opt
         Assistant ID
     """
     client = get_openai_client()
+    cache_key = f"assistant:{user.id}"
     
     # Check if user already has an assistant
     if user.openai_assistant_id:
+        # Skip the remote check if this assistant was recently verified with this vector store
+        cached = await openai_resource_cache.get(cache_key)
+        if (
+            cached
+            and cached["assistant_id"] == user.openai_assistant_id
+            and (not vector_store_id or vector_store_id in cached["vector_store_ids"])
+        ):
+            return cached["assistant_id"]
+        
         try:
             # Verify assistant still exists and update if vector store provided
             assistant = await client.beta.assistants.retrieve(user.openai_assistant_id)
             
             # Update assistant with vector store if provided and different
+            current_tool_resources = getattr(assistant, 'tool_resources', None)
+            current_vs_ids = current_tool_resources.get("file_search", {}).get("vector_store_ids", []) if current_tool_resources else []
             if vector_store_id:
                 tool_resources = {"file_search": {"vector_store_ids": [vector_store_id]}}
-                # Check if assistant needs update
-                current_tool_resources = getattr(assistant, 'tool_resources', None)
-                current_vs_ids = current_tool_resources.get("file_search", {}).get("vector_store_ids", []) if current_tool_resources else []
                 
                 if vector_store_id not in current_vs_ids:
                     # Update assistant with file_search tool and vector store
@@ -62,10 +104,15 @@ async def get_or_create_user_assistant(user: User, db=None, vector_store_id: Opt
                         tools=[{"type": "file_search"}],
                         tool_resources=tool_resources
                     )
+                    current_vs_ids = [vector_store_id]
                     logger.info(f"Updated assistant {assistant.id} with vector store {vector_store_id}")
             
+            await openai_resource_cache.set(
+                cache_key, {"assistant_id": assistant.id, "vector_store_ids": list(current_vs_ids)}
+            )
             return assistant.id
         except Exception as e:
+            await openai_resource_cache.invalidate(cache_key)
             logger.warning(f"User assistant {user.openai_assistant_id} not found, creating new one: {e}")
     
     # Prepare assistant configuration
@@ -86,6 +133,9 @@ async def get_or_create_user_assistant(user: User, db=None, vector_store_id: Opt
     
     # Store assistant ID in user model
     user.openai_assistant_id = assistant.id
+    await openai_resource_cache.set(
+        cache_key, {"assistant_id": assistant.id, "vector_store_ids": [vector_store_id] if vector_store_id else []}
+    )
     
     # Save to database if session provided
     if db:
@@ -124,11 +174,16 @@ async def get_or_create_user_vector_store(user: User, db: AsyncSession | None =
         logger.warning(f"Vector store unavailable: {e}")
         return None
 
+    cache_key = f"vector_store:{user.id}"
     if user.openai_vector_store_id:
+        if await openai_resource_cache.get(cache_key) == user.openai_vector_store_id:
+            return user.openai_vector_store_id
         try:
             store = await client.beta.vector_stores.retrieve(user.openai_vector_store_id)
+            await openai_resource_cache.set(cache_key, store.id)
             return store.id
         except Exception as e:
+            await openai_resource_cache.invalidate(cache_key)
             logger.warning(f"Vector store {user.openai_vector_store_id} missing, recreating: {e}")
 
     vector_store = await client.beta.vector_stores.create(
@@ -137,6 +192,7 @@ async def get_or_create_user_vector_store(user: User, db: AsyncSession | None =
     )
 
     user.openai_vector_store_id = vector_store.id
+    await openai_resource_cache.set(cache_key, vector_store.id)
     if db:
         await db.execute(
             update(User)
@@ -175,10 +231,14 @@ async def update_user_assistant_instructions(
     client = get_openai_client()
     assistant_id = await get_or_create_user_assistant(user)
     
-    await client.beta.assistants.update(
-        assistant_id,
-        instructions=instructions
-    )
+    try:
+        await client.beta.assistants.update(
+            assistant_id,
+            instructions=instructions
+        )
+    finally:
+        # The assistant changed (or vanished); re-verify it on next use
+        await invalidate_openai_resource_cache(user_id=user.id)
     
     return assistant_id
 
@@ -197,12 +257,19 @@ async def get_global_assistant_id() -> Optional[str]:
     
     assistant_id = assistant_id.strip()
     
+    cache_key = f"global_assistant:{assistant_id}"
+    if await openai_resource_cache.get(cache_key):
+        return assistant_id
+    
     # Validate that the assistant exists
     try:
         client = get_openai_client()
         await client.beta.assistants.retrieve(assistant_id)
+        await openai_resource_cache.set(cache_key, True)
         return assistant_id
     except Exception as e:
+        if isinstance(e, NotFoundError):
+            await openai_resource_cache.invalidate(cache_key)
         logger.warning(f"Global assistant {assistant_id} not found or invalid: {e}")
         return None
 
@@ -265,9 +332,92 @@ async def _upload_file_to_openai(client: AsyncOpenAI, file_path: Path) -> Option
         return None
 
 
-async def update_vector_store(db: AsyncSession, user: User) -> Optional[str]:
+def _visible_sync_ops(user_id: int):
+    """Filter for sync ops that affect a user's vector store (their own + shared documents)"""
+    return or_(VectorStoreSyncOp.user_id == user_id, VectorStoreSyncOp.user_id.is_(None))
+
+
+def record_vector_store_change(db: AsyncSession, document: Document, operation: str) -> None:
     """
-    Ensure the user's vector store is synchronized with stored documents.
+    Queue a vector store sync op for a document change.
+    
+    The op is added to the caller's session so it commits atomically with the
+    document change itself. The document must already have an ID (flush first).
+    
+    Args:
+        db: Database session holding the document change
+        document: Document that was added or removed
+        operation: 'add' or 'remove'
+    """
+    user_id = None if document.category == "standard" else document.uploader_id
+    db.add(VectorStoreSyncOp(user_id=user_id, document_id=document.id, operation=operation))
+
+
+async def _save_sync_state(
+    db: AsyncSession,
+    user_id: int,
+    vector_store_id: str,
+    last_op_id: int,
+    applied_op_ids: Optional[set[int]] = None,
+    full_sync: bool = False,
+) -> None:
+    """Advance the user's sync watermark and commit pending document updates."""
+    state = await db.get(VectorStoreSyncState, user_id)
+    if state is None:
+        state = VectorStoreSyncState(user_id=user_id)
+        db.add(state)
+    state.vector_store_id = vector_store_id
+    state.last_op_id = last_op_id
+    state.applied_op_ids = sorted(i for i in applied_op_ids or () if i > last_op_id)
+    if full_sync:
+        state.last_full_sync_at = datetime.now(timezone.utc)
+    await db.commit()
+
+
+async def _apply_sync_op(
+    client: AsyncOpenAI,
+    vector_store_id: str,
+    op: VectorStoreSyncOp,
+    document: Document,
+    files_in_use: set[str],
+) -> None:
+    """Apply one recorded document change to a vector store; raises if it should be retried."""
+    if op.operation == "remove":
+        # Deduplicated uploads share a file; keep it while another visible document uses it
+        if document.openai_file_id and document.openai_file_id not in files_in_use:
+            try:
+                await client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=document.openai_file_id)
+            except NotFoundError:
+                pass  # Already detached
+        return
+
+    # A later 'remove' op covers documents deleted since this one was queued
+    if document.is_deleted:
+        return
+
+    # Uploading is the ingestion worker's job; wait for it rather than upload inline
+    if document.ingestion_status in ("failed", "skipped"):
+        return
+    if _is_image_file(Path(document.storage_path)):
+        return
+    if document.ingestion_status != "ready" or not document.openai_file_id:
+        raise Exception(f"Document {document.id} is still being ingested")
+
+    await client.beta.vector_stores.files.create(vector_store_id=vector_store_id, file_id=document.openai_file_id)
+
+
+async def sync_vector_store(db: AsyncSession, user: User) -> Optional[str]:
+    """
+    Apply document changes recorded since the user's last sync.
+    
+    Used on the chat path. When nothing changed since the watermark this makes
+    no OpenAI calls beyond the (cached) vector store check. The first sync for
+    a user, or a sync after their vector store was recreated, falls back to a
+    full reconcile. A failing op stops the sync so it is retried next time.
+    
+    Concurrent transactions can commit op N+1 before op N, so the watermark
+    only moves past ops older than VECTOR_STORE_SYNC_SETTLE_SECONDS; newer
+    ops are remembered individually and the window behind them is re-read.
     
     Returns:
         The vector store ID if available, otherwise None.
@@ -276,19 +426,210 @@ async def update_vector_store(db: AsyncSession, user: User) -> Optional[str]:
     if not vector_store_id:
         return None
 
+    state = await db.get(VectorStoreSyncState, user.id)
+    if state is None or state.vector_store_id != vector_store_id:
+        return await update_vector_store(db, user, upload_missing=False)
+
+    result = await db.execute(
+        select(VectorStoreSyncOp, Document)
+        .join(Document, Document.id == VectorStoreSyncOp.document_id)
+        .where(VectorStoreSyncOp.id > state.last_op_id)
+        .where(_visible_sync_ops(user.id))
+        .order_by(VectorStoreSyncOp.id)
+        .execution_options(populate_existing=True)  # The ingestion worker updates documents elsewhere
+    )
+    applied_op_ids = set(state.applied_op_ids or ())
+    rows = result.all()
+    pending = [(op, d) for op, d in rows if op.id not in applied_op_ids]
+    last_op_id = state.last_op_id
+
+    removed_file_ids = {d.openai_file_id for op, d in pending if op.operation == "remove" and d.openai_file_id}
+    files_in_use: set[str] = set()
+    if removed_file_ids:
+        in_use_result = await db.execute(
+            select(Document.openai_file_id)
+            .where(Document.openai_file_id.in_(removed_file_ids))
+            .where(Document.is_deleted == False)  # noqa: E712
+            .where(or_(Document.uploader_id == user.id, Document.category == "standard"))
+        )
+        files_in_use = set(in_use_result.scalars().all())
+
+    # End the read transaction before calling OpenAI
+    await db.commit()
+
+    if pending:
+        client = get_openai_client()
+        for op, document in pending:
+            try:
+                await _apply_sync_op(client, vector_store_id, op, document, files_in_use)
+            except Exception as e:
+                logger.warning("Vector store sync op %s for user %s failed, retrying next sync: %s", op.id, user.id, e)
+                break
+            applied_op_ids.add(op.id)
+
+    # Move the watermark over the applied prefix, but only past settled ops:
+    # a lower ID committed late must still be above it when it shows up
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.VECTOR_STORE_SYNC_SETTLE_SECONDS)
+    for op, _ in rows:
+        if op.id not in applied_op_ids:
+            break
+        created_at = op.created_at if op.created_at.tzinfo else op.created_at.replace(tzinfo=timezone.utc)
+        if created_at <= settled_before:
+            last_op_id = op.id
+
+    if pending or last_op_id != state.last_op_id:
+        await _save_sync_state(db, user.id, vector_store_id, last_op_id, applied_op_ids)
+    return vector_store_id
+
+
+async def _gather_limited(semaphore: asyncio.Semaphore, items: list, fn) -> list:
+    """Run fn over items concurrently under a shared semaphore; exceptions are returned, not raised."""
+    async def _run(item):
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(_run(item) for item in items), return_exceptions=True)
+
+
+@dataclass
+class VectorStoreReconcileResult:
+    """Aggregated outcome of a full vector store reconcile"""
+    vector_store_id: Optional[str]
+    uploaded: list[int] = field(default_factory=list)  # Document IDs uploaded to OpenAI
+    attached: list[str] = field(default_factory=list)  # File IDs attached to the store
+    removed: list[str] = field(default_factory=list)  # Stale file IDs detached from the store
+    errors: list[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "vector_store_id": self.vector_store_id,
+            "uploaded": len(self.uploaded),
+            "attached": len(self.attached),
+            "removed": len(self.removed),
+            "errors": self.errors,
+        }
+
+
+async def _attach_files(
+    client: AsyncOpenAI,
+    vector_store_id: str,
+    file_ids: list[str],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Optional[Exception]]:
+    """
+    Attach files using the file-batch API, one call per VECTOR_STORE_FILE_BATCH_SIZE IDs.
+    
+    A batch is rejected as a whole if any ID is bad, so a failed batch is
+    retried file by file to find out which ones actually failed.
+    
+    Returns:
+        Mapping of file ID to the error that prevented attaching it (None on success)
+    """
+    outcome: Dict[str, Optional[Exception]] = {}
+    for start in range(0, len(file_ids), VECTOR_STORE_FILE_BATCH_SIZE):
+        chunk = file_ids[start:start + VECTOR_STORE_FILE_BATCH_SIZE]
+        try:
+            async with semaphore:
+                await client.beta.vector_stores.file_batches.create(vector_store_id=vector_store_id, file_ids=chunk)
+            outcome.update({file_id: None for file_id in chunk})
+            continue
+        except Exception as e:
+            logger.warning("Batch attach of %s files to %s failed, retrying individually: %s", len(chunk), vector_store_id, e)
+
+        results = await _gather_limited(
+            semaphore,
+            chunk,
+            lambda file_id: client.beta.vector_stores.files.create(vector_store_id=vector_store_id, file_id=file_id),
+        )
+        for file_id, result in zip(chunk, results):
+            outcome[file_id] = result if isinstance(result, Exception) else None
+    return outcome
+
+
+async def reconcile_vector_store(
+    db: AsyncSession,
+    user: User,
+    upload_missing: bool = True,
+    concurrency: int = settings.VECTOR_STORE_SYNC_CONCURRENCY,
+) -> VectorStoreReconcileResult:
+    """
+    Fully reconcile the user's vector store with stored documents.
+    
+    Lists every remote file, then uploads missing files and deletes stale ones
+    concurrently (bounded by `concurrency`) and attaches new files with the
+    file-batch API. One failing file does not stop the others; failures are
+    collected in the result. Finally moves the user's sync watermark past all
+    recorded ops. This is the maintenance path (see the admin reconcile
+    endpoint); chat messages use sync_vector_store instead.
+    
+    Args:
+        db: Database session
+        user: User whose vector store to reconcile
+        upload_missing: Upload documents that have no OpenAI file yet. The chat
+            path passes False and leaves uploads to the ingestion worker.
+        concurrency: Max OpenAI requests in flight at once
+    
+    Returns:
+        Aggregated reconcile result
+    """
+    vector_store_id = await get_or_create_user_vector_store(user, db)
+    result = VectorStoreReconcileResult(vector_store_id=vector_store_id)
+    if not vector_store_id:
+        return result
+
     client = get_openai_client()
 
     # Fetch documents visible to the user (their uploads + shared/standard)
     try:
-        result = await db.execute(
+        # Ops recorded after this point are replayed by the next incremental sync
+        watermark = await db.scalar(
+            select(func.coalesce(func.max(VectorStoreSyncOp.id), 0)).where(_visible_sync_ops(user.id))
+        )
+        # Documents still being ingested have no file to attach yet; stop the
+        # watermark before their 'add' ops so the next sync picks them up
+        first_ingesting_op = await db.scalar(
+            select(func.min(VectorStoreSyncOp.id))
+            .join(Document, Document.id == VectorStoreSyncOp.document_id)
+            .where(_visible_sync_ops(user.id))
+            .where(VectorStoreSyncOp.operation == "add")
+            .where(Document.is_deleted == False)  # noqa: E712
+            .where(Document.openai_file_id.is_(None))
+            .where(Document.ingestion_status.in_(("pending", "processing")))
+        )
+        if first_ingesting_op is not None:
+            watermark = min(watermark, first_ingesting_op - 1)
+        # Ops that have not settled may still have lower IDs uncommitted; keep
+        # the watermark below them and record them as applied instead
+        settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.VECTOR_STORE_SYNC_SETTLE_SECONDS)
+        first_unsettled_op = await db.scalar(
+            select(func.min(VectorStoreSyncOp.id))
+            .where(_visible_sync_ops(user.id))
+            .where(VectorStoreSyncOp.id <= watermark)
+            .where(VectorStoreSyncOp.created_at > settled_before)
+        )
+        unsettled_op_ids: set[int] = set()
+        if first_unsettled_op is not None:
+            unsettled_result = await db.execute(
+                select(VectorStoreSyncOp.id)
+                .where(_visible_sync_ops(user.id))
+                .where(VectorStoreSyncOp.id.between(first_unsettled_op, watermark))
+            )
+            unsettled_op_ids = set(unsettled_result.scalars().all())
+            watermark = first_unsettled_op - 1
+        query_result = await db.execute(
             select(Document)
             .where(Document.is_deleted == False)  # noqa: E712
             .where(or_(Document.uploader_id == user.id, Document.category == "standard"))
+            .execution_options(populate_existing=True)
         )
-        documents = result.scalars().all()
+        documents = query_result.scalars().all()
+        # End the read transaction so no pooled connection is held across the
+        # OpenAI calls below; changes to documents are flushed by the final commit
+        await db.commit()
     except Exception as e:
         logger.warning("Unable to load documents for vector sync: %s", e)
-        return vector_store_id
+        result.errors.append(f"load documents: {e}")
+        return result
 
     # Check currently attached files (OpenAI max limit is 100 per request)
     attached_file_ids = set()
@@ -312,8 +653,10 @@ async def update_vector_store(db: AsyncSession, user: User) -> Optional[str]:
     except Exception as e:
         logger.warning("Unable to list files for vector store %s: %s", vector_store_id, e)
 
+    # Plan: which documents are fine, which need (re)attaching, which need uploading
     desired_file_ids: set[str] = set()
-    dirty = False
+    to_attach: Dict[str, Document] = {}
+    to_upload: list[Document] = []
 
     for document in documents:
         file_path = Path(document.storage_path)
@@ -333,54 +676,94 @@ async def update_vector_store(db: AsyncSession, user: User) -> Optional[str]:
             continue
 
         file_id = document.openai_file_id
-
-        # If file already attached, mark as desired and continue
-        if file_id and file_id in attached_file_ids:
-            desired_file_ids.add(file_id)
-            continue
-
-        # If file exists in DB but not attached, try to reattach
         if file_id:
-            try:
-                await client.beta.vector_stores.files.create(vector_store_id=vector_store_id, file_id=file_id)
-                desired_file_ids.add(file_id)
-                attached_file_ids.add(file_id)
-                continue
-            except Exception as e:
-                logger.warning("Reattaching OpenAI file %s failed: %s", file_id, e)
+            desired_file_ids.add(file_id)
+            if file_id not in attached_file_ids:
+                to_attach[file_id] = document
+        elif upload_missing:
+            to_upload.append(document)
 
-        # Upload a fresh copy
-        uploaded_id = await _upload_file_to_openai(client, file_path)
+    async def _upload(document: Document) -> None:
+        uploaded_id = await _upload_file_to_openai(client, Path(document.storage_path))
         if not uploaded_id:
-            continue
-
+            raise Exception(f"upload of document {document.id} failed")
         document.openai_file_id = uploaded_id
+        document.ingestion_status = "ready"
         desired_file_ids.add(uploaded_id)
-        dirty = True
+        to_attach[uploaded_id] = document
+        result.uploaded.append(document.id)
 
-        try:
-            await client.beta.vector_stores.files.create(vector_store_id=vector_store_id, file_id=uploaded_id)
-            attached_file_ids.add(uploaded_id)
-        except Exception as e:
-            logger.error(
-                "Unable to attach uploaded file %s to vector store %s: %s",
-                uploaded_id,
-                vector_store_id,
-                e,
+    # Stale files can be removed while uploads run; they do not depend on each other
+    stale_file_ids = list(attached_file_ids - desired_file_ids)
+
+    async def _remove(file_id: str) -> None:
+        await client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+        result.removed.append(file_id)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    upload_results, remove_results = await asyncio.gather(
+        _gather_limited(semaphore, to_upload, _upload),
+        _gather_limited(semaphore, stale_file_ids, _remove),
+    )
+    for error in upload_results:
+        if isinstance(error, Exception):
+            result.errors.append(str(error))
+    for file_id, error in zip(stale_file_ids, remove_results):
+        if isinstance(error, Exception):
+            logger.warning("Failed to remove stale file %s from vector store %s: %s", file_id, vector_store_id, error)
+            result.errors.append(f"remove {file_id}: {error}")
+
+    attach_outcome = await _attach_files(client, vector_store_id, list(to_attach), semaphore)
+
+    # A stored file ID that no longer exists on OpenAI gets one fresh upload
+    missing_ids = [
+        file_id for file_id, error in attach_outcome.items()
+        if upload_missing and isinstance(error, NotFoundError)
+    ]
+    if missing_ids:
+        reupload = [to_attach.pop(file_id) for file_id in missing_ids]
+        for file_id in missing_ids:
+            del attach_outcome[file_id]
+        for error in await _gather_limited(semaphore, reupload, _upload):
+            if isinstance(error, Exception):
+                result.errors.append(str(error))
+        retry_ids = [file_id for file_id in to_attach if file_id not in attach_outcome]
+        attach_outcome.update(await _attach_files(client, vector_store_id, retry_ids, semaphore))
+
+    for file_id, error in attach_outcome.items():
+        if error is None:
+            result.attached.append(file_id)
+        else:
+            logger.error("Unable to attach file %s to vector store %s: %s", file_id, vector_store_id, error)
+            result.errors.append(f"attach {file_id}: {error}")
+
+    # Let other documents with the same content reuse the fresh uploads
+    for document in documents:
+        if document.id in result.uploaded and document.content_hash:
+            await db.execute(
+                update(DocumentBlob)
+                .where(DocumentBlob.sha256 == document.content_hash)
+                .where(DocumentBlob.openai_file_id.is_(None))
+                .values(openai_file_id=document.openai_file_id)
             )
 
-    # Remove stale files no longer tied to documents
-    stale_files = attached_file_ids - desired_file_ids
-    for file_id in stale_files:
-        try:
-            await client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
-        except Exception as e:
-            logger.warning("Failed to remove stale file %s from vector store %s: %s", file_id, vector_store_id, e)
+    # Persists new openai_file_ids along with the watermark
+    await _save_sync_state(db, user.id, vector_store_id, watermark, unsettled_op_ids, full_sync=True)
 
-    if dirty:
-        await db.commit()
+    if result.errors:
+        logger.warning("Reconcile of vector store %s finished with %s errors", vector_store_id, len(result.errors))
+    return result
 
-    return vector_store_id
+
+async def update_vector_store(db: AsyncSession, user: User, upload_missing: bool = True) -> Optional[str]:
+    """
+    Fully reconcile the user's vector store (see reconcile_vector_store).
+    
+    Returns:
+        The vector store ID if available, otherwise None.
+    """
+    result = await reconcile_vector_store(db, user, upload_missing=upload_missing)
+    return result.vector_store_id
 
 
 async def cancel_active_run(thread_id: str, run_id: str) -> None:
@@ -0,0 +1,37 @@
+"""Opaque cursors for keyset pagination over (created_at, id)"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursorError(ValueError):
+    """The cursor was not produced by encode_cursor"""
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the position of the last row on a page."""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor into (created_at, id)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def before_cursor(created_at_column: Any, id_column: Any, cursor: str) -> Any:
+    """WHERE clause for rows that come after the cursor in (created_at, id) descending order."""
+    created_at, row_id = decode_cursor(cursor)
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < row_id),
+    )
@@ -0,0 +1,116 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint
+
+Lets the chat path be load tested offline without API keys or cost:
+
+    python app/backend/fake_llm_provider.py --port 8900 --latency 0.05
+    CHAT_BACKEND=chat_completions CHAT_COMPLETIONS_BASE_URL=http://localhost:8900/v1 ...
+
+Replies echo the last user message so tests can check what was sent.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import os
+import time
+import uuid
+
+# Add project root to path
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+_project_root = os.path.dirname(os.path.dirname(_backend_dir))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def _last_user_text(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+            return content or ""
+    return ""
+
+
+def create_app(latency: float = 0.0, chunk_words: int = 1, chunk_delay: float = 0.0) -> FastAPI:
+    """
+    Build the fake provider.
+
+    Args:
+        latency: Seconds before the first token (or the whole reply)
+        chunk_words: Words per streamed chunk
+        chunk_delay: Seconds between streamed chunks
+    """
+    app = FastAPI(title="Fake LLM provider")
+    app.state.requests = []  # Request bodies, for tests to inspect
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests.append(body)
+        messages = body.get("messages", [])
+        model = body.get("model", "fake-model")
+        reply = f"Echo: {_last_user_text(messages)} (history: {len(messages) - 2} messages)"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        await asyncio.sleep(latency)
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def _chunk(delta: dict, finish_reason=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def generate():
+            yield _chunk({"role": "assistant", "content": ""})
+            words = reply.split(" ")
+            for i in range(0, len(words), chunk_words):
+                text = " ".join(words[i:i + chunk_words])
+                yield _chunk({"content": text if i == 0 else " " + text})
+                if chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+            yield _chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--chunk-words", type=int, default=1, help="Words per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency, args.chunk_words, args.chunk_delay), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
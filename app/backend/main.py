@@ -17,6 +17,11 @@ import logging
 
 from app.backend.core.config import settings
 from app.backend.core.database import init_db, close_db
+from app.backend.services.run_tracker import run_tracker
+from app.backend.services.ingestion_worker import ingestion_worker
+from app.backend.services.log_writer import log_writer
+from app.backend.services.thread_pool import thread_pool
+from app.backend.services.analytics_export import export_worker
 
 # Configure logging
 logging.basicConfig(
@@ -33,9 +38,22 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up Crypto Curriculum Platform...")
     # Note: Database tables should be created via Alembic migrations
     # await init_db()  # Only use if not using Alembic
+    run_tracker.start()
+    ingestion_worker.start()
+    export_worker.start()
+    if settings.LOG_WRITER_ENABLED:
+        log_writer.start()
+    if settings.THREAD_POOL_ENABLED and settings.CHAT_BACKEND == "assistants":
+        thread_pool.start()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    await thread_pool.stop()
+    await export_worker.stop()
+    await ingestion_worker.stop()
+    await run_tracker.stop()
+    # Flush buffered query logs while the database is still reachable
+    await log_writer.stop()
     await close_db()
 
 
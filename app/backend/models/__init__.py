@@ -10,6 +10,15 @@ from app.backend.models.notification import Notification, ChatMessage, LearningR
 from app.backend.models.query_log import QueryLog
 from app.backend.models.thread_map import ThreadMap
 from app.backend.models.document import Document
+from app.backend.models.document_blob import DocumentBlob
+from app.backend.models.vector_store_sync import VectorStoreSyncOp, VectorStoreSyncState
+from app.backend.models.ingestion_job import DocumentIngestionJob
+from app.backend.models.context_snapshot import UserContextSnapshot
+from app.backend.models.thread_run import ThreadRun
+from app.backend.models.pooled_thread import PooledThread
+from app.backend.models.analytics_rollup import StudentDailyStats, CohortStats
+from app.backend.models.activity import ActivityEvent, ActivityKind, UserActivityMonth
+from app.backend.models.analytics_export import AnalyticsExport
 
 __all__ = [
     # User
@@ -47,7 +56,21 @@ __all__ = [
     # AI Chat
     "QueryLog",
     "ThreadMap",
+    "ThreadRun",
+    "PooledThread",
+    "UserContextSnapshot",
     # Documents
     "Document",
+    "DocumentBlob",
+    "VectorStoreSyncOp",
+    "VectorStoreSyncState",
+    "DocumentIngestionJob",
+    # Analytics
+    "StudentDailyStats",
+    "CohortStats",
+    "ActivityEvent",
+    "ActivityKind",
+    "UserActivityMonth",
+    "AnalyticsExport",
 ]
 
@@ -0,0 +1,49 @@
+"""Learner activity: an append-only event stream and its per-month day bitmaps"""
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+import enum
+
+
+class ActivityKind(str, enum.Enum):
+    """What the learner did"""
+    SUBMISSION = "submission"
+    LESSON_VIEW = "lesson_view"
+    FORUM_POST = "forum_post"
+    CHAT_TURN = "chat_turn"
+
+
+class ActivityEvent(Base):
+    """One learner action; rows are only ever inserted"""
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        Index("ix_activity_events_user_occurred", "user_id", "occurred_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(20), nullable=False)  # ActivityKind value
+    occurred_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ActivityEvent(user_id={self.user_id}, kind='{self.kind}', occurred_at={self.occurred_at})>"
+
+
+class UserActivityMonth(Base):
+    """
+    The UTC days of one month on which a user was active.
+
+    Bit d-1 of active_days is set when the user did anything on day d, so a
+    year of history is twelve small rows per user.
+    """
+    __tablename__ = "user_activity_months"
+    __table_args__ = (
+        Index("ix_user_activity_months_month", "month"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the month
+    active_days = Column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<UserActivityMonth(user_id={self.user_id}, month={self.month}, active_days={self.active_days:#x})>"
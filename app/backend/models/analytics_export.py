@@ -0,0 +1,35 @@
+"""Offline cohort report model"""
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class AnalyticsExport(Base):
+    """Queued cohort report, written to a file under DOCUMENT_STORAGE_PATH by the export worker"""
+    __tablename__ = "analytics_exports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cohort_id = Column(Integer, ForeignKey("cohorts.id", ondelete="CASCADE"), nullable=False, index=True)
+    requested_by = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    dataset = Column(String(20), nullable=False)  # 'students', 'attempts'
+    format = Column(String(10), nullable=False)  # 'csv', 'parquet'
+
+    # Job state
+    status = Column(String(20), nullable=False, default="pending", index=True)  # 'pending', 'running', 'completed', 'failed'
+    rows_total = Column(Integer, nullable=True)  # Counted when the worker starts the report
+    rows_written = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Lease held by the worker writing the file
+    claim_token = Column(String(32), nullable=True)  # New on every claim; updates from a worker that lost the lease match nothing
+
+    # Result
+    file_path = Column(String(500), nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<AnalyticsExport(id={self.id}, cohort_id={self.cohort_id}, status='{self.status}', rows_written={self.rows_written})>"
@@ -0,0 +1,46 @@
+"""Precomputed analytics rollups maintained alongside submissions and progress updates"""
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class StudentDailyStats(Base):
+    """
+    One student's activity on one UTC day.
+
+    modules_completed and modules_in_progress are net changes (a module
+    leaving COMPLETED counts -1), so their sum over all days is the
+    student's current count.
+    """
+    __tablename__ = "student_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    graded_attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    score_sum = Column(Float, default=0.0, server_default="0", nullable=False)  # Sum of graded attempts' percentage scores
+    modules_completed = Column(Integer, default=0, server_default="0", nullable=False)
+    modules_in_progress = Column(Integer, default=0, server_default="0", nullable=False)
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<StudentDailyStats(user_id={self.user_id}, day={self.day}, attempts={self.attempts})>"
+
+
+class CohortStats(Base):
+    """Totals over a cohort's student members; deleted when membership changes and rebuilt on read"""
+    __tablename__ = "cohort_stats"
+
+    cohort_id = Column(Integer, ForeignKey("cohorts.id", ondelete="CASCADE"), primary_key=True)
+
+    total_students = Column(Integer, default=0, server_default="0", nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    graded_attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    score_sum = Column(Float, default=0.0, server_default="0", nullable=False)
+    modules_completed = Column(Integer, default=0, server_default="0", nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<CohortStats(cohort_id={self.cohort_id}, total_students={self.total_students})>"
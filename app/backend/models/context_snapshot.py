@@ -0,0 +1,30 @@
+"""Materialized per-user learning context for the AI assistant"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class UserContextSnapshot(Base):
+    """
+    Precomputed context sections for one user.
+
+    Each section is refreshed when its source data changes, so a chat
+    message reads this row instead of querying progress, attempts,
+    achievements and forum posts.
+    """
+    __tablename__ = "user_context_snapshots"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Sections, in the shape gather_user_context returns them
+    progress = Column(JSON, nullable=False, default=list)
+    recent_assessments = Column(JSON, nullable=False, default=list)
+    achievements = Column(JSON, nullable=False, default=list)
+    recent_forum_activity = Column(JSON, nullable=False, default=list)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<UserContextSnapshot(user_id={self.user_id})>"
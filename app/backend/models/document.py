@@ -9,17 +9,24 @@ from sqlalchemy import (
     Text,
 )
 from sqlalchemy.sql import func
+from pathlib import Path
 from app.backend.core.database import Base
 
 
+def _storage_name(context) -> str:
+    return Path(context.get_current_parameters()["storage_path"]).name
+
+
 class Document(Base):
     """Stores reference documents for AI context and downloads"""
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
-    filename = Column(String(255), nullable=False)  # Original filename
+    filename = Column(String(255), nullable=False, index=True)  # Original filename
     storage_path = Column(Text, nullable=False)  # Local path on disk
+    storage_name = Column(String(255), nullable=True, index=True, default=_storage_name)  # Last component of storage_path (the name OpenAI cites)
+    content_hash = Column(String(64), ForeignKey("document_blobs.sha256"), nullable=True, index=True)  # sha256 of the content
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String(100), nullable=True)
     category = Column(String(50), nullable=False, default="user-upload", index=True)
@@ -27,6 +34,7 @@ class Document(Base):
     course_scope = Column(String(100), nullable=True)
     uploader_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     openai_file_id = Column(String(255), nullable=True)
+    ingestion_status = Column(String(20), nullable=False, default="pending", index=True)  # 'pending', 'processing', 'ready', 'failed', 'skipped'
     is_deleted = Column(Boolean, default=False, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
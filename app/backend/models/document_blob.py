@@ -0,0 +1,21 @@
+"""Content-addressed blob model shared by identical documents"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class DocumentBlob(Base):
+    """One stored file per distinct content (sha256), referenced by any number of documents"""
+    __tablename__ = "document_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_path = Column(Text, nullable=False)  # Local path on disk
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Live (not deleted) documents using this blob
+    openai_file_id = Column(String(255), nullable=True)  # Shared OpenAI file for this content
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<DocumentBlob(sha256='{self.sha256[:12]}', ref_count={self.ref_count}, openai_file_id='{self.openai_file_id}')>"
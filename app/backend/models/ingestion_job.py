@@ -0,0 +1,26 @@
+"""Document ingestion job model for background OpenAI uploads"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class DocumentIngestionJob(Base):
+    """Durable work item: upload a document to OpenAI and attach it to its owner's vector store"""
+    __tablename__ = "document_ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # Job state
+    status = Column(String(20), nullable=False, default="pending", index=True)  # 'pending', 'processing', 'completed', 'failed', 'cancelled'
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True, index=True)  # NULL = run as soon as possible
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Lease held by the worker processing the job
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<DocumentIngestionJob(id={self.id}, document_id={self.document_id}, status='{self.status}', attempts={self.attempts})>"
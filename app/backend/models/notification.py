@@ -1,5 +1,5 @@
 """Notification and chat models"""
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.backend.core.database import Base
@@ -35,6 +35,11 @@ class Notification(Base):
 class ChatMessage(Base):
     """Logs AI assistant chat sessions"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id): per conversation, and across a user's history
+        Index("ix_chat_messages_user_conversation_created_id", "user_id", "conversation_id", "created_at", "id"),
+        Index("ix_chat_messages_user_created_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -0,0 +1,16 @@
+"""Pre-created OpenAI threads waiting for a conversation"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class PooledThread(Base):
+    """An empty OpenAI thread no conversation has claimed yet (claiming deletes the row)"""
+    __tablename__ = "pooled_threads"
+
+    id = Column(Integer, primary_key=True, index=True)
+    thread_id = Column(String(255), unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<PooledThread(thread_id='{self.thread_id}')>"
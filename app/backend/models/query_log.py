@@ -16,6 +16,7 @@ class QueryLog(Base):
     response = Column(Text, nullable=False)
     operation_type = Column(String(50), nullable=True)  # 'chat', 'stream', etc.
     conversation_id = Column(Integer, nullable=True, index=True)
+    cache_status = Column(String(10), nullable=True)  # 'hit', 'miss', 'bypass'; NULL when the answer cache is off
     
     # Metadata
     ip_address = Column(String(45), nullable=True)  # IPv6 compatible
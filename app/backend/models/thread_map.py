@@ -1,20 +1,31 @@
 """Thread mapping model for OpenAI conversation management"""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index, Sequence
 from sqlalchemy.sql import func
 from app.backend.core.database import Base
 
 
+# Server-assigned conversation IDs; starts above the old timestamp-derived 9-digit IDs
+CONVERSATION_ID_START = 10 ** 9
+conversation_id_seq = Sequence("conversation_id_seq", start=CONVERSATION_ID_START, metadata=Base.metadata)
+
+
 class ThreadMap(Base):
-    """Map conversation_id (frontend) to OpenAI thread_id"""
+    """Map conversation_id (frontend) to OpenAI thread_id (None on the chat completions backend)"""
     __tablename__ = "thread_maps"
+    __table_args__ = (
+        # Conversation list: a user's conversations, most recently used first
+        Index("ix_thread_maps_user_id_last_used_at", "user_id", "last_used_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, unique=True, nullable=False, index=True)
-    thread_id = Column(String(255), unique=True, nullable=False, index=True)
+    thread_id = Column(String(255), unique=True, nullable=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Conversation metadata
     title = Column(String(200), nullable=True)  # User-defined or auto-generated title
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)  # Maintained with each stored ChatMessage
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,24 @@
+"""Registry of the OpenAI run each thread has in flight"""
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class ThreadRun(Base):
+    """
+    The run we started on an OpenAI thread and have not seen settle.
+
+    A sender claims the row (locked_until) while it cancels the previous run,
+    adds its message and starts a new run, so concurrent sends into one
+    thread take turns across workers.
+    """
+    __tablename__ = "thread_runs"
+
+    thread_id = Column(String(255), primary_key=True)
+    run_id = Column(String(255), nullable=True)  # NULL while a sender is starting its run
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Claim lease of the current sender
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ThreadRun(thread_id='{self.thread_id}', run_id='{self.run_id}')>"
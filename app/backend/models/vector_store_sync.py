@@ -0,0 +1,36 @@
+"""Vector store sync models for incremental OpenAI file_search updates"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.backend.core.database import Base
+
+
+class VectorStoreSyncOp(Base):
+    """Pending change to the documents visible in one or all users' vector stores"""
+    __tablename__ = "vector_store_sync_ops"
+
+    id = Column(Integer, primary_key=True, index=True)  # Increasing, but concurrent writers may commit out of order
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)  # NULL = shared document
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    operation = Column(String(20), nullable=False)  # 'add' or 'remove'
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<VectorStoreSyncOp(id={self.id}, user_id={self.user_id}, document_id={self.document_id}, operation='{self.operation}')>"
+
+
+class VectorStoreSyncState(Base):
+    """Per-user watermark: sync ops already applied to the user's vector store"""
+    __tablename__ = "vector_store_sync_states"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    vector_store_id = Column(String(255), nullable=False)  # Store the watermark applies to
+    last_op_id = Column(Integer, nullable=False, default=0)  # Every op up to here is applied
+    applied_op_ids = Column(JSON, nullable=True)  # Ops past last_op_id applied while lower IDs may still commit
+
+    # Timestamps
+    last_full_sync_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<VectorStoreSyncState(user_id={self.user_id}, vector_store_id='{self.vector_store_id}', last_op_id={self.last_op_id})>"
@@ -0,0 +1,36 @@
+"""Recompute the analytics rollup tables from quiz attempts, progress and activity events
+
+Run after deploying the rollup or activity migrations, or to verify the
+incrementally maintained rows: python -m app.backend.rebuild_analytics
+"""
+import asyncio
+import sys
+import os
+
+# Add project root to path
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+_project_root = os.path.dirname(os.path.dirname(_backend_dir))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from app.backend.core.database import AsyncSessionLocal, close_db
+from app.backend.services.analytics_rollups import rebuild_rollups
+from app.backend.services.activity import backfill_activity_events, rebuild_activity_months
+
+
+async def main():
+    """Rebuild student_daily_stats, cohort_stats and user_activity_months"""
+    print("Rebuilding analytics rollups...")
+    async with AsyncSessionLocal() as db:
+        counts = await rebuild_rollups(db)
+        backfilled = await backfill_activity_events(db)
+        counts["user_activity_months"] = await rebuild_activity_months(db)
+    for kind, rows in backfilled.items():
+        print(f"✓ activity_events: {rows} {kind} events backfilled")
+    for table, rows in counts.items():
+        print(f"✓ {table}: {rows} rows")
+    await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,6 +18,7 @@ class DocumentResponse(BaseModel):
     owner: Optional[str] = None
     type: Optional[str] = None
     tags: Optional[List[str]] = None
+    ingestion_status: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -31,3 +32,13 @@ class DocumentListResponse(BaseModel):
 class DocumentUploadResponse(DocumentResponse):
     """Upload response schema (alias for now)"""
     pass
+
+
+class DocumentIngestionResponse(BaseModel):
+    """Schema for polling a document's background ingestion"""
+    document_id: int
+    status: str
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
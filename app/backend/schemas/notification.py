@@ -59,7 +59,8 @@ class ChatMessageResponse(BaseModel):
 class ChatHistoryResponse(BaseModel):
     """Schema for chat history response"""
     messages: List[ChatMessageResponse]
-    total: int
+    total: Optional[int] = Field(None, description="Set on the first page and in offset mode; omitted on cursor pages")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch older messages")
 
 
 class ConversationResponse(BaseModel):
@@ -88,6 +89,7 @@ class ConversationDetailResponse(BaseModel):
     last_message_at: Optional[datetime]
     message_count: int
     messages: List[ChatMessageResponse]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch earlier messages")
 
 
 class ConversationTitleUpdate(BaseModel):
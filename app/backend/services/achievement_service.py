@@ -14,6 +14,7 @@ from app.backend.models.forum import ForumPost, ForumVote
 from app.backend.models.module import Module
 from app.backend.models.user import User
 from app.backend.services.notification_service import create_notification
+from app.backend.services.context_service import refresh_context_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -94,6 +95,7 @@ async def check_achievements(
     
     if newly_unlocked:
         await db.commit()
+        await refresh_context_snapshot(db, user_id, ("achievements",))
     
     return newly_unlocked
 
@@ -0,0 +1,282 @@
+"""Activity events and the per-user monthly day bitmaps behind streaks and active-user counts"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, and_, cast, delete, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core.database import dialect_insert
+from app.backend.models.activity import ActivityEvent, ActivityKind, UserActivityMonth
+from app.backend.models.forum import ForumPost
+from app.backend.models.notification import ChatMessage
+from app.backend.models.progress import QuizAttempt
+from app.backend.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Windows reported by active_user_counts, in days ending on the given day
+ACTIVE_USER_WINDOWS = {"dau": 1, "wau": 7, "mau": 30}
+
+
+def utc_day(at: Optional[datetime] = None) -> date:
+    """The UTC calendar day of a timestamp (naive timestamps are taken as UTC)"""
+    if at is None:
+        return datetime.now(timezone.utc).date()
+    if at.tzinfo is None:
+        return at.date()
+    return at.astimezone(timezone.utc).date()
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def month_masks(start: date, end: date) -> Dict[date, int]:
+    """For each month touched by [start, end], the active_days bits of the days inside it"""
+    masks: Dict[date, int] = {}
+    day = start
+    while day <= end:
+        first = month_start(day)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        masks[first] = ((1 << last.day) - 1) ^ ((1 << (day.day - 1)) - 1)
+        day = next_month
+    return masks
+
+
+def pack_days(months: Iterable[Tuple[date, int]], base: date) -> int:
+    """Join monthly bitmaps into one integer whose bit i is the day `base + i`"""
+    bits = 0
+    for month, active_days in months:
+        offset = (month - base).days
+        bits |= active_days << offset if offset >= 0 else active_days >> -offset
+    return bits
+
+
+def streak_at(bits: int, position: int) -> int:
+    """Number of consecutive set bits ending at `position` (counting down)"""
+    if position < 0:
+        return 0
+    gaps = ~bits & ((1 << (position + 1)) - 1)
+    return position - (gaps.bit_length() - 1)
+
+
+def active_between(start: date, end: date) -> Any:
+    """SQL condition: the user_activity_months row has an active day in [start, end]"""
+    return or_(*(
+        and_(UserActivityMonth.month == month, UserActivityMonth.active_days.op("&")(mask) != 0)
+        for month, mask in month_masks(start, end).items()
+    ))
+
+
+async def record_activity(
+    db: AsyncSession, user_id: int, kind: ActivityKind, at: Optional[datetime] = None
+) -> None:
+    """
+    Append an activity event and mark its day in the user's month (not committed).
+
+    The month row is only rewritten the first time a day is marked.
+    """
+    at = at or datetime.now(timezone.utc)
+    day = utc_day(at)
+    await db.execute(insert(ActivityEvent).values(user_id=user_id, kind=kind.value, occurred_at=at))
+    upsert = dialect_insert(db)(UserActivityMonth).values(
+        user_id=user_id, month=month_start(day), active_days=1 << (day.day - 1)
+    )
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[UserActivityMonth.user_id, UserActivityMonth.month],
+        set_={"active_days": UserActivityMonth.active_days.op("|")(upsert.excluded.active_days)},
+        where=UserActivityMonth.active_days.op("&")(upsert.excluded.active_days) == 0,
+    ))
+
+
+async def current_streak_days(db: AsyncSession, user_id: int, today: Optional[date] = None) -> int:
+    """Consecutive active days ending today or yesterday (UTC)"""
+    today = today or utc_day()
+    result = await db.execute(
+        select(UserActivityMonth.month, UserActivityMonth.active_days)
+        .where(UserActivityMonth.user_id == user_id)
+        .where(UserActivityMonth.month <= today)
+        .order_by(UserActivityMonth.month)
+    )
+    months = result.all()
+    if not months:
+        return 0
+    base = months[0].month
+    bits = pack_days(months, base)
+    position = (today - base).days
+    if not (bits >> position) & 1:
+        position -= 1
+    return streak_at(bits, position)
+
+
+async def active_days_between(db: AsyncSession, user_id: int, start: date, end: date) -> int:
+    """Days in [start, end] on which the user was active"""
+    masks = month_masks(start, end)
+    result = await db.execute(
+        select(UserActivityMonth.month, UserActivityMonth.active_days)
+        .where(UserActivityMonth.user_id == user_id)
+        .where(UserActivityMonth.month.in_(list(masks)))
+    )
+    return sum((row.active_days & masks[row.month]).bit_count() for row in result.all())
+
+
+def active_users_query(start: date, end: date, user_ids: Any = None):
+    """SELECT of the number of distinct users active in [start, end], optionally among user_ids"""
+    query = (
+        select(func.count(func.distinct(UserActivityMonth.user_id)).label("active_users"))
+        .where(active_between(start, end))
+    )
+    if user_ids is not None:
+        query = query.where(UserActivityMonth.user_id.in_(user_ids))
+    return query
+
+
+async def active_user_counts(db: AsyncSession, end: date, user_ids: Any = None) -> Dict[str, int]:
+    """DAU, WAU and MAU as of `end`, in one query over at most two months of rows"""
+    longest = max(ACTIVE_USER_WINDOWS.values())
+    query = select(*(
+        func.count(func.distinct(UserActivityMonth.user_id))
+        .filter(active_between(end - timedelta(days=days - 1), end))
+        .label(name)
+        for name, days in ACTIVE_USER_WINDOWS.items()
+    )).where(UserActivityMonth.month.in_(list(month_masks(end - timedelta(days=longest - 1), end))))
+    if user_ids is not None:
+        query = query.where(UserActivityMonth.user_id.in_(user_ids))
+    row = (await db.execute(query)).one()
+    return {name: row._mapping[name] for name in ACTIVE_USER_WINDOWS}
+
+
+async def daily_active_users(
+    db: AsyncSession, start: date, end: date, user_ids: Any = None
+) -> List[Dict[str, Any]]:
+    """Active users per day in [start, end]; one row per month comes back from the database"""
+    masks = month_masks(start, end)
+    query = (
+        select(
+            UserActivityMonth.month,
+            *(func.count().filter(UserActivityMonth.active_days.op("&")(1 << bit) != 0) for bit in range(31)),
+        )
+        .where(UserActivityMonth.month.in_(list(masks)))
+        .group_by(UserActivityMonth.month)
+    )
+    if user_ids is not None:
+        query = query.where(UserActivityMonth.user_id.in_(user_ids))
+    by_month = {row[0]: row[1:] for row in (await db.execute(query)).all()}
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        counts = by_month.get(month_start(day))
+        series.append({"date": day.isoformat(), "active_users": counts[day.day - 1] if counts else 0})
+    return series
+
+
+async def retention_curve(
+    db: AsyncSession, start: date, end: date, weeks: int = 8, today: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Weekly retention of the users who signed up in [start, end].
+
+    Week k covers days 7k..7k+6 after each user's signup day; a user counts
+    toward week k only once that week is over.
+    """
+    today = today or utc_day()
+    signups = (
+        select(User.id, User.created_at)
+        .where(User.created_at >= datetime.combine(start, time(), timezone.utc))
+        .where(User.created_at < datetime.combine(end + timedelta(days=1), time(), timezone.utc))
+    )
+    signup_days = {row.id: utc_day(row.created_at) for row in (await db.execute(signups)).all()}
+
+    base = month_start(start)
+    months: Dict[int, List[Tuple[date, int]]] = defaultdict(list)
+    if signup_days:
+        result = await db.execute(
+            select(UserActivityMonth.user_id, UserActivityMonth.month, UserActivityMonth.active_days)
+            .where(UserActivityMonth.user_id.in_(signups.with_only_columns(User.id)))
+            .where(UserActivityMonth.month >= base)
+        )
+        for row in result.all():
+            months[row.user_id].append((row.month, row.active_days))
+
+    eligible = [0] * weeks
+    retained = [0] * weeks
+    week_mask = (1 << 7) - 1
+    for user_id, signup_day in signup_days.items():
+        bits = pack_days(months.get(user_id, ()), base)
+        offset = (signup_day - base).days
+        for week in range(weeks):
+            if signup_day + timedelta(days=7 * week + 6) > today:
+                break
+            eligible[week] += 1
+            if (bits >> (offset + 7 * week)) & week_mask:
+                retained[week] += 1
+
+    return [
+        {
+            "week": week,
+            "users": eligible[week],
+            "retained": retained[week],
+            "rate": round(retained[week] / eligible[week] * 100, 2) if eligible[week] else 0.0,
+        }
+        for week in range(weeks)
+    ]
+
+
+def _utc_month_and_day(db: AsyncSession, column: Any) -> Tuple[Any, Any]:
+    if db.get_bind().dialect.name == "postgresql":
+        utc = func.timezone("UTC", column)
+        return cast(func.date_trunc("month", utc), Date), cast(func.extract("day", utc), Integer)
+    return func.date(column, "start of month"), cast(func.strftime("%d", column), Integer)
+
+
+async def backfill_activity_events(db: AsyncSession) -> Dict[str, int]:
+    """
+    Add events for submissions, forum posts and chat turns recorded before the stream existed (committed).
+
+    Only rows older than the first event of their kind are copied, so running
+    it again adds nothing. Lesson views were never stored and cannot be backfilled.
+    """
+    sources = {
+        ActivityKind.SUBMISSION: (QuizAttempt.user_id, QuizAttempt.attempted_at),
+        ActivityKind.FORUM_POST: (ForumPost.user_id, ForumPost.created_at),
+        ActivityKind.CHAT_TURN: (ChatMessage.user_id, ChatMessage.created_at),
+    }
+    counts = {}
+    for kind, (user_id, occurred_at) in sources.items():
+        first = await db.scalar(select(func.min(ActivityEvent.occurred_at)).where(ActivityEvent.kind == kind.value))
+        history = select(user_id, literal(kind.value), occurred_at)
+        if first is not None:
+            history = history.where(occurred_at < first)
+        result = await db.execute(
+            insert(ActivityEvent).from_select(["user_id", "kind", "occurred_at"], history)
+        )
+        counts[kind.value] = result.rowcount
+    await db.commit()
+    return counts
+
+
+async def rebuild_activity_months(db: AsyncSession) -> int:
+    """
+    Recompute user_activity_months from activity_events in one INSERT ... SELECT (committed).
+
+    Returns:
+        Month rows written
+    """
+    month, day = _utc_month_and_day(db, ActivityEvent.occurred_at)
+    days = select(ActivityEvent.user_id, month.label("month"), day.label("day")).distinct().subquery()
+    # Each active day appears once, so summing its bit is a bitwise OR
+    months = (
+        select(days.c.user_id, days.c.month, func.sum(literal(1).op("<<")(days.c.day - 1)))
+        .group_by(days.c.user_id, days.c.month)
+    )
+    await db.execute(delete(UserActivityMonth))
+    result = await db.execute(
+        UserActivityMonth.__table__.insert().from_select(["user_id", "month", "active_days"], months)
+    )
+    await db.commit()
+    logger.info(f"Rebuilt user_activity_months: {result.rowcount} rows")
+    return result.rowcount
@@ -0,0 +1,199 @@
+"""Admission control for AI chat: per-user token buckets and a global concurrency limit"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """A chat turn was refused; retry_after is a suggested wait in whole seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+
+
+class ChatSlot:
+    """A held concurrency slot; release() is idempotent"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._acquired_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._acquired_at)
+
+    async def __aenter__(self) -> "ChatSlot":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Decide whether a chat turn may start.
+
+    Each user has a token bucket (rate_per_minute sustained, burst at once).
+    Admitted turns then share max_concurrent slots; up to max_queued turns
+    wait for one, for at most queue_timeout seconds. Anything beyond that is
+    rejected with a Retry-After estimate instead of piling onto OpenAI and the
+    database pool. Limits apply per app process.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = settings.CHAT_USER_RATE_PER_MINUTE,
+        burst: int = settings.CHAT_USER_BURST,
+        max_concurrent: int = settings.CHAT_MAX_CONCURRENT,
+        max_queued: int = settings.CHAT_MAX_QUEUED,
+        queue_timeout: float = settings.CHAT_QUEUE_TIMEOUT_SECONDS,
+        max_tracked_users: int = 10000,
+        history_size: int = 1000,
+    ):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_tracked_users = max_tracked_users
+
+        self._buckets: "OrderedDict[int, _Bucket]" = OrderedDict()
+        self._active = 0
+        self._waiters: deque = deque()
+
+        self._admitted = 0
+        self._rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self._max_queue_depth = 0
+        self._wait_history: deque = deque(maxlen=history_size)
+        self._hold_history: deque = deque(maxlen=history_size)
+
+    async def acquire(self, user_id: int) -> ChatSlot:
+        """
+        Charge the user's bucket and wait for a concurrency slot.
+
+        Raises:
+            AdmissionRejected: The user is over their rate, or no slot freed up in time
+        """
+        self._take_token(user_id)
+        try:
+            waited = await self._wait_for_slot()
+        except AdmissionRejected:
+            # The turn never ran; do not charge the user for it
+            self._refund_token(user_id)
+            raise
+        self._admitted += 1
+        self._wait_history.append(waited)
+        return ChatSlot(self)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return slot usage, queue depth and wait-time statistics for this process."""
+        waits = sorted(self._wait_history)
+        holds = sorted(self._hold_history)
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self._max_queue_depth,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "wait_seconds_p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+            "wait_seconds_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+            "wait_seconds_max": round(waits[-1], 3) if waits else 0.0,
+            "hold_seconds_p50": round(holds[len(holds) // 2], 3) if holds else 0.0,
+        }
+
+    def _take_token(self, user_id: int) -> None:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = _Bucket(tokens=float(self.burst), updated_at=now)
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.max_tracked_users:
+                # The least recently active user's bucket has refilled long ago
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate_per_second)
+            bucket.updated_at = now
+
+        if bucket.tokens < 1:
+            self._rejected["rate_limited"] += 1
+            raise AdmissionRejected("rate_limited", (1 - bucket.tokens) / self.rate_per_second)
+        bucket.tokens -= 1
+
+    def _refund_token(self, user_id: int) -> None:
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            bucket.tokens = min(self.burst, bucket.tokens + 1)
+
+    async def _wait_for_slot(self) -> float:
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queued:
+            self._rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full", self._estimated_wait())
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        try:
+            # _release() hands its slot over by resolving the future
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the wait timed out; give it back
+                self._release(None)
+            else:
+                waiter.cancel()
+            self._rejected["queue_timeout"] += 1
+            raise AdmissionRejected("queue_timeout", self._estimated_wait())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(None)
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return time.monotonic() - started
+
+    def _release(self, held_seconds: Optional[float]) -> None:
+        if held_seconds is not None:
+            self._hold_history.append(held_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the next waiter; _active is unchanged
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _estimated_wait(self) -> float:
+        """Seconds until a queued turn would likely get a slot, from recent hold times"""
+        holds = sorted(self._hold_history)
+        typical = holds[len(holds) // 2] if holds else 1.0
+        return typical * (len(self._waiters) + 1) / self.max_concurrent
+
+
+chat_admission = AdmissionController()
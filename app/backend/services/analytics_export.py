@@ -0,0 +1,501 @@
+"""Streaming CSV/Parquet exports of cohort performance and the worker that writes report files"""
+import asyncio
+import csv
+import enum
+import io
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.models.analytics_export import AnalyticsExport
+from app.backend.models.analytics_rollup import StudentDailyStats
+from app.backend.models.assessment import Assessment
+from app.backend.models.cohort import CohortMember, CohortRole
+from app.backend.models.module import Module
+from app.backend.models.progress import QuizAttempt
+from app.backend.models.user import User
+from app.backend.services.analytics_rollups import attempt_score
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+class ExportLeaseLost(Exception):
+    """Raised when another worker has re-claimed the report being written"""
+    pass
+
+
+class ExportFormatUnavailable(Exception):
+    """The requested format needs an optional package that is not installed"""
+
+
+def _load_pyarrow() -> Tuple[Any, Any]:
+    try:
+        import pyarrow as pa  # Optional dependency
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportFormatUnavailable("Parquet export requires the optional 'pyarrow' package") from e
+    return pa, pq
+
+
+def check_format(export_format: str) -> None:
+    """Raise ExportFormatUnavailable if the format cannot be written in this process."""
+    if export_format == "parquet":
+        _load_pyarrow()
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """Columns (name, kind) of one export and the query producing them in that order"""
+    columns: Tuple[Tuple[str, str], ...]
+    key: Any  # Unique first column; rows are ordered and paged by it
+    query: Callable[[int], Any]
+
+
+def _student_members(cohort_id: int):
+    return (
+        select(CohortMember.user_id)
+        .where(CohortMember.cohort_id == cohort_id)
+        .where(CohortMember.role == CohortRole.STUDENT.value)
+    )
+
+
+def _students_query(cohort_id: int):
+    """One row per student member, summed from their daily rollup rows"""
+    graded = func.sum(StudentDailyStats.graded_attempts)
+    return (
+        select(
+            CohortMember.user_id,
+            User.username,
+            User.email,
+            User.full_name,
+            CohortMember.joined_at,
+            func.coalesce(func.sum(StudentDailyStats.attempts), 0),
+            func.coalesce(graded, 0),
+            func.sum(StudentDailyStats.score_sum) / func.nullif(graded, 0),
+            func.coalesce(func.sum(StudentDailyStats.modules_completed), 0),
+            func.coalesce(func.sum(StudentDailyStats.modules_in_progress), 0),
+            func.max(StudentDailyStats.last_activity_at),
+        )
+        .join(User, User.id == CohortMember.user_id)
+        .outerjoin(StudentDailyStats, StudentDailyStats.user_id == CohortMember.user_id)
+        .where(CohortMember.cohort_id == cohort_id)
+        .where(CohortMember.role == CohortRole.STUDENT.value)
+        .group_by(CohortMember.user_id, User.username, User.email, User.full_name, CohortMember.joined_at)
+    )
+
+
+def _attempts_query(cohort_id: int):
+    """Every quiz attempt by the cohort's students"""
+    return (
+        select(
+            QuizAttempt.id,
+            QuizAttempt.user_id,
+            User.username,
+            Module.id,
+            Module.title,
+            QuizAttempt.assessment_id,
+            QuizAttempt.attempted_at,
+            QuizAttempt.points_earned,
+            Assessment.points,
+            attempt_score(),
+            QuizAttempt.review_status,
+            QuizAttempt.time_spent_seconds,
+        )
+        .join(User, User.id == QuizAttempt.user_id)
+        .join(Assessment, Assessment.id == QuizAttempt.assessment_id)
+        .join(Module, Module.id == Assessment.module_id)
+        .where(QuizAttempt.user_id.in_(_student_members(cohort_id)))
+    )
+
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    "students": ExportDataset(
+        columns=(
+            ("user_id", "int"), ("username", "str"), ("email", "str"), ("full_name", "str"),
+            ("joined_at", "datetime"), ("attempts", "int"), ("graded_attempts", "int"),
+            ("average_score", "float"), ("modules_completed", "int"), ("modules_in_progress", "int"),
+            ("last_activity_at", "datetime"),
+        ),
+        key=CohortMember.user_id,
+        query=_students_query,
+    ),
+    "attempts": ExportDataset(
+        columns=(
+            ("attempt_id", "int"), ("user_id", "int"), ("username", "str"), ("module_id", "int"),
+            ("module_title", "str"), ("assessment_id", "int"), ("attempted_at", "datetime"),
+            ("points_earned", "int"), ("points_possible", "int"), ("score", "float"),
+            ("review_status", "str"), ("time_spent_seconds", "int"),
+        ),
+        key=QuizAttempt.id,
+        query=_attempts_query,
+    ),
+}
+
+
+def _plain(row: Sequence[Any]) -> Tuple[Any, ...]:
+    return tuple(value.value if isinstance(value, enum.Enum) else value for value in row)
+
+
+class CsvEncoder:
+    """Encodes row chunks as CSV; every chunk is complete lines"""
+
+    def __init__(self, columns: Sequence[Tuple[str, str]]):
+        self._names = [name for name, _ in columns]
+
+    @staticmethod
+    def _lines(rows: Sequence[Sequence[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        return buffer.getvalue().encode()
+
+    def start(self) -> bytes:
+        return self._lines([self._names])
+
+    def encode(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        return self._lines(rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """Encodes each row chunk as one Parquet row group; only the file footer is held until finish()"""
+
+    def __init__(self, columns: Sequence[Tuple[str, str]]):
+        pa, pq = _load_pyarrow()
+        types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "datetime": pa.timestamp("us", tz="UTC")}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self._sink = _ByteSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+    def start(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        arrays = [
+            self._pa.array(values, type=field.type)
+            for values, field in zip(zip(*rows), self._schema)
+        ]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def make_encoder(export_format: str, columns: Sequence[Tuple[str, str]]):
+    return ParquetEncoder(columns) if export_format == "parquet" else CsvEncoder(columns)
+
+
+async def read_pages(
+    session_factory: async_sessionmaker, dataset: ExportDataset, cohort_id: int, chunk_rows: int
+) -> AsyncIterator[List[Any]]:
+    """
+    Yield the dataset in keyset pages, each read in its own short session.
+
+    No connection is held between pages, so a slow download does not keep
+    one checked out of the pool.
+    """
+    last_key = None
+    while True:
+        query = dataset.query(cohort_id)
+        if last_key is not None:
+            query = query.where(dataset.key > last_key)
+        async with session_factory() as db:
+            result = await db.execute(query.order_by(dataset.key).limit(chunk_rows))
+            rows = result.all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_rows:
+            return
+        last_key = rows[-1][0]
+
+
+async def stream_export(
+    session_factory: async_sessionmaker,
+    cohort_id: int,
+    dataset_name: str,
+    export_format: str,
+    chunk_rows: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Encoded export bytes, produced one chunk of rows at a time (encoding runs off the event loop)"""
+    dataset = EXPORT_DATASETS[dataset_name]
+    encoder = make_encoder(export_format, dataset.columns)
+    yield encoder.start()
+    async for rows in read_pages(session_factory, dataset, cohort_id, chunk_rows or settings.EXPORT_CHUNK_ROWS):
+        yield await asyncio.to_thread(encoder.encode, [_plain(row) for row in rows])
+    yield encoder.finish()
+
+
+def export_file_path(export: AnalyticsExport) -> Path:
+    """Where a report's file is written"""
+    name = f"cohort-{export.cohort_id}-{export.dataset}-{export.id}.{export.format}"
+    return Path(settings.DOCUMENT_STORAGE_PATH) / "exports" / name
+
+
+class ExportWorker:
+    """
+    Write queued cohort reports to files under DOCUMENT_STORAGE_PATH.
+
+    Jobs are claimed with a lease like document ingestion jobs. The worker
+    reads through one server-side cursor (yield_per) into a .part file and
+    records rows_written after every chunk, which also renews the lease; a
+    report whose worker died is restarted from the beginning.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        poll_interval: float = settings.EXPORT_POLL_INTERVAL_SECONDS,
+        max_concurrency: int = settings.EXPORT_MAX_CONCURRENCY,
+        lease_seconds: float = settings.EXPORT_LEASE_SECONDS,
+        chunk_rows: int = settings.EXPORT_CHUNK_ROWS,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        self.lease_seconds = lease_seconds
+        self.chunk_rows = chunk_rows
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._completed = 0
+        self._failed = 0
+        self._rows_written = 0
+
+    def start(self) -> None:
+        """Start the worker loop on the running event loop."""
+        if self._task and not self._task.done():
+            return
+        if self.session_factory is None:
+            from app.backend.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run_loop(), name="analytics-export-worker")
+        logger.info("Export worker started")
+
+    async def stop(self) -> None:
+        """Stop the worker; unfinished reports restart after their lease expires."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Export worker stopped")
+
+    def notify(self) -> None:
+        """Wake the worker because a report was queued (no-op if it is not running)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return report outcome counters for this process."""
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "completed": self._completed,
+            "failed": self._failed,
+            "rows_written": self._rows_written,
+        }
+
+    async def run_once(self) -> int:
+        """
+        Write every report that is currently due.
+
+        Returns:
+            Number of reports claimed
+        """
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(AnalyticsExport.id)
+                .where(or_(
+                    AnalyticsExport.status == "pending",
+                    and_(AnalyticsExport.status == "running", AnalyticsExport.locked_until < now),
+                ))
+                .order_by(AnalyticsExport.id)
+                .limit(self.max_concurrency * 4)
+            )
+            export_ids = list(result.scalars().all())
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _bounded(export_id: int) -> bool:
+            async with semaphore:
+                return await self._process(export_id)
+
+        claimed = await asyncio.gather(*(_bounded(export_id) for export_id in export_ids))
+        return sum(claimed)
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Export worker pass failed: {e}")
+                claimed = 0
+
+            if claimed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _lease(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    async def _claim(self, db: AsyncSession, export_id: int) -> Optional[str]:
+        """Take the report's lease; returns the claim token, or None if another worker got it first."""
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        result = await db.execute(
+            update(AnalyticsExport)
+            .where(AnalyticsExport.id == export_id)
+            .where(or_(
+                AnalyticsExport.status == "pending",
+                and_(AnalyticsExport.status == "running", AnalyticsExport.locked_until < now),
+            ))
+            .values(status="running", rows_written=0, locked_until=self._lease(), claim_token=token)
+        )
+        await db.commit()
+        return token if result.rowcount == 1 else None
+
+    async def _update_claimed(self, export_id: int, token: str, **values: Any) -> bool:
+        """Update the report only while this claim still holds it; False if the lease was lost."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(AnalyticsExport)
+                .where(AnalyticsExport.id == export_id)
+                .where(AnalyticsExport.claim_token == token)
+                .values(**values)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _report_progress(self, export_id: int, token: str, rows_written: int) -> None:
+        if not await self._update_claimed(export_id, token, rows_written=rows_written, locked_until=self._lease()):
+            raise ExportLeaseLost(f"Export {export_id} was claimed by another worker")
+
+    async def _process(self, export_id: int) -> bool:
+        async with self.session_factory() as db:
+            token = await self._claim(db, export_id)
+            if token is None:
+                return False
+            export = await db.get(AnalyticsExport, export_id, populate_existing=True)
+            dataset = EXPORT_DATASETS[export.dataset]
+            export.rows_total = await db.scalar(
+                select(func.count()).select_from(dataset.query(export.cohort_id).subquery())
+            )
+            await db.commit()
+
+        path = export_file_path(export)
+        # Each claim writes its own partial file, so a stalled worker never shares one
+        partial = path.with_name(f"{path.name}.{token}.part")
+        try:
+            rows_written = await self._write(export, token, dataset, partial)
+            partial.replace(path)
+        except ExportLeaseLost as e:
+            partial.unlink(missing_ok=True)
+            logger.warning(f"Stopped writing export {export_id}: {e}")
+            return True
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            logger.error(f"Export {export_id} of cohort {export.cohort_id} failed: {e}")
+            await self._update_claimed(export_id, token, status="failed", last_error=str(e)[:1000], locked_until=None)
+            self._failed += 1
+            return True
+
+        # A complete file replaced atomically is harmless even if the lease was
+        # lost meanwhile; the current holder's file replaces it in turn
+        completed = await self._update_claimed(
+            export_id,
+            token,
+            status="completed",
+            rows_written=rows_written,
+            file_path=str(path),
+            size_bytes=path.stat().st_size,
+            last_error=None,
+            locked_until=None,
+            completed_at=datetime.now(timezone.utc),
+        )
+        if not completed:
+            logger.warning(f"Export {export_id} was claimed by another worker before it completed")
+            return True
+        self._completed += 1
+        logger.info(f"Export {export_id} wrote {rows_written} rows to {path}")
+        return True
+
+    async def _write(self, export: AnalyticsExport, token: str, dataset: ExportDataset, partial: Path) -> int:
+        """
+        Stream the dataset into `partial`; returns the number of rows written.
+
+        Raises:
+            ExportLeaseLost: If another worker re-claimed the report meanwhile
+        """
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        encoder = make_encoder(export.format, dataset.columns)
+        rows_written = 0
+        async with self.session_factory() as db:
+            result = await db.stream(
+                dataset.query(export.cohort_id)
+                .order_by(dataset.key)
+                .execution_options(yield_per=self.chunk_rows)
+            )
+            with partial.open("wb") as out:
+                out.write(encoder.start())
+                async for partition in result.partitions():
+                    rows = [_plain(row) for row in partition]
+                    data = await asyncio.to_thread(encoder.encode, rows)
+                    await asyncio.to_thread(out.write, data)
+                    rows_written += len(rows)
+                    self._rows_written += len(rows)
+                    await self._report_progress(export.id, token, rows_written)
+                out.write(encoder.finish())
+        return rows_written
+
+
+# Shared worker started by the application lifespan
+export_worker = ExportWorker()
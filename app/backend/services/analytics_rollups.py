@@ -0,0 +1,277 @@
+"""Incremental maintenance of student_daily_stats and cohort_stats"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, func, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core.database import dialect_insert
+from app.backend.models.analytics_rollup import CohortStats, StudentDailyStats
+from app.backend.models.assessment import Assessment
+from app.backend.models.cohort import CohortMember, CohortRole
+from app.backend.models.module import Module
+from app.backend.models.progress import ProgressStatus, QuizAttempt, UserProgress
+from app.backend.services.activity import active_users_query, utc_day
+
+logger = logging.getLogger(__name__)
+
+# Counters that also roll up into cohort_stats
+_COHORT_COUNTERS = ("attempts", "graded_attempts", "score_sum", "modules_completed")
+
+
+def attempt_score():
+    """Percentage score of one graded attempt; NULL while the attempt awaits grading"""
+    return QuizAttempt.points_earned * 100.0 / func.nullif(Assessment.points, 0)
+
+
+def progress_deltas(old: Optional[ProgressStatus], new: ProgressStatus) -> Tuple[int, int]:
+    """(modules_completed, modules_in_progress) changes for a progress status transition"""
+    completed = int(new == ProgressStatus.COMPLETED) - int(old == ProgressStatus.COMPLETED)
+    in_progress = int(new == ProgressStatus.IN_PROGRESS) - int(old == ProgressStatus.IN_PROGRESS)
+    return completed, in_progress
+
+
+async def record_student_activity(
+    db: AsyncSession,
+    user_id: int,
+    at: Optional[datetime] = None,
+    *,
+    attempts: int = 0,
+    graded_attempts: int = 0,
+    score_sum: float = 0.0,
+    modules_completed: int = 0,
+    modules_in_progress: int = 0,
+) -> None:
+    """
+    Add to the student's row for the day of `at` and to their cohorts' totals.
+
+    Runs in the caller's transaction (not committed), so the rollups commit
+    together with the attempt or progress change they describe.
+    """
+    at = at or datetime.now(timezone.utc)
+    insert = dialect_insert(db)(StudentDailyStats).values(
+        user_id=user_id,
+        day=utc_day(at),
+        attempts=attempts,
+        graded_attempts=graded_attempts,
+        score_sum=score_sum,
+        modules_completed=modules_completed,
+        modules_in_progress=modules_in_progress,
+        last_activity_at=at,
+    )
+    excluded = insert.excluded
+    await db.execute(insert.on_conflict_do_update(
+        index_elements=[StudentDailyStats.user_id, StudentDailyStats.day],
+        set_={
+            "attempts": StudentDailyStats.attempts + excluded.attempts,
+            "graded_attempts": StudentDailyStats.graded_attempts + excluded.graded_attempts,
+            "score_sum": StudentDailyStats.score_sum + excluded.score_sum,
+            "modules_completed": StudentDailyStats.modules_completed + excluded.modules_completed,
+            "modules_in_progress": StudentDailyStats.modules_in_progress + excluded.modules_in_progress,
+            "last_activity_at": case(
+                (StudentDailyStats.last_activity_at >= excluded.last_activity_at, StudentDailyStats.last_activity_at),
+                else_=excluded.last_activity_at,
+            ),
+        },
+    ))
+
+    deltas = {
+        "attempts": attempts,
+        "graded_attempts": graded_attempts,
+        "score_sum": score_sum,
+        "modules_completed": modules_completed,
+    }
+    if any(deltas.values()):
+        # Cohorts without a cohort_stats row are built from the daily rows on first read
+        await db.execute(
+            update(CohortStats)
+            .where(CohortStats.cohort_id.in_(
+                select(CohortMember.cohort_id)
+                .where(CohortMember.user_id == user_id)
+                .where(CohortMember.role == CohortRole.STUDENT.value)
+            ))
+            .values({name: getattr(CohortStats, name) + value for name, value in deltas.items() if value})
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def invalidate_cohort_stats(db: AsyncSession, cohort_id: int) -> None:
+    """Drop a cohort's totals after its membership changed (in the caller's transaction)."""
+    await db.execute(delete(CohortStats).where(CohortStats.cohort_id == cohort_id))
+
+
+def _cohort_totals_query():
+    """Per-cohort totals over student members, summed from their daily rows"""
+    per_student = (
+        select(
+            StudentDailyStats.user_id,
+            *(func.sum(getattr(StudentDailyStats, name)).label(name) for name in _COHORT_COUNTERS),
+        )
+        .group_by(StudentDailyStats.user_id)
+        .subquery()
+    )
+    return (
+        select(
+            CohortMember.cohort_id,
+            func.count(CohortMember.user_id).label("total_students"),
+            *(func.coalesce(func.sum(per_student.c[name]), 0).label(name) for name in _COHORT_COUNTERS),
+        )
+        .outerjoin(per_student, per_student.c.user_id == CohortMember.user_id)
+        .where(CohortMember.role == CohortRole.STUDENT.value)
+        .group_by(CohortMember.cohort_id)
+    )
+
+
+async def load_cohort_stats(db: AsyncSession, cohort_id: int) -> CohortStats:
+    """The cohort's totals, rebuilt from student_daily_stats (and committed) if missing."""
+    stats = await db.get(CohortStats, cohort_id, populate_existing=True)
+    if stats is not None:
+        return stats
+
+    row = (await db.execute(_cohort_totals_query().where(CohortMember.cohort_id == cohort_id))).first()
+    values = {name: getattr(row, name) if row else 0 for name in ("total_students", *_COHORT_COUNTERS)}
+    insert = dialect_insert(db)(CohortStats).values(cohort_id=cohort_id, **values)
+    # A concurrent reader may have rebuilt it first; both computed the same totals
+    await db.execute(insert.on_conflict_do_update(index_elements=[CohortStats.cohort_id], set_=values))
+    await db.commit()
+    return await db.get(CohortStats, cohort_id, populate_existing=True)
+
+
+def _utc_date(db: AsyncSession, column: Any) -> Any:
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+async def rebuild_rollups(db: AsyncSession) -> Dict[str, int]:
+    """
+    Recompute every rollup row from quiz_attempts and user_progress (committed).
+
+    Progress rows count on the day they were last accessed, so per-day history
+    differs from the incremental rows but every per-student and per-cohort
+    total matches.
+
+    Returns:
+        Rows written per table
+    """
+    score = attempt_score()
+    attempts = (
+        select(
+            QuizAttempt.user_id.label("user_id"),
+            _utc_date(db, QuizAttempt.attempted_at).label("day"),
+            literal(1).label("attempts"),
+            case((score.isnot(None), 1), else_=0).label("graded_attempts"),
+            func.coalesce(score, 0.0).label("score_sum"),
+            literal(0).label("modules_completed"),
+            literal(0).label("modules_in_progress"),
+            QuizAttempt.attempted_at.label("last_activity_at"),
+        )
+        .join(Assessment, Assessment.id == QuizAttempt.assessment_id)
+    )
+    progress = select(
+        UserProgress.user_id,
+        _utc_date(db, UserProgress.last_accessed_at),
+        literal(0),
+        literal(0),
+        literal(0.0),
+        case((UserProgress.status == ProgressStatus.COMPLETED, 1), else_=0),
+        case((UserProgress.status == ProgressStatus.IN_PROGRESS, 1), else_=0),
+        UserProgress.last_accessed_at,
+    )
+    source = union_all(attempts, progress).subquery()
+    daily_columns = ("attempts", "graded_attempts", "score_sum", "modules_completed", "modules_in_progress")
+    daily = (
+        select(
+            source.c.user_id,
+            source.c.day,
+            *(func.sum(source.c[name]) for name in daily_columns),
+            func.max(source.c.last_activity_at),
+        )
+        .group_by(source.c.user_id, source.c.day)
+    )
+
+    await db.execute(delete(CohortStats))
+    await db.execute(delete(StudentDailyStats))
+    result = await db.execute(
+        StudentDailyStats.__table__.insert().from_select(
+            ["user_id", "day", *daily_columns, "last_activity_at"], daily
+        )
+    )
+    daily_rows = result.rowcount
+    result = await db.execute(
+        CohortStats.__table__.insert().from_select(
+            ["cohort_id", "total_students", *_COHORT_COUNTERS], _cohort_totals_query()
+        )
+    )
+    cohort_rows = result.rowcount
+    await db.commit()
+    logger.info(f"Rebuilt analytics rollups: {daily_rows} student days, {cohort_rows} cohorts")
+    return {"student_daily_stats": daily_rows, "cohort_stats": cohort_rows}
+
+
+async def cohort_summary(
+    db: AsyncSession, cohort_id: int, start: date, end: date, inactive_days: int = 7
+) -> Dict[str, Any]:
+    """
+    Everything get_cohort_analytics reports, from the rollups.
+
+    Four queries: cohort totals, the published module count, one row per
+    student member with their summed daily stats, and the number of members
+    active in [start, end] from their monthly activity bitmaps.
+    """
+    stats = await load_cohort_stats(db, cohort_id)
+    total_modules = await db.scalar(select(func.count(Module.id)).where(Module.is_published == True)) or 0
+    students = (
+        select(CohortMember.user_id)
+        .where(CohortMember.cohort_id == cohort_id)
+        .where(CohortMember.role == CohortRole.STUDENT.value)
+    )
+    active_students = await db.scalar(active_users_query(start, end, students))
+
+    result = await db.execute(
+        select(
+            CohortMember.user_id,
+            func.coalesce(func.sum(StudentDailyStats.modules_completed), 0).label("completed"),
+            func.coalesce(func.sum(StudentDailyStats.modules_in_progress), 0).label("in_progress"),
+            func.max(StudentDailyStats.last_activity_at).label("last_activity_at"),
+        )
+        .outerjoin(StudentDailyStats, StudentDailyStats.user_id == CohortMember.user_id)
+        .where(CohortMember.cohort_id == cohort_id)
+        .where(CohortMember.role == CohortRole.STUDENT.value)
+        .group_by(CohortMember.user_id)
+    )
+    members = result.all()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=inactive_days)
+    at_risk = []
+    for member in members:
+        last = member.last_activity_at
+        if last is None:
+            at_risk.append({"user_id": member.user_id, "reason": "No activity"})
+        elif (last if last.tzinfo else last.replace(tzinfo=timezone.utc)) < cutoff:
+            at_risk.append({"user_id": member.user_id, "reason": f"Inactive >{inactive_days} days"})
+
+    top_performers = sorted(
+        ({"user_id": m.user_id, "modules_completed": m.completed} for m in members if m.completed > 0),
+        key=lambda x: x["modules_completed"],
+        reverse=True,
+    )[:5]
+
+    possible = stats.total_students * total_modules
+    completion = (stats.modules_completed / possible * 100) if possible else 0.0
+    return {
+        "total_students": stats.total_students,
+        "active_students": active_students,
+        # Every module a student completed counts toward both figures
+        "average_progress": round(completion, 2),
+        "completion_rate": round(completion, 2),
+        "average_score": round(stats.score_sum / stats.graded_attempts, 2) if stats.graded_attempts else 0.0,
+        "students_by_progress": {
+            "completed": sum(1 for m in members if m.completed > 0),
+            "in_progress": sum(1 for m in members if m.in_progress > 0),
+            "not_started": sum(1 for m in members if m.completed <= 0 and m.in_progress <= 0),
+        },
+        "top_performers": top_performers,
+        "at_risk_students": at_risk,
+    }
@@ -0,0 +1,200 @@
+"""SQL-side aggregates behind the analytics endpoints"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core.cache import TTLCache, get_shared_cache_backend
+from app.backend.core.config import settings
+from app.backend.models.achievement import Achievement, UserAchievement
+from app.backend.models.assessment import Assessment
+from app.backend.models.module import Module
+from app.backend.models.progress import ProgressStatus, QuizAttempt, UserProgress
+from app.backend.models.user import User, UserRole
+from app.backend.services.activity import active_days_between, active_users_query, current_streak_days, utc_day
+from app.backend.services.analytics_rollups import attempt_score
+
+# The admin dashboard reads one platform-wide snapshot
+platform_snapshot_cache = TTLCache(
+    "platform-analytics",
+    maxsize=1,
+    ttl=settings.PLATFORM_ANALYTICS_TTL_SECONDS,
+    backend=get_shared_cache_backend(),
+)
+
+# One recompute at a time per process; concurrent readers wait and reuse it
+_platform_refresh_lock = asyncio.Lock()
+
+
+async def student_summary(
+    db: AsyncSession, user_id: int, start: date, end: date, recent_limit: int = 10
+) -> Dict[str, Any]:
+    """
+    Everything get_student_analytics reports, as grouped aggregates.
+
+    Seven small queries whose result size does not depend on how many progress
+    rows or quiz attempts the student has. The streak and the active days in
+    [start, end] come from the user's monthly activity bitmaps.
+    """
+    result = await db.execute(
+        select(
+            func.count().filter(UserProgress.status == ProgressStatus.COMPLETED).label("completed"),
+            func.count().filter(UserProgress.status == ProgressStatus.IN_PROGRESS).label("in_progress"),
+            func.count().filter(UserProgress.status == ProgressStatus.NOT_STARTED).label("not_started"),
+        ).where(UserProgress.user_id == user_id)
+    )
+    progress = result.one()
+
+    result = await db.execute(
+        select(func.count(QuizAttempt.id).label("attempts"), func.avg(attempt_score()).label("average_score"))
+        .join(Assessment, Assessment.id == QuizAttempt.assessment_id)
+        .where(QuizAttempt.user_id == user_id)
+    )
+    attempts = result.one()
+
+    result = await db.execute(
+        select(Module.id, Module.title, func.max(attempt_score()).label("best_score"))
+        .join(Assessment, Assessment.module_id == Module.id)
+        .join(QuizAttempt, QuizAttempt.assessment_id == Assessment.id)
+        .where(QuizAttempt.user_id == user_id)
+        .group_by(Module.id, Module.title)
+        .order_by(Module.id)
+    )
+    scores_by_module = [
+        {"module_id": row.id, "module_title": row.title, "best_score": round(row.best_score or 0.0, 2)}
+        for row in result.all()
+    ]
+
+    result = await db.execute(
+        select(func.count(UserAchievement.achievement_id), func.coalesce(func.sum(Achievement.points), 0))
+        .join(Achievement, Achievement.id == UserAchievement.achievement_id)
+        .where(UserAchievement.user_id == user_id)
+    )
+    total_achievements, total_points = result.one()
+
+    result = await db.execute(
+        select(UserProgress.module_id, Module.title, UserProgress.status, UserProgress.last_accessed_at)
+        .join(Module, Module.id == UserProgress.module_id)
+        .where(UserProgress.user_id == user_id)
+        .order_by(UserProgress.last_accessed_at.desc(), UserProgress.id.desc())
+        .limit(recent_limit)
+    )
+    recent_activity: List[Dict[str, Any]] = [
+        {
+            "module_id": row.module_id,
+            "module_title": row.title,
+            "status": row.status.value,
+            "updated_at": row.last_accessed_at.isoformat() if row.last_accessed_at else None,
+        }
+        for row in result.all()
+    ]
+
+    return {
+        "total_modules_completed": progress.completed,
+        "total_modules_started": progress.completed + progress.in_progress,
+        "modules_by_status": {
+            "completed": progress.completed,
+            "in_progress": progress.in_progress,
+            "not_started": progress.not_started,
+        },
+        "total_attempts": attempts.attempts,
+        "average_score": round(attempts.average_score or 0.0, 2),
+        "scores_by_module": scores_by_module,
+        "current_streak_days": await current_streak_days(db, user_id),
+        "active_days": await active_days_between(db, user_id, start, end),
+        "total_achievements": total_achievements,
+        "total_points": total_points,
+        "recent_activity": recent_activity,
+    }
+
+
+async def compute_platform_summary(db: AsyncSession, window_days: int = 30) -> Dict[str, Any]:
+    """
+    Platform-wide figures in two queries.
+
+    One row joins a single-row aggregate per table (users, assessments,
+    attempts, activity bitmaps); the second groups modules with their
+    progress rows by track. The result is JSON-safe so it can be cached.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=window_days)
+    users = select(
+        func.count(User.id).label("total_users"),
+        func.count(User.id).filter(User.role == UserRole.STUDENT).label("total_students"),
+        func.count(User.id).filter(User.role == UserRole.INSTRUCTOR).label("total_instructors"),
+        func.count(User.id).filter(User.created_at >= cutoff).label("new_users"),
+    ).subquery()
+    assessments = select(func.count(Assessment.id).label("total_assessments")).subquery()
+    attempts = (
+        select(func.count(QuizAttempt.id).label("total_attempts"), func.avg(attempt_score()).label("average_score"))
+        .join(Assessment, Assessment.id == QuizAttempt.assessment_id)
+        .subquery()
+    )
+    today = utc_day(now)
+    active = active_users_query(today - timedelta(days=window_days - 1), today).subquery()
+    result = await db.execute(
+        select(users, assessments, attempts, active)
+        .select_from(users)
+        .join(assessments, true())
+        .join(attempts, true())
+        .join(active, true())
+    )
+    totals = result.one()
+
+    result = await db.execute(
+        select(
+            Module.track,
+            func.count(func.distinct(Module.id)).label("modules"),
+            func.count(UserProgress.id).label("progress"),
+            func.count(UserProgress.id).filter(UserProgress.status == ProgressStatus.COMPLETED).label("completed"),
+        )
+        .outerjoin(UserProgress, UserProgress.module_id == Module.id)
+        .group_by(Module.track)
+    )
+    tracks = [row for row in result.all() if row.track]
+    progress_records = sum(row.progress for row in tracks)
+    completed = sum(row.completed for row in tracks)
+
+    return {
+        "total_users": totals.total_users,
+        "total_students": totals.total_students,
+        "total_instructors": totals.total_instructors,
+        "total_modules": sum(row.modules for row in tracks),
+        "total_assessments": totals.total_assessments,
+        "total_attempts": totals.total_attempts,
+        "average_completion_rate": round(completed / progress_records * 100, 2) if progress_records else 0.0,
+        "average_score": round(totals.average_score or 0.0, 2),
+        "active_users_last_30_days": totals.active_users,
+        "new_users_last_30_days": totals.new_users,
+        "modules_by_track": {row.track.value: row.modules for row in tracks},
+        "completion_by_track": {
+            row.track.value: round(row.completed / row.progress * 100, 2) for row in tracks if row.progress
+        },
+        "computed_at": now.isoformat(),
+    }
+
+
+async def platform_summary(db: AsyncSession, refresh: bool = False) -> Dict[str, Any]:
+    """
+    The cached platform snapshot, recomputed once it is older than the TTL.
+
+    With refresh=True the snapshot is recomputed now; readers that were
+    waiting on a recompute reuse its result instead of starting another.
+    """
+    if not refresh:
+        snapshot = await platform_snapshot_cache.get("platform")
+        if snapshot is not None:
+            return snapshot
+
+    requested_at = datetime.now(timezone.utc)
+    async with _platform_refresh_lock:
+        snapshot = await platform_snapshot_cache.get("platform")
+        if snapshot is not None and (
+            not refresh or datetime.fromisoformat(snapshot["computed_at"]) >= requested_at
+        ):
+            return snapshot
+        snapshot = await compute_platform_summary(db)
+        await platform_snapshot_cache.set("platform", snapshot)
+    return snapshot
@@ -0,0 +1,87 @@
+"""Opt-in cache of AI assistant answers to repeated curriculum questions"""
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional
+
+from app.backend.core.cache import TTLCache, get_shared_cache_backend
+from app.backend.core.config import settings
+
+# Answers keyed by normalized question, module/lesson and curriculum content version
+answer_cache = TTLCache(
+    "chat-answers",
+    maxsize=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+    backend=get_shared_cache_backend(),
+)
+
+# Questions about the student themselves ("why did I fail", "my progress")
+_PERSONAL_PATTERN = re.compile(r"\b(i|i'm|i've|i'd|me|my|mine|myself)\b", re.IGNORECASE)
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+# Client context keys that do not personalize the answer
+_SHARED_CONTEXT_KEYS = {"current_module_id", "current_lesson_id"}
+
+# Learning context keys that are the same for every student viewing a module;
+# cacheable answers are generated from these alone
+_SHARED_PROMPT_KEYS = ("current_context", "available_modules", "catalog_version", "content_version")
+
+_bypassed: Dict[str, int] = {}
+
+
+def normalize_prompt(sanitized_message: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a sanitized message"""
+    text = _WHITESPACE.sub(" ", sanitized_message.lower()).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def bypass_reason(
+    sanitized_message: str,
+    context_payload: Optional[Dict[str, Any]],
+    image_document_ids: Optional[list[int]],
+    has_documents: bool,
+    has_history: bool,
+) -> Optional[str]:
+    """Why a message must not be answered from (or stored in) the cache, or None"""
+    if image_document_ids:
+        return "images"
+    if has_documents:
+        # file_search may ground the answer in the student's own uploads
+        return "documents"
+    if has_history:
+        # Follow-ups depend on the earlier turns of the conversation
+        return "follow_up"
+    if any(value for key, value in (context_payload or {}).items() if key not in _SHARED_CONTEXT_KEYS):
+        return "personal_context"
+    if _PERSONAL_PATTERN.search(sanitized_message):
+        return "personal_question"
+    return None
+
+
+def answer_cache_key(
+    sanitized_message: str,
+    module_id: Optional[int],
+    lesson_id: Optional[int],
+    content_version: str,
+) -> str:
+    payload = json.dumps([normalize_prompt(sanitized_message), module_id, lesson_id, content_version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def shared_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The learning context without the student's own sections, for answers other students may be served"""
+    return {key: context[key] for key in _SHARED_PROMPT_KEYS if key in context}
+
+
+def record_bypass(reason: str) -> None:
+    _bypassed[reason] = _bypassed.get(reason, 0) + 1
+
+
+def answer_cache_metrics() -> Dict[str, Any]:
+    """Return cache counters plus how many messages skipped the cache, by reason."""
+    return {
+        "enabled": settings.ANSWER_CACHE_ENABLED,
+        **answer_cache.stats(),
+        "bypassed": dict(_bypassed),
+    }
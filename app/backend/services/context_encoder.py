@@ -0,0 +1,268 @@
+"""Token-budgeted rendering of the learning context sent with each AI assistant message"""
+import logging
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rendered curriculum sections keyed by catalog version
+_curriculum_cache: "OrderedDict[str, Tuple[List[str], List[int]]]" = OrderedDict()
+_CURRICULUM_CACHE_SIZE = 4
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+_encoded_messages = 0
+_truncated_messages = 0
+_curriculum_renders = 0
+_tokens_by_section: Dict[str, int] = {}
+
+
+def _get_tokenizer():
+    """tiktoken's encoder if installed, otherwise None (tokens are estimated)"""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.info(f"tiktoken unavailable, estimating context tokens from length: {e}")
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Count (or, without tiktoken, estimate at ~4 characters per token) the tokens in text."""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class EncodedContext:
+    """Rendered context with its token cost per section and the items left out"""
+    text: str
+    tokens: int
+    budget: int
+    sections: Dict[str, int] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+
+def _module_titles(context: Dict[str, Any]) -> Dict[int, str]:
+    return {m.get("id"): m.get("title") for m in context.get("available_modules", [])}
+
+
+def _module_label(module_id: Any, titles: Dict[int, str]) -> str:
+    title = titles.get(module_id)
+    return f"Module {module_id} ({title})" if title else f"Module {module_id}"
+
+
+def _student_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    user_info = context.get("user")
+    lines = []
+    if user_info:
+        lines.append(f"Student: {user_info.get('username', 'Unknown')} (ID: {user_info.get('id')})")
+        lines.append(f"Role: {user_info.get('role', 'student')}")
+    current = context.get("current_context", {})
+    if current.get("module_id"):
+        lines.append(f"\nCurrently viewing: {_module_label(current.get('module_id'), titles)}")
+        if current.get("lesson_id"):
+            lines.append(f"Lesson: {current.get('lesson_id')}")
+    return lines
+
+
+def _progress_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    progress = context.get("progress", [])
+    completed = [p for p in progress if p.get("status") == "completed"]
+    in_progress = [p for p in progress if p.get("status") == "in_progress"]
+    lines = []
+    if completed:
+        lines.append(f"- Completed modules: {len(completed)}")
+    if in_progress:
+        lines.append(f"- In progress modules: {len(in_progress)}")
+        for p in in_progress[:5]:  # Most recently accessed first
+            lines.append(f"  * {_module_label(p.get('module_id'), titles)}: {p.get('completion_percentage') or 0:.0f}% complete")
+    return lines
+
+
+def _assessment_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    assessments = context.get("recent_assessments", [])
+    if not assessments:
+        return []
+    correct = sum(1 for a in assessments if a.get("is_correct") is True)
+    total = len(assessments)
+    lines = [f"Recent accuracy: {correct}/{total} ({100 * correct / total:.0f}%)"]
+    pending = sum(1 for a in assessments if a.get("review_status") in ("pending", "needs_review"))
+    if pending:
+        lines.append(f"Awaiting instructor review: {pending}")
+    incorrect = [a for a in assessments if a.get("is_correct") is False]
+    if incorrect:
+        lines.append(f"Areas to review: {len(incorrect)} recent incorrect answers")
+        modules = list(dict.fromkeys(a.get("module_id") for a in incorrect if a.get("module_id")))
+        lines.extend(f"- {_module_label(module_id, titles)}" for module_id in modules[:5])
+    return lines
+
+
+def _assignment_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    lines = []
+    for item in context.get("assignments", [])[:5]:
+        if isinstance(item, dict):
+            title = item.get("title") or item.get("name") or "Assignment"
+            due = item.get("due_date") or item.get("due") or item.get("deadline")
+            lines.append(f"- {title}" + (f" (due {due})" if due else ""))
+        else:
+            lines.append(f"- {item}")
+    return lines
+
+
+def _achievement_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    return [f"- {a.get('name')}: {a.get('description') or ''}" for a in context.get("achievements", [])[:5]]
+
+
+def _calendar_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    lines = []
+    for event in context.get("calendar_events", [])[:5]:
+        if isinstance(event, dict):
+            title = event.get("title") or event.get("name") or "Event"
+            when = event.get("start") or event.get("date") or event.get("starts_at")
+            lines.append(f"- {title}" + (f" on {when}" if when else ""))
+        else:
+            lines.append(f"- {event}")
+    return lines
+
+
+def _note_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    lines = []
+    for note in context.get("notes", [])[:3]:
+        if isinstance(note, dict):
+            snippet = note.get("summary") or note.get("content") or note.get("text") or ""
+        else:
+            snippet = str(note)
+        trimmed = (snippet[:180] + "...") if len(snippet) > 180 else snippet
+        lines.append(f"- {trimmed}")
+    return lines
+
+
+def _forum_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    return [
+        f"- {p.get('title') or 'Reply'}" + (" (solved)" if p.get("is_solved") else "")
+        for p in context.get("recent_forum_activity", [])[:3]
+    ]
+
+
+def _additional_lines(context: Dict[str, Any], titles: Dict[int, str]) -> List[str]:
+    instructions = context.get("additional_instructions")
+    return str(instructions).splitlines() if instructions else []
+
+
+def _curriculum(context: Dict[str, Any]) -> Tuple[List[str], List[int]]:
+    """Curriculum lines and their token counts, rendered once per catalog version"""
+    global _curriculum_renders
+    version = context.get("catalog_version")
+    if version and version in _curriculum_cache:
+        _curriculum_cache.move_to_end(version)
+        return _curriculum_cache[version]
+
+    modules = context.get("available_modules", [])
+    tracks: Dict[Any, List[Dict[str, Any]]] = {}
+    for m in modules:
+        tracks.setdefault(m.get("track", "Unknown"), []).append(m)
+    lines = [f"Total modules: {len(modules)}"] if modules else []
+    for track, track_modules in tracks.items():
+        names = "; ".join(f"{m.get('id')} {m.get('title')}" for m in track_modules)
+        lines.append(f"- {track} track ({len(track_modules)} modules): {names}")
+    rendered = (lines, [count_tokens(line + "\n") for line in lines])
+    _curriculum_renders += 1
+
+    if version:
+        _curriculum_cache[version] = rendered
+        while len(_curriculum_cache) > _CURRICULUM_CACHE_SIZE:
+            _curriculum_cache.popitem(last=False)
+    return rendered
+
+
+# Per-user sections in priority order: when the budget runs out, later
+# sections (and the tail of a section) are dropped first
+_SECTIONS = (
+    ("additional_instructions", "## Additional Context:", _additional_lines),
+    ("progress", "## Learning Progress:", _progress_lines),
+    ("recent_assessments", "## Recent Assessment Performance:", _assessment_lines),
+    ("assignments", "## Upcoming Assignments: {count}", _assignment_lines),
+    ("curriculum", "## Available Curriculum:", None),
+    ("achievements", "## Achievements Earned: {count}", _achievement_lines),
+    ("calendar_events", "## Calendar Events: {count}", _calendar_lines),
+    ("notes", "## Notes & Highlights: {count}", _note_lines),
+    ("recent_forum_activity", "## Recent Forum Activity: {count} posts", _forum_lines),
+)
+
+
+def encode_context(context: Dict[str, Any], budget: Optional[int] = None) -> EncodedContext:
+    """
+    Render the student context within a token budget.
+
+    The student header (if the context has a user) is always included. Other sections are added in
+    priority order, line by line, until the budget is spent; whatever does
+    not fit is counted in `dropped`. The same context and budget always
+    give the same output.
+    """
+    global _encoded_messages, _truncated_messages
+    budget = settings.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    titles = _module_titles(context)
+
+    parts = _student_lines(context, titles)
+    used = sum(count_tokens(line + "\n") for line in parts)
+    sections = {"student": used}
+    dropped: Dict[str, int] = {}
+
+    for name, header, render in _SECTIONS:
+        if render is None:
+            lines, line_tokens = _curriculum(context)
+        else:
+            lines = render(context, titles)
+            line_tokens = [count_tokens(line + "\n") for line in lines]
+        if not lines:
+            continue
+
+        count = len(context.get(name, []) or [])
+        header_line = "\n" + header.format(count=count)
+        header_tokens = count_tokens(header_line + "\n")
+        kept = 0
+        for tokens in line_tokens:
+            cost = tokens + (header_tokens if kept == 0 else 0)
+            if used + cost > budget:
+                break
+            used += cost
+            kept += 1
+        if kept:
+            parts.append(header_line)
+            parts.extend(lines[:kept])
+            sections[name] = header_tokens + sum(line_tokens[:kept])
+        if kept < len(lines):
+            dropped[name] = len(lines) - kept
+
+    _encoded_messages += 1
+    if dropped:
+        _truncated_messages += 1
+    for name, tokens in sections.items():
+        _tokens_by_section[name] = _tokens_by_section.get(name, 0) + tokens
+
+    return EncodedContext(text="\n".join(parts), tokens=used, budget=budget, sections=sections, dropped=dropped)
+
+
+def context_encoder_metrics() -> Dict[str, Any]:
+    """Return average context tokens per section for this process."""
+    return {
+        "messages": _encoded_messages,
+        "truncated": _truncated_messages,
+        "curriculum_renders": _curriculum_renders,
+        "avg_tokens_by_section": {
+            name: round(tokens / _encoded_messages, 1) for name, tokens in _tokens_by_section.items()
+        } if _encoded_messages else {},
+    }
@@ -1,19 +1,431 @@
 """Context service for gathering user-specific learning data for AI assistant"""
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, desc, delete, func, literal_column
+from typing import Dict, Any, Optional, List, Iterable, Sequence
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
 import logging
 
+from app.backend.core.cache import TTLCache, get_shared_cache_backend
+from app.backend.core.config import settings
 from app.backend.models.user import User
-from app.backend.models.progress import UserProgress, QuizAttempt
-from app.backend.models.module import Module
+from app.backend.models.progress import UserProgress, QuizAttempt, ProgressStatus, ReviewStatus
+from app.backend.models.module import Module, Lesson
 from app.backend.models.assessment import Assessment
 from app.backend.models.achievement import UserAchievement, Achievement
 from app.backend.models.forum import ForumPost
+from app.backend.models.context_snapshot import UserContextSnapshot
 
 logger = logging.getLogger(__name__)
 
+# Per-user sections materialized in user_context_snapshots
+SNAPSHOT_SECTIONS = ("progress", "recent_assessments", "achievements", "recent_forum_activity")
+
+# The published module list is the same for every user
+module_catalog_cache = TTLCache(
+    "module-catalog",
+    maxsize=1,
+    ttl=settings.CONTEXT_MODULE_CATALOG_TTL_SECONDS,
+    backend=get_shared_cache_backend(),
+)
+
+# One build per user at a time; concurrent first messages wait and reuse it
+_build_locks: Dict[int, asyncio.Lock] = {}
+
+_snapshot_hits = 0
+_snapshot_misses = 0
+_snapshot_refresh_failures = 0
+
+
+async def _load_progress(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """User's progress across all modules, most recently accessed first"""
+    result = await db.execute(
+        select(UserProgress.module_id, UserProgress.status, UserProgress.completion_percentage, UserProgress.last_accessed_at)
+        .where(UserProgress.user_id == user_id)
+        .order_by(UserProgress.last_accessed_at.desc(), UserProgress.id.desc())
+    )
+    return [
+        {
+            "module_id": p.module_id,
+            "status": p.status.value if p.status else "not_started",
+            "completion_percentage": p.completion_percentage,
+            "last_accessed": p.last_accessed_at.isoformat() if p.last_accessed_at else None,
+        }
+        for p in result.all()
+    ]
+
+
+async def _load_recent_assessments(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """Last 20 assessment attempts"""
+    result = await db.execute(
+        select(
+            QuizAttempt.assessment_id, Assessment.module_id, QuizAttempt.is_correct,
+            QuizAttempt.review_status, QuizAttempt.attempted_at,
+        )
+        .join(Assessment, QuizAttempt.assessment_id == Assessment.id)
+        .where(QuizAttempt.user_id == user_id)
+        .order_by(desc(QuizAttempt.attempted_at), desc(QuizAttempt.id))
+        .limit(20)
+    )
+    return [
+        {
+            "assessment_id": a.assessment_id,
+            "module_id": a.module_id,
+            "is_correct": a.is_correct,
+            "review_status": a.review_status.value if a.review_status else None,
+            "attempted_at": a.attempted_at.isoformat() if a.attempted_at else None,
+        }
+        for a in result.all()
+    ]
+
+
+async def _load_achievements(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """Earned achievements, newest first"""
+    result = await db.execute(
+        select(Achievement.id, Achievement.name, Achievement.description, UserAchievement.earned_at)
+        .join(Achievement, UserAchievement.achievement_id == Achievement.id)
+        .where(UserAchievement.user_id == user_id)
+        .order_by(desc(UserAchievement.earned_at), UserAchievement.achievement_id)
+    )
+    return [
+        {
+            "id": a.id,
+            "name": a.name,
+            "description": a.description,
+            "earned_at": a.earned_at.isoformat() if a.earned_at else None,
+        }
+        for a in result.all()
+    ]
+
+
+async def _load_recent_forum_activity(db: AsyncSession, user_id: int) -> List[Dict[str, Any]]:
+    """Last 10 posts the user created"""
+    result = await db.execute(
+        select(ForumPost.id, ForumPost.module_id, ForumPost.title, ForumPost.is_solved, ForumPost.created_at)
+        .where(ForumPost.user_id == user_id)
+        .order_by(desc(ForumPost.created_at), desc(ForumPost.id))
+        .limit(10)
+    )
+    return [
+        {
+            "post_id": post.id,
+            "module_id": post.module_id,
+            "title": post.title,
+            "is_solved": post.is_solved,
+            "created_at": post.created_at.isoformat() if post.created_at else None,
+        }
+        for post in result.all()
+    ]
+
+
+_SECTION_LOADERS = {
+    "progress": _load_progress,
+    "recent_assessments": _load_recent_assessments,
+    "achievements": _load_achievements,
+    "recent_forum_activity": _load_recent_forum_activity,
+}
+
+
+# JSON aggregate functions per dialect: (array aggregate, object constructor)
+_JSON_AGGREGATES: Dict[str, tuple] = {
+    "sqlite": (func.json_group_array, func.json_object),
+    "postgresql": (func.json_agg, func.json_build_object),
+}
+
+
+def _json_rows(dialect: str, source, columns: Sequence[str]):
+    """Scalar subquery aggregating every row of source into a JSON array of objects"""
+    aggregate, build_object = _JSON_AGGREGATES[dialect]
+    pairs = []
+    for name in columns:
+        pairs.extend([literal_column(f"'{name}'"), source.c[name]])
+    return select(aggregate(build_object(*pairs))).select_from(source).scalar_subquery()
+
+
+def _decode_rows(value: Any) -> List[Dict[str, Any]]:
+    # json_agg over no rows is NULL; some drivers decode JSON results themselves
+    if value is None:
+        return []
+    return value if isinstance(value, list) else json.loads(value)
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    # JSON renders timestamptz in the session time zone; the ORM path returns UTC
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _enum_value(enum_cls: type, name: Optional[str]) -> Optional[str]:
+    # Enum columns store member names, the context carries member values
+    return enum_cls[name].value if name else None
+
+
+def _bool(value: Any) -> Optional[bool]:
+    # SQLite's json_object renders booleans as 0/1
+    return None if value is None else bool(value)
+
+
+async def _load_sections_single_query(db: AsyncSession, user_id: int, dialect: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch every snapshot section in one round trip with CTEs and JSON aggregation"""
+    progress = (
+        select(UserProgress.id, UserProgress.module_id, UserProgress.status, UserProgress.completion_percentage, UserProgress.last_accessed_at)
+        .where(UserProgress.user_id == user_id)
+        .cte("progress_rows")
+    )
+    attempts = (
+        select(
+            QuizAttempt.id, QuizAttempt.assessment_id, Assessment.module_id, QuizAttempt.is_correct,
+            QuizAttempt.review_status, QuizAttempt.attempted_at,
+        )
+        .join(Assessment, QuizAttempt.assessment_id == Assessment.id)
+        .where(QuizAttempt.user_id == user_id)
+        .order_by(desc(QuizAttempt.attempted_at), desc(QuizAttempt.id))
+        .limit(20)
+        .cte("attempt_rows")
+    )
+    achievements = (
+        select(Achievement.id, Achievement.name, Achievement.description, UserAchievement.earned_at)
+        .join(Achievement, UserAchievement.achievement_id == Achievement.id)
+        .where(UserAchievement.user_id == user_id)
+        .cte("achievement_rows")
+    )
+    posts = (
+        select(ForumPost.id, ForumPost.module_id, ForumPost.title, ForumPost.is_solved, ForumPost.created_at)
+        .where(ForumPost.user_id == user_id)
+        .order_by(desc(ForumPost.created_at), desc(ForumPost.id))
+        .limit(10)
+        .cte("post_rows")
+    )
+
+    row = (await db.execute(select(
+        _json_rows(dialect, progress, progress.c.keys()),
+        _json_rows(dialect, attempts, attempts.c.keys()),
+        _json_rows(dialect, achievements, achievements.c.keys()),
+        _json_rows(dialect, posts, posts.c.keys()),
+    ))).one()
+    progress_rows, attempt_rows, achievement_rows, post_rows = (_decode_rows(value) for value in row)
+
+    # Aggregates do not keep row order, so restore the loaders' ordering here
+    for rows, field in (
+        (progress_rows, "last_accessed_at"),
+        (attempt_rows, "attempted_at"),
+        (achievement_rows, "earned_at"),
+        (post_rows, "created_at"),
+    ):
+        for r in rows:
+            r[field] = _parse_datetime(r[field])
+    progress_rows.sort(key=lambda r: (r["last_accessed_at"], r["id"]), reverse=True)
+    attempt_rows.sort(key=lambda r: (r["attempted_at"], r["id"]), reverse=True)
+    achievement_rows.sort(key=lambda r: r["id"])
+    achievement_rows.sort(key=lambda r: r["earned_at"], reverse=True)
+    post_rows.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+
+    return {
+        "progress": [
+            {
+                "module_id": r["module_id"],
+                "status": _enum_value(ProgressStatus, r["status"]) or "not_started",
+                "completion_percentage": r["completion_percentage"],
+                "last_accessed": _iso(r["last_accessed_at"]),
+            }
+            for r in progress_rows
+        ],
+        "recent_assessments": [
+            {
+                "assessment_id": r["assessment_id"],
+                "module_id": r["module_id"],
+                "is_correct": _bool(r["is_correct"]),
+                "review_status": _enum_value(ReviewStatus, r["review_status"]),
+                "attempted_at": _iso(r["attempted_at"]),
+            }
+            for r in attempt_rows
+        ],
+        "achievements": [
+            {
+                "id": r["id"],
+                "name": r["name"],
+                "description": r["description"],
+                "earned_at": _iso(r["earned_at"]),
+            }
+            for r in achievement_rows
+        ],
+        "recent_forum_activity": [
+            {
+                "post_id": r["id"],
+                "module_id": r["module_id"],
+                "title": r["title"],
+                "is_solved": _bool(r["is_solved"]),
+                "created_at": _iso(r["created_at"]),
+            }
+            for r in post_rows
+        ],
+    }
+
+
+async def load_context_sections(db: AsyncSession, user_id: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load every snapshot section for a user.
+
+    On SQLite and PostgreSQL this is a single statement; other databases
+    fall back to one query per section. Either way the result has the same
+    shape as the per-section loaders.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in _JSON_AGGREGATES:
+        return await _load_sections_single_query(db, user_id, dialect)
+    return {name: await _SECTION_LOADERS[name](db, user_id) for name in SNAPSHOT_SECTIONS}
+
+
+async def _load_module_catalog(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Published modules plus version hashes, served from module_catalog_cache when possible.
+
+    Only the fields the context encoder renders are loaded; the version lets
+    it render the curriculum section once per catalog change. content_version
+    also changes when module or lesson content is edited (within the cache TTL),
+    which keys the answer cache.
+    """
+    catalog = await module_catalog_cache.get("published")
+    if catalog is not None:
+        return catalog
+
+    result = await db.execute(
+        select(Module.id, Module.title, Module.track, Module.order_index)
+        .where(Module.is_published == True)
+        .order_by(Module.order_index)
+    )
+    modules = [
+        {
+            "id": m.id,
+            "title": m.title,
+            "track": m.track.value if m.track else None,
+            "order_index": m.order_index,
+        }
+        for m in result.all()
+    ]
+    version = hashlib.sha256(json.dumps(modules, sort_keys=True).encode()).hexdigest()[:16]
+
+    edits = (await db.execute(
+        select(
+            select(func.max(Module.updated_at)).scalar_subquery(),
+            select(func.count(Lesson.id)).scalar_subquery(),
+            select(func.max(Lesson.updated_at)).scalar_subquery(),
+        )
+    )).one()
+    content_version = hashlib.sha256(
+        json.dumps([version, *(str(value) for value in edits)]).encode()
+    ).hexdigest()[:16]
+    catalog = {"version": version, "content_version": content_version, "modules": modules}
+    await module_catalog_cache.set("published", catalog)
+    return catalog
+
+
+async def _build_context_snapshot(db: AsyncSession, user_id: int) -> UserContextSnapshot:
+    """Compute every section and store a new snapshot row (committed)"""
+    sections = await load_context_sections(db, user_id)
+    try:
+        async with db.begin_nested():
+            snapshot = UserContextSnapshot(user_id=user_id, **sections)
+            db.add(snapshot)
+    except IntegrityError:
+        # A concurrent request built it first; overwrite with what we just read
+        snapshot = await db.get(UserContextSnapshot, user_id, populate_existing=True)
+        for name, value in sections.items():
+            setattr(snapshot, name, value)
+    await db.commit()
+    return snapshot
+
+
+async def refresh_context_snapshot(
+    db: AsyncSession,
+    user_id: int,
+    sections: Iterable[str] = SNAPSHOT_SECTIONS,
+) -> None:
+    """
+    Recompute some sections of a user's context snapshot after their data changed.
+
+    Call after committing the change. Only the named sections are queried;
+    if the user has no snapshot yet nothing is done, since it is built in
+    full on their next chat message. A failed refresh drops the snapshot so
+    stale context is never served.
+    """
+    global _snapshot_refresh_failures
+    try:
+        snapshot = await db.get(UserContextSnapshot, user_id, populate_existing=True)
+        if snapshot is None:
+            return
+        for name in sections:
+            setattr(snapshot, name, await _SECTION_LOADERS[name](db, user_id))
+        await db.commit()
+    except Exception as e:
+        _snapshot_refresh_failures += 1
+        logger.error(f"Error refreshing context snapshot for user {user_id}: {str(e)}")
+        await db.rollback()
+        try:
+            await db.execute(delete(UserContextSnapshot).where(UserContextSnapshot.user_id == user_id))
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Error dropping stale context snapshot for user {user_id}: {str(e)}")
+            await db.rollback()
+
+
+async def check_context_snapshots(
+    db: AsyncSession,
+    user_ids: Optional[Sequence[int]] = None,
+    repair: bool = False,
+) -> Dict[str, Any]:
+    """
+    Rebuild snapshots from the live queries and report sections that drifted.
+
+    Args:
+        db: Database session
+        user_ids: Users to check (default: every user with a snapshot)
+        repair: Overwrite drifted sections with the live values
+
+    Returns:
+        Number of snapshots checked and {user_id: [drifted sections]}
+    """
+    query = select(UserContextSnapshot).order_by(UserContextSnapshot.user_id)
+    if user_ids is not None:
+        query = query.where(UserContextSnapshot.user_id.in_(user_ids))
+    result = await db.execute(query.execution_options(populate_existing=True))
+    snapshots = result.scalars().all()
+
+    mismatched: Dict[int, List[str]] = {}
+    for snapshot in snapshots:
+        for name in SNAPSHOT_SECTIONS:
+            live = await _SECTION_LOADERS[name](db, snapshot.user_id)
+            if getattr(snapshot, name) != live:
+                mismatched.setdefault(snapshot.user_id, []).append(name)
+                if repair:
+                    setattr(snapshot, name, live)
+
+    if mismatched:
+        logger.warning(f"Context snapshots out of date for {len(mismatched)} users: {mismatched}")
+        if repair:
+            await db.commit()
+
+    return {"checked": len(snapshots), "mismatched": mismatched, "repaired": repair and bool(mismatched)}
+
+
+def context_snapshot_metrics() -> Dict[str, Any]:
+    """Return snapshot read and refresh counters for this process."""
+    return {
+        "hits": _snapshot_hits,
+        "misses": _snapshot_misses,
+        "refresh_failures": _snapshot_refresh_failures,
+        "module_catalog_cache": module_catalog_cache.stats(),
+    }
+
 
 async def gather_user_context(
     user: User,
@@ -26,7 +438,10 @@ async def gather_user_context(
     Gather user-specific learning context for AI assistant.
     
     Only includes information specific to this user for privacy and security.
+    Per-user sections come from the user's context snapshot (built on first
+    use), so a chat message costs one row read.
     """
+    global _snapshot_hits, _snapshot_misses
     context = {
         "user": {
             "id": user.id,
@@ -51,113 +466,29 @@ async def gather_user_context(
         if current_lesson_id:
             context["current_context"]["lesson_id"] = current_lesson_id
         
-        # Get user's progress across all modules
-        progress_result = await db.execute(
-            select(UserProgress)
-            .where(UserProgress.user_id == user.id)
-            .order_by(UserProgress.last_accessed_at.desc())
-        )
-        user_progress = progress_result.scalars().all()
-        
-        context["progress"] = [
-            {
-                "module_id": p.module_id,
-                "status": p.status.value if p.status else "not_started",
-                "completion_percentage": p.completion_percentage,
-                "last_accessed": p.last_accessed_at.isoformat() if p.last_accessed_at else None,
-                "started_at": p.started_at.isoformat() if p.started_at else None,
-                "completed_at": p.completed_at.isoformat() if p.completed_at else None,
-            }
-            for p in user_progress
-        ]
-        
-        # Get all available modules for context
-        modules_result = await db.execute(
-            select(Module)
-            .where(Module.is_published == True)
-            .order_by(Module.order_index)
-        )
-        all_modules = modules_result.scalars().all()
-        
-        context["available_modules"] = [
-            {
-                "id": m.id,
-                "title": m.title,
-                "track": m.track.value if m.track else None,
-                "order_index": m.order_index,
-                "description": m.description,
-                "duration_hours": m.duration_hours,
-                "learning_objectives": m.learning_objectives,
-            }
-            for m in all_modules
-        ]
-        
-        # Get recent assessment attempts (last 20)
-        recent_attempts_result = await db.execute(
-            select(QuizAttempt, Assessment)
-            .join(Assessment, QuizAttempt.assessment_id == Assessment.id)
-            .where(QuizAttempt.user_id == user.id)
-            .order_by(desc(QuizAttempt.attempted_at))
-            .limit(20)
-        )
-        recent_attempts = recent_attempts_result.all()
-        
-        context["recent_assessments"] = [
-            {
-                "assessment_id": attempt.assessment_id,
-                "module_id": assessment.module_id,
-                "question_type": assessment.question_type.value if assessment.question_type else None,
-                "is_correct": attempt.is_correct,
-                "points_earned": attempt.points_earned,
-                "review_status": attempt.review_status.value if attempt.review_status else None,
-                "feedback": attempt.feedback,
-                "attempted_at": attempt.attempted_at.isoformat() if attempt.attempted_at else None,
-            }
-            for attempt, assessment in recent_attempts
-        ]
-        
-        # Get earned achievements
-        achievements_result = await db.execute(
-            select(UserAchievement, Achievement)
-            .join(Achievement, UserAchievement.achievement_id == Achievement.id)
-            .where(UserAchievement.user_id == user.id)
-            .order_by(desc(UserAchievement.earned_at))
-        )
-        user_achievements = achievements_result.all()
-        
-        context["achievements"] = [
-            {
-                "id": achievement.id,
-                "name": achievement.name,
-                "description": achievement.description,
-                "category": achievement.category,
-                "points": achievement.points,
-                "earned_at": user_achievement.earned_at.isoformat() if user_achievement.earned_at else None,
-            }
-            for user_achievement, achievement in user_achievements
-        ]
-        
-        # Get recent forum activity (last 10 posts user created or participated in)
-        forum_posts_result = await db.execute(
-            select(ForumPost)
-            .where(ForumPost.user_id == user.id)
-            .order_by(desc(ForumPost.created_at))
-            .limit(10)
-        )
-        recent_posts = forum_posts_result.scalars().all()
+        snapshot = await db.get(UserContextSnapshot, user.id)
+        if snapshot is None:
+            _snapshot_misses += 1
+            # Return the connection to the pool while waiting for another build
+            await db.commit()
+            lock = _build_locks.setdefault(user.id, asyncio.Lock())
+            try:
+                async with lock:
+                    snapshot = await db.get(UserContextSnapshot, user.id)
+                    if snapshot is None:
+                        snapshot = await _build_context_snapshot(db, user.id)
+            finally:
+                if _build_locks.get(user.id) is lock:
+                    del _build_locks[user.id]
+        else:
+            _snapshot_hits += 1
+        for name in SNAPSHOT_SECTIONS:
+            context[name] = getattr(snapshot, name)
         
-        context["recent_forum_activity"] = [
-            {
-                "post_id": post.id,
-                "module_id": post.module_id,
-                "title": post.title,
-                "content_preview": post.content[:200] if post.content else None,  # First 200 chars
-                "is_solved": post.is_solved,
-                "upvotes": post.upvotes,
-                "created_at": post.created_at.isoformat() if post.created_at else None,
-            }
-            for post in recent_posts
-        ]
+        catalog = await _load_module_catalog(db)
+        context["available_modules"] = catalog["modules"]
+        context["catalog_version"] = catalog["version"]
+        context["content_version"] = catalog["content_version"]
 
         # Merge any additional context provided by the caller (e.g., LMS calendar/notes)
         if extra_context:
@@ -177,116 +508,8 @@ async def gather_user_context(
 def format_context_for_instructions(context: Dict[str, Any]) -> str:
     """
     Format user context into a string for OpenAI assistant instructions.
+
+    Rendering is token-budgeted; see context_encoder.encode_context.
     """
-    parts = []
-    
-    # User info
-    user_info = context.get("user", {})
-    parts.append(f"Student: {user_info.get('username', 'Unknown')} (ID: {user_info.get('id')})")
-    parts.append(f"Role: {user_info.get('role', 'student')}")
-    
-    # Current context
-    current = context.get("current_context", {})
-    if current.get("module_id"):
-        parts.append(f"\nCurrently viewing: Module {current.get('module_id')}")
-        if current.get("lesson_id"):
-            parts.append(f"Lesson: {current.get('lesson_id')}")
-    
-    # Progress summary
-    progress = context.get("progress", [])
-    if progress:
-        parts.append("\n## Learning Progress:")
-        completed = [p for p in progress if p.get("status") == "completed"]
-        in_progress = [p for p in progress if p.get("status") == "in_progress"]
-        
-        if completed:
-            parts.append(f"- Completed modules: {len(completed)}")
-        if in_progress:
-            parts.append(f"- In progress modules: {len(in_progress)}")
-            for p in in_progress[:3]:  # Show top 3
-                parts.append(f"  * Module {p.get('module_id')}: {p.get('completion_percentage', 0):.0f}% complete")
-    
-    # Available modules
-    modules = context.get("available_modules", [])
-    if modules:
-        parts.append(f"\n## Available Curriculum:")
-        parts.append(f"Total modules: {len(modules)}")
-        # Group by track
-        tracks = {}
-        for m in modules:
-            track = m.get("track", "Unknown")
-            if track not in tracks:
-                tracks[track] = []
-            tracks[track].append(m)
-        
-        for track, track_modules in tracks.items():
-            parts.append(f"- {track} track: {len(track_modules)} modules")
-    
-    # Recent assessment performance
-    assessments = context.get("recent_assessments", [])
-    if assessments:
-        parts.append("\n## Recent Assessment Performance:")
-        correct = sum(1 for a in assessments if a.get("is_correct") is True)
-        total = len(assessments)
-        if total > 0:
-            parts.append(f"Recent accuracy: {correct}/{total} ({100*correct/total:.0f}%)")
-        
-        # Areas needing improvement
-        incorrect = [a for a in assessments if a.get("is_correct") is False]
-        if incorrect:
-            parts.append(f"Areas to review: {len(incorrect)} recent incorrect answers")
-    
-    # Achievements
-    achievements = context.get("achievements", [])
-    if achievements:
-        parts.append(f"\n## Achievements Earned: {len(achievements)}")
-        recent_achievements = achievements[:5]  # Show 5 most recent
-        for ach in recent_achievements:
-            parts.append(f"- {ach.get('name')}: {ach.get('description', '')}")
-
-    # Assignments
-    assignments = context.get("assignments", [])
-    if assignments:
-        parts.append(f"\n## Upcoming Assignments: {len(assignments)}")
-        for item in assignments[:5]:
-            if isinstance(item, dict):
-                title = item.get("title") or item.get("name") or "Assignment"
-                due = item.get("due_date") or item.get("due") or item.get("deadline")
-                parts.append(f"- {title}" + (f" (due {due})" if due else ""))
-            else:
-                parts.append(f"- {item}")
-
-    # Notes
-    notes = context.get("notes", [])
-    if notes:
-        parts.append(f"\n## Notes & Highlights: {len(notes)}")
-        for note in notes[:3]:
-            if isinstance(note, dict):
-                snippet = note.get("summary") or note.get("content") or note.get("text") or ""
-            else:
-                snippet = str(note)
-            trimmed = (snippet[:180] + "...") if len(snippet) > 180 else snippet
-            parts.append(f"- {trimmed}")
-
-    # Calendar events
-    calendar_events = context.get("calendar_events", [])
-    if calendar_events:
-        parts.append(f"\n## Calendar Events: {len(calendar_events)}")
-        for event in calendar_events[:5]:
-            if isinstance(event, dict):
-                title = event.get("title") or event.get("name") or "Event"
-                when = event.get("start") or event.get("date") or event.get("starts_at")
-                parts.append(f"- {title}" + (f" on {when}" if when else ""))
-            else:
-                parts.append(f"- {event}")
-    
-    # Forum activity
-    forum_activity = context.get("recent_forum_activity", [])
-    if forum_activity:
-        parts.append(f"\n## Recent Forum Activity: {len(forum_activity)} posts")
-
-    if context.get("additional_instructions"):
-        parts.append("\n## Additional Context:")
-        parts.append(str(context.get("additional_instructions")))
-    
-    return "\n".join(parts)
+    from app.backend.services.context_encoder import encode_context
+    return encode_context(context).text
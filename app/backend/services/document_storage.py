@@ -0,0 +1,125 @@
+"""Content-addressed storage for uploaded documents"""
+import hashlib
+import logging
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from fastapi import UploadFile
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core.config import settings
+from app.backend.models.document import Document
+from app.backend.models.document_blob import DocumentBlob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+    pass
+
+
+def _blob_path(sha256: str, suffix: str) -> Path:
+    """Blobs live under blobs/<first two hex chars>/<hash><suffix>"""
+    return Path(settings.DOCUMENT_STORAGE_PATH) / "blobs" / sha256[:2] / f"{sha256}{suffix}"
+
+
+async def store_upload(db: AsyncSession, upload: UploadFile, max_bytes: int) -> DocumentBlob:
+    """
+    Stream an upload to disk while hashing it, and return its shared blob.
+
+    The file is hashed as it is written, so it is read only once. If a blob
+    with the same sha256 already exists the new copy is discarded and the
+    existing blob (including its OpenAI file ID) is reused. The blob's
+    reference count is incremented; the caller commits.
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds max_bytes
+    """
+    suffix = Path(upload.filename or "").suffix.lower()
+    storage_dir = Path(settings.DOCUMENT_STORAGE_PATH)
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = storage_dir / f".upload-{uuid.uuid4().hex}.tmp"
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with temp_path.open("wb") as handle:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                hasher.update(chunk)
+                handle.write(chunk)
+
+        sha256 = hasher.hexdigest()
+        # Retried when a concurrent upload or release changes the blob under us
+        for _ in range(3):
+            blob = await db.get(DocumentBlob, sha256, populate_existing=True)
+            if blob is not None:
+                # A blob whose last reference is being released must not be revived
+                result = await db.execute(
+                    update(DocumentBlob)
+                    .where(DocumentBlob.sha256 == sha256)
+                    .where(DocumentBlob.ref_count > 0)
+                    .values(ref_count=DocumentBlob.ref_count + 1)
+                )
+                if result.rowcount == 1:
+                    await db.refresh(blob)
+                    logger.info("Reusing stored blob %s for %s (%s references)", sha256[:12], upload.filename, blob.ref_count)
+                    return blob
+                db.expunge(blob)
+
+            blob_path = _blob_path(sha256, suffix)
+            if blob_path.exists():
+                # Left by a released blob; its file is deleted once that release commits
+                blob_path = blob_path.with_name(f"{sha256}-{uuid.uuid4().hex[:8]}{suffix}")
+            try:
+                async with db.begin_nested():
+                    blob = DocumentBlob(sha256=sha256, storage_path=str(blob_path.resolve()), file_size=size, ref_count=1)
+                    db.add(blob)
+            except IntegrityError:
+                # A concurrent upload of the same content created the blob first
+                continue
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.replace(blob_path)
+            return blob
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    raise RuntimeError(f"Could not store blob {sha256[:12]} for {upload.filename}")
+
+
+async def release_blob(db: AsyncSession, document: Document) -> Optional[Path]:
+    """
+    Drop a deleted document's reference to its blob.
+
+    When the last reference goes away the blob row is removed. The caller
+    commits and then deletes the returned file from disk, so a failed
+    commit never leaves a row pointing at a missing file.
+
+    Returns:
+        Path of the blob file to delete, or None while other documents use it
+    """
+    if not document.content_hash:
+        return None
+
+    await db.execute(
+        update(DocumentBlob)
+        .where(DocumentBlob.sha256 == document.content_hash)
+        .values(ref_count=DocumentBlob.ref_count - 1)
+    )
+    blob = await db.get(DocumentBlob, document.content_hash, populate_existing=True)
+    # Deleted documents stop referencing the blob so it can be removed later
+    document.content_hash = None
+    if blob is None or blob.ref_count > 0:
+        return None
+
+    await db.flush()
+    await db.delete(blob)
+    return Path(blob.storage_path)
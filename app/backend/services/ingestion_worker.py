@@ -0,0 +1,276 @@
+"""Background worker that uploads documents to OpenAI for vector store sync and chat"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.core.openai_utils import (
+    get_openai_client,
+    record_vector_store_change,
+    _is_image_file,
+    _is_text_document,
+    _upload_file_to_openai,
+)
+from app.backend.models.document import Document
+from app.backend.models.document_blob import DocumentBlob
+from app.backend.models.ingestion_job import DocumentIngestionJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_ingestion(db: AsyncSession, document: Document) -> None:
+    """
+    Queue a document for background ingestion and vector store sync.
+
+    The job and the 'add' sync op are added to the caller's session so they
+    commit with the document. The sync op is what attaches the file to vector
+    stores; it waits until ingestion_status is 'ready'. Call
+    ingestion_worker.notify() after committing to start the job right away.
+    """
+    document.ingestion_status = "pending"
+    db.add(DocumentIngestionJob(document_id=document.id, status="pending"))
+    record_vector_store_change(db, document, "add")
+
+
+class IngestionWorker:
+    """
+    Process document ingestion jobs from the database.
+
+    Jobs are claimed with a lease, so several app processes can run a worker
+    against the same table and a job held by a crashed process is retried once
+    its lease expires. Failures are retried with exponential backoff until
+    INGESTION_MAX_ATTEMPTS, after which the document is marked 'failed'.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        poll_interval: float = settings.INGESTION_POLL_INTERVAL_SECONDS,
+        max_concurrency: int = settings.INGESTION_MAX_CONCURRENCY,
+        max_attempts: int = settings.INGESTION_MAX_ATTEMPTS,
+        retry_base_seconds: float = settings.INGESTION_RETRY_BASE_SECONDS,
+        lease_seconds: float = settings.INGESTION_LEASE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._completed = 0
+        self._retried = 0
+        self._failed = 0
+
+    def start(self) -> None:
+        """Start the worker loop on the running event loop."""
+        if self._task and not self._task.done():
+            return
+        if self.session_factory is None:
+            from app.backend.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run_loop(), name="document-ingestion-worker")
+        logger.info("Ingestion worker started")
+
+    async def stop(self) -> None:
+        """Stop the worker; unfinished jobs are picked up again after their lease expires."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Ingestion worker stopped")
+
+    def notify(self) -> None:
+        """Wake the worker because new jobs were committed (no-op if it is not running)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return job outcome counters for this process."""
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "completed": self._completed,
+            "retried": self._retried,
+            "failed": self._failed,
+        }
+
+    async def run_once(self) -> int:
+        """
+        Process every job that is currently due.
+
+        Returns:
+            Number of jobs claimed
+        """
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(DocumentIngestionJob.id)
+                .where(or_(
+                    and_(
+                        DocumentIngestionJob.status == "pending",
+                        or_(DocumentIngestionJob.next_attempt_at.is_(None), DocumentIngestionJob.next_attempt_at <= now),
+                    ),
+                    and_(DocumentIngestionJob.status == "processing", DocumentIngestionJob.locked_until < now),
+                ))
+                .order_by(DocumentIngestionJob.id)
+                .limit(self.max_concurrency * 4)
+            )
+            job_ids = list(result.scalars().all())
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _bounded(job_id: int) -> bool:
+            async with semaphore:
+                return await self._process(job_id)
+
+        claimed = await asyncio.gather(*(_bounded(job_id) for job_id in job_ids))
+        return sum(claimed)
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Ingestion worker pass failed: {e}")
+                claimed = 0
+
+            # Keep draining while there is a backlog, otherwise sleep until notified
+            if claimed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, db: AsyncSession, job_id: int) -> bool:
+        """Take the job's lease; False if another worker got it first."""
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            update(DocumentIngestionJob)
+            .where(DocumentIngestionJob.id == job_id)
+            .where(or_(
+                DocumentIngestionJob.status == "pending",
+                and_(DocumentIngestionJob.status == "processing", DocumentIngestionJob.locked_until < now),
+            ))
+            .values(
+                status="processing",
+                attempts=DocumentIngestionJob.attempts + 1,
+                locked_until=now + timedelta(seconds=self.lease_seconds),
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def _process(self, job_id: int) -> bool:
+        async with self.session_factory() as db:
+            if not await self._claim(db, job_id):
+                return False
+
+            job = await db.get(DocumentIngestionJob, job_id, populate_existing=True)
+            document = await db.get(Document, job.document_id)
+
+            if document is None or document.is_deleted:
+                job.status = "cancelled"
+                job.locked_until = None
+                await db.commit()
+                return True
+
+            file_path = Path(document.storage_path)
+            if not file_path.exists() or not (_is_image_file(file_path) or _is_text_document(file_path)):
+                document.ingestion_status = "skipped"
+                job.status = "completed"
+                job.locked_until = None
+                await db.commit()
+                return True
+
+            document.ingestion_status = "processing"
+            # Release the connection while talking to OpenAI
+            await db.commit()
+
+            try:
+                await self._ingest(db, document, file_path)
+            except Exception as e:
+                await db.rollback()
+                job = await db.get(DocumentIngestionJob, job_id, populate_existing=True)
+                document = await db.get(Document, job.document_id, populate_existing=True)
+                job.last_error = str(e)[:1000]
+                job.locked_until = None
+                if job.attempts >= self.max_attempts:
+                    logger.error(f"Ingestion of document {document.id} failed after {job.attempts} attempts: {e}")
+                    job.status = "failed"
+                    document.ingestion_status = "failed"
+                    self._failed += 1
+                else:
+                    delay = self.retry_base_seconds * (2 ** (job.attempts - 1))
+                    logger.warning(f"Ingestion of document {document.id} failed, retrying in {delay:.0f}s: {e}")
+                    job.status = "pending"
+                    job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                    document.ingestion_status = "pending"
+                    self._retried += 1
+                await db.commit()
+                return True
+
+            # Deleted while the upload ran: its 'remove' op may already have been
+            # applied, so it must never become attachable
+            await db.refresh(document)
+            if document.is_deleted:
+                job.status = "cancelled"
+                job.locked_until = None
+                await db.commit()
+                return True
+
+            document.ingestion_status = "ready"
+            job.status = "completed"
+            job.last_error = None
+            job.locked_until = None
+            await db.commit()
+            self._completed += 1
+            logger.info("Ingested document %s as OpenAI file %s", document.id, document.openai_file_id)
+            return True
+
+    async def _ingest(self, db: AsyncSession, document: Document, file_path: Path) -> None:
+        """
+        Upload the file to OpenAI (once per content hash).
+
+        Attaching it to vector stores is left to vector store sync, which
+        skips documents deleted in the meantime.
+        """
+        client = get_openai_client()
+
+        # Another document with the same content may already have been uploaded
+        if not document.openai_file_id and document.content_hash:
+            blob = await db.get(DocumentBlob, document.content_hash)
+            if blob is not None and blob.openai_file_id:
+                document.openai_file_id = blob.openai_file_id
+            await db.commit()
+
+        if not document.openai_file_id:
+            uploaded_id = await _upload_file_to_openai(client, file_path)
+            if not uploaded_id:
+                raise Exception(f"Upload of {file_path.name} to OpenAI failed")
+            document.openai_file_id = uploaded_id
+            if document.content_hash:
+                await db.execute(
+                    update(DocumentBlob)
+                    .where(DocumentBlob.sha256 == document.content_hash)
+                    .where(DocumentBlob.openai_file_id.is_(None))
+                    .values(openai_file_id=uploaded_id)
+                )
+            await db.commit()
+
+
+# Shared worker started by the application lifespan
+ingestion_worker = IngestionWorker()
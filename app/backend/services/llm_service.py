@@ -1,32 +1,98 @@
-"""LLM service for OpenAI Assistants API integration"""
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import Optional, Dict, Any, AsyncGenerator
+"""LLM service: chat backends (OpenAI Assistants or streaming chat completions)"""
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, func, desc, exists
+from typing import Optional, Dict, Any, AsyncGenerator, List
+from dataclasses import dataclass, field
+import asyncio
+import base64
+from datetime import datetime, timezone
 import logging
-from openai import AsyncOpenAI
+import mimetypes
+from openai import AsyncOpenAI, BadRequestError, NotFoundError
 
 from app.backend.core.openai_utils import (
     get_openai_client,
     get_assistant_for_user,
+    invalidate_openai_resource_cache,
     cancel_active_run,
     list_active_runs,
-    update_vector_store,
+    sync_vector_store,
+    _is_image_file,
 )
 from app.backend.core.chat_utils import (
     format_system_prompt_with_context,
+    format_chat_history,
     sanitize_message,
-    format_citations_in_response
+    format_citations_in_response,
+    extract_conversation_title,
+    StreamingCitationFormatter,
 )
+from app.backend.core.config import settings
 from app.backend.services.context_service import gather_user_context
+from app.backend.services.answer_cache import (
+    answer_cache,
+    answer_cache_key,
+    bypass_reason,
+    record_bypass,
+    shared_context,
+)
+from app.backend.services.run_tracker import run_tracker
+from app.backend.services.run_registry import run_registry
+from app.backend.services.thread_pool import thread_pool
+from app.backend.services.log_writer import log_writer
+from app.backend.services.activity import record_activity
+from app.backend.models.activity import ActivityKind
 from app.backend.models.user import User
-from app.backend.models.thread_map import ThreadMap
+from app.backend.models.thread_map import ThreadMap, CONVERSATION_ID_START, conversation_id_seq
 from app.backend.models.query_log import QueryLog
+from app.backend.models.notification import ChatMessage
 from app.backend.models.document import Document
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
+class ChatProviderError(Exception):
+    """A chat backend finished a response with an error (partial text may have been streamed)"""
+    pass
+
+
+@dataclass
+class ChatTurn:
+    """
+    Everything needed to run one chat message against the LLM.
+    
+    Built by prepare_chat_turn so that the model call itself can proceed
+    without any database session (and pooled connection) checked out.
+    Backends fill in only the fields they use.
+    """
+    user_id: int
+    conversation_id: int
+    message: str
+    sanitized_message: str
+    system_instructions: str
+    thread_id: Optional[str] = None  # Assistants backend
+    assistant_id: Optional[str] = None  # Assistants backend
+    image_file_ids: list[str] = field(default_factory=list)  # Assistants backend
+    history: List[Dict[str, Any]] = field(default_factory=list)  # Chat completions backend
+    image_urls: list[str] = field(default_factory=list)  # Chat completions backend (data URLs)
+    context: Dict[str, Any] = field(default_factory=dict)
+    ip_address: Optional[str] = None
+    cache_key: Optional[str] = None  # Set when the answer may be served from / stored in the answer cache
+    cache_status: Optional[str] = None  # 'hit', 'miss' or 'bypass' (None when the cache is off)
+    cached_response: Optional[str] = None
+    
+    @property
+    def message_content(self) -> Any:
+        """Message payload for threads.messages.create (text + images)"""
+        if not self.image_file_ids:
+            return self.sanitized_message
+        content: list[Dict[str, Any]] = [{"type": "text", "text": self.sanitized_message}]
+        for file_id in self.image_file_ids:
+            content.append({"type": "image_file", "image_file": {"file_id": file_id}})
+        return content
+
+
 async def get_or_create_thread(
     db: AsyncSession,
     user: User,
@@ -51,34 +117,121 @@ async def get_or_create_thread(
     )
     thread_map = result.scalar_one_or_none()
     
-    if thread_map:
+    if thread_map and thread_map.thread_id:
         # Update last_used_at
         thread_map.last_used_at = func.now()
         await db.commit()
         return thread_map.thread_id
     
+    # A conversation started without a thread (chat completions backend or a
+    # cached answer) is carried over into the new thread
+    history = []
+    if thread_map:
+        history = await _load_history(db, user.id, conversation_id)
+    
+    if not history:
+        # An empty pre-created thread saves a round trip on the first message
+        thread_id = await thread_pool.claim(db)
+        if thread_id:
+            logger.info(f"Claimed pooled thread {thread_id} for conversation {conversation_id}")
+            return await _attach_thread(db, user, conversation_id, thread_map, thread_id)
+    
+    # Release the connection before the remote call
+    await db.commit()
+    
     # Create new thread
     client = get_openai_client()
-    thread = await client.beta.threads.create()
+    if history:
+        thread = await client.beta.threads.create(messages=history)
+    else:
+        thread = await client.beta.threads.create()
     
-    # Create thread mapping
-    thread_map = ThreadMap(
-        conversation_id=conversation_id,
-        thread_id=thread.id,
-        user_id=user.id
-    )
-    db.add(thread_map)
+    logger.info(f"Created new thread {thread.id} for conversation {conversation_id}")
+    return await _attach_thread(db, user, conversation_id, thread_map, thread.id)
+
+
+async def _attach_thread(
+    db: AsyncSession,
+    user: User,
+    conversation_id: int,
+    thread_map: Optional[ThreadMap],
+    thread_id: str,
+) -> str:
+    """Create the thread mapping (or attach the thread to a conversation started on the chat completions backend)"""
+    if thread_map:
+        thread_map.thread_id = thread_id
+        thread_map.last_used_at = func.now()
+    else:
+        thread_map = ThreadMap(
+            conversation_id=conversation_id,
+            thread_id=thread_id,
+            user_id=user.id
+        )
+        db.add(thread_map)
     await db.commit()
     await db.refresh(thread_map)
+    return thread_id
+
+
+# Databases without sequences (SQLite in development) allocate in-process
+_last_conversation_id = 0
+
+
+async def next_conversation_id(db: AsyncSession) -> int:
+    """
+    Allocate an ID for a new conversation.
     
-    logger.info(f"Created new thread {thread.id} for conversation {conversation_id}")
-    return thread.id
+    PostgreSQL draws from conversation_id_seq, so IDs never collide across
+    requests or workers. Elsewhere IDs continue after the highest stored one,
+    which is collision-free within the single process such setups run.
+    """
+    global _last_conversation_id
+    if db.get_bind().dialect.name == "postgresql":
+        return await db.scalar(select(conversation_id_seq.next_value()))
+    highest = await db.scalar(select(func.max(ThreadMap.conversation_id)))
+    _last_conversation_id = max(_last_conversation_id, highest or 0, CONVERSATION_ID_START - 1) + 1
+    return _last_conversation_id
+
+
+async def _load_history(db: AsyncSession, user_id: int, conversation_id: int) -> List[Dict[str, Any]]:
+    """The conversation's most recent stored turns as user/assistant messages, oldest first"""
+    max_messages = settings.CHAT_HISTORY_MAX_MESSAGES
+    result = await db.execute(
+        select(ChatMessage.message, ChatMessage.response)
+        .where(ChatMessage.conversation_id == conversation_id)
+        .where(ChatMessage.user_id == user_id)
+        .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+        .limit(max_messages)
+    )
+    rows = list(reversed(result.all()))
+    return format_chat_history(
+        [{"message": row.message, "response": row.response} for row in rows],
+        max_messages=max_messages,
+    )
+
+
+async def _touch_thread_map(db: AsyncSession, user_id: int, conversation_id: int) -> None:
+    """Mark the conversation as used, creating its thread_maps row (without a thread) if needed"""
+    result = await db.execute(
+        select(ThreadMap)
+        .where(ThreadMap.conversation_id == conversation_id)
+        .where(ThreadMap.user_id == user_id)
+    )
+    thread_map = result.scalar_one_or_none()
+    if thread_map:
+        thread_map.last_used_at = func.now()
+    else:
+        # Conversations are listed through thread_maps, even without a remote thread
+        db.add(ThreadMap(conversation_id=conversation_id, thread_id=None, user_id=user_id))
 
 
 async def cancel_active_runs_for_thread(thread_id: str) -> None:
     """
     Cancel any active runs for a thread to prevent conflicts.
     
+    Lists runs remotely; the chat path only falls back to this when the
+    thread has an active run that run_registry does not know about.
+    
     Args:
         thread_id: OpenAI thread ID
     """
@@ -115,30 +268,35 @@ async def _get_image_file_ids(
     )
     documents = result.scalars().all()
     
+    # Release the connection before any uploads
+    await db.commit()
+    
+    dirty = False
     for document in documents:
         file_path = Path(document.storage_path)
         if not file_path.exists() or not _is_image_file(file_path):
             continue
-        
+    
         # Use existing OpenAI file ID if available
         if document.openai_file_id:
             file_ids.append(document.openai_file_id)
             continue
-        
+    
         # Upload to OpenAI
         file_id = await _upload_file_to_openai(client, file_path)
         if file_id:
             document.openai_file_id = file_id
             file_ids.append(file_id)
+            dirty = True
     
-    if file_ids:
+    if dirty:
         await db.commit()
     
     return file_ids
 
 
-async def send_message(
-    db: AsyncSession,
+async def prepare_chat_turn(
+    session_factory: async_sessionmaker,
     user: User,
     message: str,
     conversation_id: int,
@@ -146,117 +304,176 @@ async def send_message(
     current_lesson_id: Optional[int] = None,
     ip_address: Optional[str] = None,
     context_payload: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
+    image_document_ids: Optional[list[int]] = None,
+    backend: Optional["ChatBackend"] = None,
+) -> ChatTurn:
     """
-    Send a message to the AI assistant and get response.
+    Load context and resolve backend resources for a chat message.
     
-    Args:
-        db: Database session
-        user: User object
-        message: User's message
-        conversation_id: Conversation ID
-        current_module_id: Optional current module ID for context
-        current_lesson_id: Optional current lesson ID for context
-        ip_address: Optional IP address for logging
-    
-    Returns:
-        Dict with 'response' and 'conversation_id'
+    Each database phase opens its own short-lived session, and no
+    transaction is left open across a remote LLM call.
     """
-    try:
-        client = get_openai_client()
-    except ValueError as e:
-        logger.error(f"OpenAI client initialization failed: {e}")
-        raise Exception(f"AI service configuration error: {str(e)}")
-    
-    # Sanitize message
+    backend = backend or get_chat_backend()
     sanitized_message = sanitize_message(message)
     
-    # Get image file IDs if provided
-    image_file_ids = await _get_image_file_ids(db, user, image_document_ids)
+    # Phase 1: load learning context
+    async with session_factory() as db:
+        try:
+            context = await gather_user_context(
+                user,
+                db,
+                current_module_id=current_module_id,
+                current_lesson_id=current_lesson_id,
+                extra_context=context_payload,
+            )
+        except Exception as e:
+            logger.error(f"Error gathering context: {e}")
+            context = {}
+        
+        cache_key = None
+        cache_status = None
+        if settings.ANSWER_CACHE_ENABLED:
+            has_documents, has_history = (await db.execute(select(
+                exists().where(Document.uploader_id == user.id).where(Document.is_deleted == False),  # noqa: E712
+                exists().where(ChatMessage.conversation_id == conversation_id).where(ChatMessage.user_id == user.id),
+            ))).one()
+            reason = bypass_reason(sanitized_message, context_payload, image_document_ids, has_documents, has_history)
+            if reason is None and not context.get("content_version"):
+                reason = "no_context"
+            if reason:
+                record_bypass(reason)
+                cache_status = "bypass"
+            else:
+                cache_key = answer_cache_key(
+                    sanitized_message, current_module_id, current_lesson_id, context["content_version"]
+                )
+        await db.commit()
     
-    # Get or create thread
-    thread_id = await get_or_create_thread(db, user, conversation_id)
+    # Format system prompt with context. Answers that may be cached for other
+    # students are generated without this student's own context.
+    system_instructions = format_system_prompt_with_context(shared_context(context) if cache_key else context)
     
-    # Cancel any active runs to prevent conflicts
-    await cancel_active_runs_for_thread(thread_id)
+    turn = ChatTurn(
+        user_id=user.id,
+        conversation_id=conversation_id,
+        message=message,
+        sanitized_message=sanitized_message,
+        system_instructions=system_instructions,
+        context=context_payload or {},
+        ip_address=ip_address,
+        cache_key=cache_key,
+        cache_status=cache_status,
+    )
     
-    # Gather user context
-    try:
-        context = await gather_user_context(
-            user,
-            db,
-            current_module_id=current_module_id,
-            current_lesson_id=current_lesson_id,
-            extra_context=context_payload,
-        )
-    except Exception as e:
-        logger.error(f"Error gathering context: {e}")
-        context = {}
+    if cache_key:
+        cached = await answer_cache.get(cache_key)
+        if cached is not None:
+            # No model call, so no thread or history is needed
+            turn.cached_response = cached
+            turn.cache_status = "hit"
+            async with session_factory() as db:
+                await _touch_thread_map(db, user.id, conversation_id)
+                await db.commit()
+            return turn
+        turn.cache_status = "miss"
     
-    # Format system prompt with context
-    system_instructions = format_system_prompt_with_context(context)
+    # Phase 2: backend-specific resources (threads and assistants, or history)
+    await backend.prepare(session_factory, user, turn, image_document_ids)
+    return turn
 
-    # Sync vector store
-    vector_store_id = None
-    try:
-        vector_store_id = await update_vector_store(db, user)
-    except Exception as e:
-        logger.warning(f"Vector store sync failed for user {user.id}: {e}")
+
+async def record_chat_turn(
+    session_factory: async_sessionmaker,
+    turn: ChatTurn,
+    response_text: str,
+    operation_type: str,
+) -> Optional[ChatMessage]:
+    """
+    Persist the query log, chat message and thread title for a finished turn.
     
-    # Get user's assistant (will attach vector store if available)
-    try:
-        assistant_id = await get_assistant_for_user(user, db, vector_store_id)
-    except Exception as e:
-        logger.error(f"Failed to get assistant for user {user.id}: {e}")
-        raise Exception(f"Failed to initialize AI assistant: {str(e)}")
+    Runs in its own short transaction after the OpenAI run has completed.
     
-    # Build message content (text + images)
-    message_content: list[Dict[str, Any]] = [{"type": "text", "text": sanitized_message}]
+    Returns:
+        The stored ChatMessage, or None if persisting failed
+    """
+    query_log = {
+        "user_id": turn.user_id,
+        "query": turn.sanitized_message,
+        "response": response_text,
+        "operation_type": operation_type,
+        "conversation_id": turn.conversation_id,
+        "ip_address": turn.ip_address,
+        "cache_status": turn.cache_status,
+        "created_at": datetime.now(timezone.utc),
+    }
+    write_behind = settings.LOG_WRITER_ENABLED and log_writer.running
     
-    # Add image file attachments if any
-    for file_id in image_file_ids:
-        message_content.append({"type": "image_file", "image_file": {"file_id": file_id}})
+    async with session_factory() as db:
+        try:
+            if not write_behind:
+                db.add(QueryLog(**query_log))
     
-    # Add message to thread
-    try:
-        await client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message_content if image_file_ids else sanitized_message
-        )
-    except Exception as e:
-        logger.error(f"Failed to add message to thread {thread_id}: {e}")
-        raise Exception(f"Failed to send message to AI: {str(e)}")
+            chat_message = ChatMessage(
+                user_id=turn.user_id,
+                message=turn.message,
+                response=response_text,
+                context=turn.context,
+                suggested_lessons=None,
+                escalated=False,
+                conversation_id=turn.conversation_id
+            )
+            db.add(chat_message)
     
-    # Create run with context in additional_instructions
-    # Note: tool_resources is set on the assistant, not on the run
-    try:
-        run = await client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-            additional_instructions=system_instructions,
-        )
-    except Exception as e:
-        logger.error(f"Failed to create run for thread {thread_id}: {e}")
-        raise Exception(f"Failed to start AI conversation: {str(e)}")
+            # Update thread map title if this is the first message
+            thread_map_result = await db.execute(
+                select(ThreadMap)
+                .where(ThreadMap.conversation_id == turn.conversation_id)
+                .where(ThreadMap.user_id == turn.user_id)
+            )
+            thread_map = thread_map_result.scalar_one_or_none()
+            if thread_map:
+                # Conversation list summary, kept in step with chat_messages
+                thread_map.message_count = ThreadMap.message_count + 1
+                thread_map.last_message_at = func.now()
+                if not thread_map.title:
+                    thread_map.title = extract_conversation_title(turn.message)
     
-    # Wait for completion
-    import asyncio
-    while True:
-        run_status = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-        
-        if run_status.status == "completed":
-            break
-        elif run_status.status in ["failed", "cancelled", "expired"]:
-            error_msg = f"Run {run_status.status}: {run_status.last_error.message if run_status.last_error else 'Unknown error'}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
-        
-        await asyncio.sleep(0.5)  # Poll every 500ms
+            await record_activity(db, turn.user_id, ActivityKind.CHAT_TURN)
+            await db.commit()
+            await db.refresh(chat_message)
+        except Exception as e:
+            logger.error(f"Error recording chat turn: {e}", exc_info=True)
+            await db.rollback()
+            return None
     
-    # Get response
+    if write_behind and not await log_writer.submit(QueryLog, query_log):
+        # The write-behind buffer stayed full; do not hold the turn any longer
+        async with session_factory() as db:
+            try:
+                db.add(QueryLog(**query_log))
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Error recording query log: {e}")
+    return chat_message
+
+
+def _extract_delta_text(message_delta: Any) -> str:
+    """Collect the text carried by a thread.message.delta event."""
+    delta = getattr(message_delta, "delta", None)
+    content = getattr(delta, "content", None) or []
+    parts = []
+    for block in content:
+        if getattr(block, "type", None) == "text":
+            text = getattr(block, "text", None)
+            value = getattr(text, "value", None)
+            if value:
+                parts.append(value)
+    return "".join(parts)
+
+
+async def _get_latest_response_text(client: AsyncOpenAI, thread_id: str) -> str:
+    """Return the text of the newest message on a thread."""
     messages = await client.beta.threads.messages.list(thread_id=thread_id, limit=1)
-    response_text = ""
     
     if messages.data:
         message = messages.data[0]
@@ -264,44 +481,495 @@ async def send_message(
             for content in message.content:
                 if hasattr(content, 'type') and content.type == "text":
                     if hasattr(content, 'text') and hasattr(content.text, 'value'):
-                        response_text = content.text.value
-                        break
+                        return content.text.value
+    return ""
+
+
+class ChatBackend:
+    """
+    A way of producing the assistant's reply for a prepared ChatTurn.
     
-    if not response_text:
-        logger.warning(f"No response text found for thread {thread_id}, run {run.id}")
-        response_text = "I apologize, but I couldn't generate a response. Please try again."
+    Every method uses only short-lived sessions from session_factory; none
+    is held across a model call.
+    """
+    name = "base"
     
-    # Format citations in response
-    try:
-        response_text = await format_citations_in_response(response_text, db)
-    except Exception as e:
-        logger.error(f"Error formatting citations: {e}", exc_info=True)
-        # Continue with unformatted response if citation formatting fails
+    def ensure_configured(self) -> None:
+        """Raise if the backend cannot be used (e.g. missing API key)."""
+        raise NotImplementedError
     
-    # Log query
-    try:
-        query_log = QueryLog(
-            user_id=user.id,
-            query=sanitized_message,
-            response=response_text,
-            operation_type="chat",
-            conversation_id=conversation_id,
-            ip_address=ip_address
+    async def prepare(
+        self,
+        session_factory: async_sessionmaker,
+        user: User,
+        turn: ChatTurn,
+        image_document_ids: Optional[list[int]] = None,
+    ) -> None:
+        raise NotImplementedError
+    
+    async def complete(self, turn: ChatTurn, session_factory: async_sessionmaker) -> str:
+        """Return the full reply."""
+        raise NotImplementedError
+    
+    def stream(self, turn: ChatTurn, session_factory: async_sessionmaker) -> AsyncGenerator[str, None]:
+        """Yield raw reply text as it arrives; raise ChatProviderError on failure."""
+        raise NotImplementedError
+
+
+class AssistantsBackend(ChatBackend):
+    """OpenAI Assistants: server-side threads, file_search over the user's vector store"""
+    name = "assistants"
+    
+    def ensure_configured(self) -> None:
+        get_openai_client()
+    
+    async def prepare(
+        self,
+        session_factory: async_sessionmaker,
+        user: User,
+        turn: ChatTurn,
+        image_document_ids: Optional[list[int]] = None,
+    ) -> None:
+        # The helpers commit their reads before calling OpenAI so no connection is held
+        async with session_factory() as db:
+            turn.image_file_ids = await _get_image_file_ids(db, user, image_document_ids)
+            turn.thread_id = await get_or_create_thread(db, user, turn.conversation_id)
+        
+            vector_store_id = None
+            try:
+                vector_store_id = await sync_vector_store(db, user)
+            except Exception as e:
+                logger.warning(f"Vector store sync failed for user {user.id}: {e}")
+                await db.rollback()
+        
+            # Get user's assistant (will attach vector store if available)
+            try:
+                turn.assistant_id = await get_assistant_for_user(user, db, vector_store_id)
+            except Exception as e:
+                logger.error(f"Failed to get assistant for user {user.id}: {e}")
+                raise Exception(f"Failed to initialize AI assistant: {str(e)}")
+    
+    async def _claim_thread(self, session_factory: async_sessionmaker, thread_id: str) -> None:
+        """Wait for our turn on the thread and cancel the run we recorded there, if any."""
+        previous_run_id = await run_registry.claim(session_factory, thread_id)
+        if previous_run_id:
+            run_registry.record_cancel()
+            await cancel_active_run(thread_id, previous_run_id)
+    
+    async def _add_message(self, client: AsyncOpenAI, turn: ChatTurn, attempts: int = 3) -> None:
+        for attempt in range(attempts):
+            try:
+                await client.beta.threads.messages.create(
+                    thread_id=turn.thread_id,
+                    role="user",
+                    content=turn.message_content
+                )
+                return
+            except BadRequestError as e:
+                if attempt == attempts - 1 or "active" not in str(e):
+                    logger.error(f"Failed to add message to thread {turn.thread_id}: {e}")
+                    raise Exception(f"Failed to send message to AI: {str(e)}")
+                # A run we have no record of (started before the registry, or a
+                # cancel still in progress) - fall back to listing runs remotely
+                run_registry.record_fallback()
+                await cancel_active_runs_for_thread(turn.thread_id)
+                await asyncio.sleep(0.5 * (attempt + 1))
+            except Exception as e:
+                logger.error(f"Failed to add message to thread {turn.thread_id}: {e}")
+                raise Exception(f"Failed to send message to AI: {str(e)}")
+    
+    async def complete(self, turn: ChatTurn, session_factory: async_sessionmaker) -> str:
+        client = get_openai_client()
+        thread_id = turn.thread_id
+        
+        await self._claim_thread(session_factory, thread_id)
+        run = None
+        try:
+            await self._add_message(client, turn)
+            
+            # Create run with context in additional_instructions
+            # Note: tool_resources is set on the assistant, not on the run
+            try:
+                run = await client.beta.threads.runs.create(
+                    thread_id=thread_id,
+                    assistant_id=turn.assistant_id,
+                    additional_instructions=turn.system_instructions,
+                )
+            except Exception as e:
+                if isinstance(e, NotFoundError):
+                    # A cached assistant ID was deleted remotely; re-verify on the next message
+                    await invalidate_openai_resource_cache(user_id=turn.user_id, assistant_id=turn.assistant_id)
+                logger.error(f"Failed to create run for thread {thread_id}: {e}")
+                raise Exception(f"Failed to start AI conversation: {str(e)}")
+            await run_registry.record(session_factory, thread_id, run.id)
+        finally:
+            if run is None:
+                await run_registry.release(session_factory, thread_id)
+        
+        # Wait for completion via the shared run tracker
+        try:
+            run_status = await run_tracker.wait_for_run(
+                thread_id, run.id, timeout=settings.RUN_WAIT_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            await cancel_active_run(thread_id, run.id)
+            raise Exception(f"Run timed out after {settings.RUN_WAIT_TIMEOUT_SECONDS:.0f}s")
+        finally:
+            await run_registry.clear(session_factory, thread_id, run.id)
+        
+        if run_status.status == "requires_action":
+            # Tool calls are not implemented yet (future web search feature)
+            logger.warning("Run requires action - tool calls not yet implemented")
+            await cancel_active_run(thread_id, run.id)
+            raise Exception("Run requires action: tool calls are not supported yet")
+        elif run_status.status != "completed":
+            error_msg = f"Run {run_status.status}: {run_status.last_error.message if run_status.last_error else 'Unknown error'}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        response_text = await _get_latest_response_text(client, thread_id)
+        if not response_text:
+            logger.warning(f"No response text found for thread {thread_id}, run {run.id}")
+        return response_text
+    
+    async def stream(self, turn: ChatTurn, session_factory: async_sessionmaker) -> AsyncGenerator[str, None]:
+        client = get_openai_client()
+        thread_id = turn.thread_id
+        
+        await self._claim_thread(session_factory, thread_id)
+        run_id = None
+        try:
+            await self._add_message(client, turn)
+            
+            # Create run and consume its event stream
+            # Note: tool_resources is set on the assistant, not on the run
+            try:
+                stream = await client.beta.threads.runs.create(
+                    thread_id=thread_id,
+                    assistant_id=turn.assistant_id,
+                    additional_instructions=turn.system_instructions,
+                    stream=True,
+                )
+            except NotFoundError:
+                # A cached assistant ID was deleted remotely; re-verify on the next message
+                await invalidate_openai_resource_cache(user_id=turn.user_id, assistant_id=turn.assistant_id)
+                raise
+            
+            async for delta_text in self._consume(client, stream, turn):
+                if isinstance(delta_text, tuple):
+                    # The run was created: later senders cancel it instead of waiting
+                    run_id = delta_text[1]
+                    await run_registry.record(session_factory, thread_id, run_id)
+                else:
+                    yield delta_text
+        finally:
+            if run_id is None:
+                await run_registry.release(session_factory, thread_id)
+            else:
+                await run_registry.clear(session_factory, thread_id, run_id)
+    
+    async def _consume(
+        self,
+        client: AsyncOpenAI,
+        stream: Any,
+        turn: ChatTurn,
+    ) -> AsyncGenerator[Any, None]:
+        """Yield text deltas from a run event stream, plus ("run", run_id) once the run exists."""
+        thread_id = turn.thread_id
+        streamed_text = ""
+        run_id = None
+        settled = False
+        error_msg = None
+        
+        try:
+            async for event in stream:
+                if event.event == "thread.run.created":
+                    run_id = event.data.id
+                    yield ("run", run_id)
+                elif event.event == "thread.message.delta":
+                    delta_text = _extract_delta_text(event.data)
+                    if delta_text:
+                        streamed_text += delta_text
+                        yield delta_text
+                elif event.event == "thread.run.completed":
+                    settled = True
+                    break
+                elif event.event in ["thread.run.failed", "thread.run.cancelled", "thread.run.expired"]:
+                    run_data = event.data
+                    run_status = event.event.rsplit(".", 1)[-1]
+                    error_msg = f"Run {run_status}: {run_data.last_error.message if run_data.last_error else 'Unknown error'}"
+                    settled = True
+                    break
+                elif event.event == "thread.run.requires_action":
+                    # Tool calls are not implemented yet (future web search feature);
+                    # cancel so the paused run does not keep the thread locked
+                    logger.warning("Run requires action - tool calls not yet implemented")
+                    await cancel_active_run(thread_id, event.data.id)
+                    error_msg = "Run requires action: tool calls are not supported yet"
+                    settled = True
+                    break
+                elif event.event == "error":
+                    error_msg = f"Run stream error: {getattr(event.data, 'message', None) or 'Unknown error'}"
+                    settled = True
+                    break
+        except Exception as e:
+            # The event stream dropped; fall back to the run tracker below
+            logger.warning(f"Run event stream for thread {thread_id} interrupted: {e}")
+        finally:
+            await stream.close()
+        
+        if not settled and run_id:
+            # Stream ended before a terminal event - wait for the run to settle and
+            # emit whatever part of the final answer the stream did not deliver
+            try:
+                run_status = await run_tracker.wait_for_run(
+                    thread_id, run_id, timeout=settings.RUN_WAIT_TIMEOUT_SECONDS
+                )
+                if run_status.status == "completed":
+                    final_text = await _get_latest_response_text(client, thread_id)
+                    if final_text.startswith(streamed_text) and len(final_text) > len(streamed_text):
+                        yield final_text[len(streamed_text):]
+                else:
+                    error_msg = f"Run {run_status.status}: {run_status.last_error.message if run_status.last_error else 'Unknown error'}"
+            except asyncio.TimeoutError:
+                await cancel_active_run(thread_id, run_id)
+                error_msg = f"Run timed out after {settings.RUN_WAIT_TIMEOUT_SECONDS:.0f}s"
+        elif not settled:
+            error_msg = "Run stream ended before the run was created"
+        
+        if error_msg:
+            raise ChatProviderError(error_msg)
+
+
+# OpenAI-compatible endpoints for DEFAULT_LLM_PROVIDER (CHAT_COMPLETIONS_BASE_URL overrides)
+_CHAT_COMPLETIONS_ENDPOINTS = {
+    "openai": (None, "OPENAI_API_KEY"),
+    "anthropic": ("https://api.anthropic.com/v1/", "ANTHROPIC_API_KEY"),
+    "ollama": (None, None),
+}
+
+
+class ChatCompletionsBackend(ChatBackend):
+    """
+    One streaming chat-completions call per message.
+    
+    History is rebuilt from stored ChatMessage rows, so there are no remote
+    threads, runs or polls. Retrieval over uploaded documents (file_search)
+    is only available on the Assistants backend.
+    """
+    name = "chat_completions"
+    
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+    
+    def ensure_configured(self) -> None:
+        self.client()
+    
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            provider = settings.DEFAULT_LLM_PROVIDER.lower()
+            if provider not in _CHAT_COMPLETIONS_ENDPOINTS:
+                raise ValueError(f"Unsupported DEFAULT_LLM_PROVIDER for chat completions: {provider}")
+            base_url, key_setting = _CHAT_COMPLETIONS_ENDPOINTS[provider]
+            if provider == "ollama":
+                base_url = f"{settings.OLLAMA_BASE_URL.rstrip('/')}/v1"
+            api_key = getattr(settings, key_setting) if key_setting else "unused"
+            if settings.CHAT_COMPLETIONS_BASE_URL:
+                base_url = settings.CHAT_COMPLETIONS_BASE_URL
+                api_key = api_key or "unused"
+            if not api_key:
+                raise ValueError(f"{key_setting} is not set in configuration. Please set it in your .env file.")
+            self._client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        return self._client
+    
+    async def prepare(
+        self,
+        session_factory: async_sessionmaker,
+        user: User,
+        turn: ChatTurn,
+        image_document_ids: Optional[list[int]] = None,
+    ) -> None:
+        async with session_factory() as db:
+            await _touch_thread_map(db, user.id, turn.conversation_id)
+            turn.history = await _load_history(db, user.id, turn.conversation_id)
+            
+            image_paths = []
+            if image_document_ids:
+                images_result = await db.execute(
+                    select(Document.storage_path)
+                    .where(Document.id.in_(image_document_ids))
+                    .where(Document.is_deleted == False)  # noqa: E712
+                    .where(Document.uploader_id == user.id)  # Only user's own images
+                )
+                image_paths = [Path(path) for path in images_result.scalars().all()]
+            await db.commit()
+        
+        turn.image_urls = await asyncio.to_thread(_image_data_urls, image_paths)
+    
+    def _messages(self, turn: ChatTurn) -> List[Dict[str, Any]]:
+        content: Any = turn.sanitized_message
+        if turn.image_urls:
+            content = [{"type": "text", "text": turn.sanitized_message}]
+            content.extend({"type": "image_url", "image_url": {"url": url}} for url in turn.image_urls)
+        return [
+            {"role": "system", "content": turn.system_instructions},
+            *turn.history,
+            {"role": "user", "content": content},
+        ]
+    
+    async def complete(self, turn: ChatTurn, session_factory: async_sessionmaker) -> str:
+        try:
+            completion = await self.client().chat.completions.create(
+                model=settings.DEFAULT_LLM_MODEL,
+                messages=self._messages(turn),
+                temperature=settings.LLM_TEMPERATURE,
+                max_tokens=settings.LLM_MAX_TOKENS,
+            )
+        except Exception as e:
+            logger.error(f"Chat completion failed for conversation {turn.conversation_id}: {e}")
+            raise Exception(f"Failed to get AI response: {str(e)}")
+        if not completion.choices:
+            return ""
+        return completion.choices[0].message.content or ""
+    
+    async def stream(self, turn: ChatTurn, session_factory: async_sessionmaker) -> AsyncGenerator[str, None]:
+        stream = await self.client().chat.completions.create(
+            model=settings.DEFAULT_LLM_MODEL,
+            messages=self._messages(turn),
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            stream=True,
         )
-        db.add(query_log)
-        await db.commit()
-    except Exception as e:
-        logger.error(f"Error logging query: {e}")
-        await db.rollback()
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise ChatProviderError(f"Completion stream error: {e}")
+        finally:
+            await stream.close()
+
+
+def _image_data_urls(paths: List[Path]) -> list[str]:
+    """Inline image files as data URLs (chat completions cannot reference uploaded file IDs)"""
+    urls = []
+    for path in paths:
+        if not path.exists() or not _is_image_file(path):
+            continue
+        mime_type = mimetypes.guess_type(path.name)[0] or "image/png"
+        urls.append(f"data:{mime_type};base64,{base64.b64encode(path.read_bytes()).decode()}")
+    return urls
+
+
+def _replay_chunks(text: str, size: int = 80) -> List[str]:
+    """Split a cached answer into stream chunks at word boundaries"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = text.find(" ", start + size)
+        end = len(text) if end == -1 else end + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+_CHAT_BACKENDS = {
+    "assistants": AssistantsBackend,
+    "chat_completions": ChatCompletionsBackend,
+}
+_backend_instances: Dict[str, ChatBackend] = {}
+
+
+def get_chat_backend() -> ChatBackend:
+    """Return the backend selected by settings.CHAT_BACKEND."""
+    name = settings.CHAT_BACKEND
+    if name not in _CHAT_BACKENDS:
+        raise ValueError(f"Unknown CHAT_BACKEND: {name}")
+    if name not in _backend_instances:
+        _backend_instances[name] = _CHAT_BACKENDS[name]()
+    return _backend_instances[name]
+
+
+async def send_message(
+    session_factory: async_sessionmaker,
+    user: User,
+    message: str,
+    conversation_id: int,
+    current_module_id: Optional[int] = None,
+    current_lesson_id: Optional[int] = None,
+    ip_address: Optional[str] = None,
+    context_payload: Optional[Dict[str, Any]] = None,
+    image_document_ids: Optional[list[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Send a message to the AI assistant and get response.
+    
+    Args:
+        session_factory: Factory for the short-lived sessions of each DB phase
+        user: User object
+        message: User's message
+        conversation_id: Conversation ID
+        current_module_id: Optional current module ID for context
+        current_lesson_id: Optional current lesson ID for context
+        ip_address: Optional IP address for logging
+        context_payload: Optional extra context from the client
+        image_document_ids: Optional image documents to attach
+    
+    Returns:
+        Dict with 'response', 'conversation_id' and the stored 'chat_message'
+    """
+    backend = get_chat_backend()
+    try:
+        backend.ensure_configured()
+    except ValueError as e:
+        logger.error(f"LLM client initialization failed: {e}")
+        raise Exception(f"AI service configuration error: {str(e)}")
+    
+    turn = await prepare_chat_turn(
+        session_factory,
+        user,
+        message,
+        conversation_id,
+        current_module_id=current_module_id,
+        current_lesson_id=current_lesson_id,
+        ip_address=ip_address,
+        context_payload=context_payload,
+        image_document_ids=image_document_ids,
+        backend=backend,
+    )
+    
+    if turn.cached_response is not None:
+        response_text = turn.cached_response
+    else:
+        response_text = await backend.complete(turn, session_factory)
+        answered = bool(response_text)
+        if not response_text:
+            response_text = "I apologize, but I couldn't generate a response. Please try again."
+        
+        # Format citations in response
+        try:
+            async with session_factory() as db:
+                response_text = await format_citations_in_response(response_text, db, user_id=user.id)
+        except Exception as e:
+            logger.error(f"Error formatting citations: {e}", exc_info=True)
+            # Continue with unformatted response if citation formatting fails
+        
+        if turn.cache_key and answered:
+            await answer_cache.set(turn.cache_key, response_text)
+    
+    chat_message = await record_chat_turn(session_factory, turn, response_text, "chat")
+    if chat_message is None:
+        raise Exception("Failed to save chat message")
     
     return {
         "response": response_text,
-        "conversation_id": conversation_id
+        "conversation_id": conversation_id,
+        "chat_message": chat_message,
     }
 
 
 async def send_message_stream(
-    db: AsyncSession,
+    session_factory: async_sessionmaker,
     user: User,
     message: str,
     conversation_id: int,
@@ -314,122 +982,61 @@ async def send_message_stream(
     """
     Send a message and stream the response.
     
+    The turn is recorded once the stream has finished.
+    
     Yields:
         Response text chunks
     """
-    client = get_openai_client()
-    
-    # Sanitize message
-    sanitized_message = sanitize_message(message)
+    backend = get_chat_backend()
+    backend.ensure_configured()
     
-    # Get image file IDs if provided
-    image_file_ids = await _get_image_file_ids(db, user, image_document_ids)
-    
-    # Get or create thread
-    thread_id = await get_or_create_thread(db, user, conversation_id)
+    turn = await prepare_chat_turn(
+        session_factory,
+        user,
+        message,
+        conversation_id,
+        current_module_id=current_module_id,
+        current_lesson_id=current_lesson_id,
+        ip_address=ip_address,
+        context_payload=context_payload,
+        image_document_ids=image_document_ids,
+        backend=backend,
+    )
     
-    # Cancel any active runs
-    await cancel_active_runs_for_thread(thread_id)
+    if turn.cached_response is not None:
+        for chunk in _replay_chunks(turn.cached_response):
+            yield chunk
+        chat_message = await record_chat_turn(session_factory, turn, turn.cached_response, "stream")
+        if chat_message is None:
+            raise Exception("Failed to save chat message")
+        return
     
-    # Gather user context
-    try:
-        context = await gather_user_context(
-            user,
-            db,
-            current_module_id=current_module_id,
-            current_lesson_id=current_lesson_id,
-            extra_context=context_payload,
-        )
-    except Exception as e:
-        logger.error(f"Error gathering context: {e}")
-        context = {}
+    # Forward text deltas as they arrive, rewriting citations incrementally
+    formatter = StreamingCitationFormatter(session_factory=session_factory, user_id=user.id)
+    full_response = ""
+    error_msg = None
     
-    # Format system prompt
-    system_instructions = format_system_prompt_with_context(context)
-
-    # Sync vector store
-    vector_store_id = None
     try:
-        vector_store_id = await update_vector_store(db, user)
-    except Exception as e:
-        logger.warning(f"Vector store sync failed for user {user.id}: {e}")
+        async for delta_text in backend.stream(turn, session_factory):
+            chunk = await formatter.feed(delta_text)
+            if chunk:
+                full_response += chunk
+                yield chunk
+    except ChatProviderError as e:
+        error_msg = str(e)
     
-    # Get assistant (will attach vector store if available)
-    assistant_id = await get_assistant_for_user(user, db, vector_store_id)
+    # Release any text held back while waiting for a citation to close
+    remaining = await formatter.flush()
+    if remaining:
+        full_response += remaining
+        yield remaining
     
-    # Build message content (text + images)
-    message_content: list[Dict[str, Any]] = [{"type": "text", "text": sanitized_message}]
-    
-    # Add image file attachments if any
-    for file_id in image_file_ids:
-        message_content.append({"type": "image_file", "image_file": {"file_id": file_id}})
-    
-    # Add message to thread
-    await client.beta.threads.messages.create(
-        thread_id=thread_id,
-        role="user",
-        content=message_content if image_file_ids else sanitized_message
-    )
+    if error_msg:
+        logger.error(error_msg)
+        yield f"\n\n[Error: {error_msg}]"
+    elif turn.cache_key and full_response:
+        await answer_cache.set(turn.cache_key, full_response)
     
-    # Create run
-    # Note: tool_resources is set on the assistant, not on the run
-    run = await client.beta.threads.runs.create(
-        thread_id=thread_id,
-        assistant_id=assistant_id,
-        additional_instructions=system_instructions,
-    )
-    
-    # Stream response
-    import asyncio
-    full_response = ""
-    
-    while True:
-        run_status = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-        
-        if run_status.status == "completed":
-            # Get final response
-            messages = await client.beta.threads.messages.list(thread_id=thread_id, limit=1)
-            if messages.data:
-                message = messages.data[0]
-                if message.content:
-                    for content in message.content:
-                        if content.type == "text":
-                            raw_response = content.text.value
-                            # Format citations in the full response
-                            try:
-                                formatted_response = await format_citations_in_response(raw_response, db)
-                            except Exception as e:
-                                logger.error(f"Error formatting citations in stream: {e}", exc_info=True)
-                                formatted_response = raw_response
-                            # Yield the formatted response (since we're not actually streaming incrementally)
-                            if formatted_response and formatted_response != full_response:
-                                yield formatted_response
-                            full_response = formatted_response
-            break
-        elif run_status.status in ["failed", "cancelled", "expired"]:
-            error_msg = f"Run {run_status.status}: {run_status.last_error.message if run_status.last_error else 'Unknown error'}"
-            logger.error(error_msg)
-            yield f"\n\n[Error: {error_msg}]"
-            break
-        elif run_status.status == "requires_action":
-            # Handle tool calls if needed (for future web search feature)
-            logger.warning("Run requires action - tool calls not yet implemented")
-            await asyncio.sleep(0.5)
-        else:
-            await asyncio.sleep(0.5)
-    
-    # Log query
-    try:
-        query_log = QueryLog(
-            user_id=user.id,
-            query=sanitized_message,
-            response=full_response,
-            operation_type="stream",
-            conversation_id=conversation_id,
-            ip_address=ip_address
-        )
-        db.add(query_log)
-        await db.commit()
-    except Exception as e:
-        logger.error(f"Error logging query: {e}")
-        await db.rollback()
+    chat_message = await record_chat_turn(session_factory, turn, full_response, "stream")
+    if chat_message is None:
+        raise Exception("Failed to save chat message")
@@ -0,0 +1,335 @@
+"""Write-behind writer that batches audit rows (query_logs) into bulk inserts"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, insert
+from sqlalchemy.exc import CompileError, DataError, IntegrityError, ProgrammingError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.core.database import Base
+
+logger = logging.getLogger(__name__)
+
+# Errors that reject a row itself (constraint violations, schema changes) rather
+# than signal that the database is unavailable; retrying such a row cannot succeed
+REJECTED_ROW_ERRORS = (CompileError, DataError, IntegrityError, ProgrammingError, KeyError)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindWriter:
+    """
+    Buffer rows in memory and insert them in bulk on a size or time threshold.
+
+    Every submitted row is first appended to a spool file, which is deleted
+    only after its rows are committed. Spool files left by a crashed process
+    are inserted again on the next start, so rows are delivered at least once
+    (a crash between commit and delete can insert a batch twice).
+
+    A spool file whose bulk insert fails max_attempts times is inserted row
+    by row; rows the database rejects are moved to spool_dir/dead-letter so
+    they do not hold up the files behind them.
+
+    Submitters wait up to submit_timeout while more than max_pending rows
+    are unflushed.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        spool_dir: str = settings.LOG_WRITER_SPOOL_DIR,
+        batch_size: int = settings.LOG_WRITER_BATCH_SIZE,
+        flush_interval: float = settings.LOG_WRITER_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.LOG_WRITER_MAX_PENDING,
+        fsync: bool = settings.LOG_WRITER_FSYNC,
+        max_attempts: int = settings.LOG_WRITER_MAX_ATTEMPTS,
+        submit_timeout: float = settings.LOG_WRITER_SUBMIT_TIMEOUT_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self.submit_timeout = submit_timeout
+
+        self._queue: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        # Spool files whose rows are not committed yet, oldest first
+        self._segments: List[Tuple[Path, List[Tuple[str, Dict[str, Any]]]]] = []
+        self._attempts: Dict[Path, int] = {}
+        self._journal = None
+        self._journal_path: Optional[Path] = None
+        self._sequence = 0
+        self._instance = uuid.uuid4().hex[:8]
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._journal_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._written = 0
+        self._batches = 0
+        self._failed_flushes = 0
+        self._blocked_submits = 0
+        self._rejected_submits = 0
+        self._dead_lettered = 0
+        self._recovered = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._task and not self._task.done())
+
+    @property
+    def pending(self) -> int:
+        """Rows submitted but not yet committed"""
+        return len(self._queue) + sum(len(rows) for _, rows in self._segments)
+
+    def start(self) -> None:
+        """Recover spool files from crashed processes and start the flush loop."""
+        if self.running:
+            return
+        if self.session_factory is None:
+            from app.backend.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._flush_lock = asyncio.Lock()
+        self._journal_lock = asyncio.Lock()
+        # Rows left from an earlier stop() are still in their spool files
+        self._segments = []
+        self._attempts = {}
+        self._recover()
+        self._open_journal()
+        self._task = asyncio.get_running_loop().create_task(self._run_loop(), name="log-write-behind")
+        logger.info("Log writer started")
+
+    async def stop(self) -> None:
+        """Stop the loop and flush what is buffered; anything that fails stays spooled for the next start."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_lock is not None:
+            await self.flush()
+        if self._journal is not None:
+            async with self._journal_lock:
+                self._journal.close()
+                self._journal = None
+            if self._journal_path and self._journal_path.exists() and self._journal_path.stat().st_size == 0:
+                self._journal_path.unlink()
+        logger.info(f"Log writer stopped ({self.pending} rows left spooled)")
+
+    async def submit(self, model: type, row: Dict[str, Any]) -> bool:
+        """
+        Queue a row for insertion into model's table.
+
+        Returns:
+            False if the buffer stayed full for submit_timeout and the row was
+            not accepted; the caller should write it some other way
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.submit_timeout
+        while self.pending >= self.max_pending:
+            # Backpressure: wait (boundedly) for the flush loop to make room
+            self._blocked_submits += 1
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                self._rejected_submits += 1
+                return False
+
+        table = model.__tablename__
+        line = json.dumps({"table": table, "row": row}, default=str) + "\n"
+        # The spool file is not swapped while a row is being written to it
+        async with self._journal_lock:
+            await asyncio.to_thread(self._append, line)
+            self._queue.append((table, row))
+        # Wake the loop once per batch, not again for every row queued while it seals it
+        if len(self._queue) == self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """
+        Insert everything submitted so far.
+
+        Returns:
+            Number of rows committed
+        """
+        async with self._flush_lock:
+            async with self._journal_lock:
+                if self._queue:
+                    # Seal the current spool file with exactly the queued rows
+                    rows = list(self._queue)
+                    self._queue.clear()
+                    self._segments.append((self._journal_path, rows))
+                    self._journal.close()
+                    self._open_journal()
+
+            committed = 0
+            while self._segments:
+                path, rows = self._segments[0]
+                try:
+                    await self._insert(rows)
+                    written = len(rows)
+                except Exception as e:
+                    self._failed_flushes += 1
+                    attempts = self._attempts[path] = self._attempts.get(path, 0) + 1
+                    if attempts < self.max_attempts:
+                        logger.error(f"Log writer flush of {len(rows)} rows failed, will retry: {e}")
+                        break
+                    logger.error(f"Log writer flush of {len(rows)} rows failed {attempts} times, inserting row by row: {e}")
+                    try:
+                        written = await self._insert_each(path, rows)
+                    except Exception as e:
+                        logger.error(f"Log writer row-by-row insert stopped, will retry: {e}")
+                        break
+                self._segments.pop(0)
+                self._attempts.pop(path, None)
+                path.unlink(missing_ok=True)
+                committed += written
+                self._written += written
+
+            if self.pending < self.max_pending:
+                self._space.set()
+            return committed
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return flush counters for this process."""
+        return {
+            "running": self.running,
+            "pending": self.pending if self._flush_lock is not None else 0,
+            "written": self._written,
+            "batches": self._batches,
+            "failed_flushes": self._failed_flushes,
+            "blocked_submits": self._blocked_submits,
+            "rejected_submits": self._rejected_submits,
+            "dead_lettered": self._dead_lettered,
+            "recovered": self._recovered,
+        }
+
+    async def _insert(self, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for table, row in rows:
+            by_table.setdefault(table, []).append(row)
+        async with self.session_factory() as db:
+            for table, table_rows in by_table.items():
+                target = Base.metadata.tables[table]
+                for start in range(0, len(table_rows), self.batch_size):
+                    await db.execute(insert(target), table_rows[start:start + self.batch_size])
+                    self._batches += 1
+            await db.commit()
+
+    async def _insert_each(self, path: Path, rows: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Insert a spool file's rows one at a time, dead-lettering the ones the database rejects.
+
+        Raises on any other error (the database is unavailable); rows not yet
+        inserted stay queued for the next flush.
+
+        Returns:
+            Number of rows committed
+        """
+        written = 0
+        for index, (table, row) in enumerate(rows):
+            try:
+                await self._insert([(table, row)])
+            except REJECTED_ROW_ERRORS as e:
+                self._dead_letter(path, table, row, e)
+                continue
+            except Exception:
+                self._segments[0] = (path, rows[index:])
+                self._written += written
+                raise
+            written += 1
+        return written
+
+    def _dead_letter(self, path: Path, table: str, row: Dict[str, Any], error: Exception) -> None:
+        dead_letter_dir = self.spool_dir / "dead-letter"
+        dead_letter_dir.mkdir(exist_ok=True)
+        with (dead_letter_dir / path.name).open("a", encoding="utf-8") as out:
+            out.write(json.dumps({"table": table, "row": row, "error": str(error)[:1000]}, default=str) + "\n")
+        self._dead_lettered += 1
+        logger.error(f"Log writer moved a {table} row to {dead_letter_dir / path.name}: {error}")
+
+    def _append(self, line: str) -> None:
+        self._journal.write(line)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _open_journal(self) -> None:
+        self._sequence += 1
+        self._journal_path = self.spool_dir / f"{os.getpid()}-{self._instance}-{self._sequence}.jsonl"
+        self._journal = self._journal_path.open("a", encoding="utf-8")
+
+    def _recover(self) -> None:
+        """Load spool files whose writing process is gone."""
+        for path in sorted(self.spool_dir.glob("*.jsonl")):
+            pid = int(path.name.split("-", 1)[0]) if path.name.split("-", 1)[0].isdigit() else None
+            # A file with our pid is from an earlier process that had the same pid
+            if pid is not None and pid != os.getpid() and _pid_alive(pid):
+                continue
+            rows = []
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from the crash; everything before it is intact
+                    continue
+                rows.append((record["table"], self._restore_types(record["table"], record["row"])))
+            if rows:
+                self._segments.append((path, rows))
+                self._recovered += len(rows)
+            else:
+                path.unlink(missing_ok=True)
+        if self._recovered:
+            logger.warning(f"Log writer recovered {self._recovered} spooled rows")
+
+    @staticmethod
+    def _restore_types(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        columns = Base.metadata.tables[table].c
+        for name, value in row.items():
+            if isinstance(value, str) and name in columns and isinstance(columns[name].type, DateTime):
+                row[name] = datetime.fromisoformat(value)
+        return row
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Log writer pass failed: {e}")
+
+
+log_writer = WriteBehindWriter()
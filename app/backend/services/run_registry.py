@@ -0,0 +1,143 @@
+"""Registry of in-flight OpenAI runs per thread, shared by all workers through thread_runs"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update, delete, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.models.thread_run import ThreadRun
+
+logger = logging.getLogger(__name__)
+
+
+class RunRegistry:
+    """
+    Track the run each thread has in flight so a new message only cancels runs we started.
+
+    A sender claims the thread with a short lease before it cancels the
+    previous run, adds its message and starts its own run; other senders
+    (in any worker) wait for the claim, so sends into one thread take turns.
+    A crashed sender's claim expires after lease_seconds. Every step is its
+    own short transaction; no connection is held across OpenAI calls.
+    """
+
+    def __init__(
+        self,
+        lease_seconds: float = settings.RUN_CLAIM_LEASE_SECONDS,
+        initial_wait: float = 0.05,
+        max_wait: float = 0.5,
+    ):
+        self.lease_seconds = lease_seconds
+        self.initial_wait = initial_wait
+        self.max_wait = max_wait
+
+        self._claims = 0
+        self._recorded = 0
+        self._waits = 0
+        self._cancelled = 0
+        self._fallbacks = 0
+
+    async def claim(self, session_factory: async_sessionmaker, thread_id: str) -> Optional[str]:
+        """
+        Wait for our turn to start a run on the thread.
+
+        Returns:
+            The run we recorded as still in flight (the caller cancels it), or None
+        """
+        delay = self.initial_wait
+        while True:
+            now = datetime.now(timezone.utc)
+            async with session_factory() as db:
+                row = await db.get(ThreadRun, thread_id, populate_existing=True)
+                if row is None:
+                    try:
+                        db.add(ThreadRun(
+                            thread_id=thread_id,
+                            run_id=None,
+                            locked_until=now + timedelta(seconds=self.lease_seconds),
+                        ))
+                        await db.commit()
+                        self._claims += 1
+                        return None
+                    except IntegrityError:
+                        # Another sender created the row first
+                        await db.rollback()
+                        continue
+
+                previous = row.run_id
+                result = await db.execute(
+                    update(ThreadRun)
+                    .where(ThreadRun.thread_id == thread_id)
+                    .where(ThreadRun.run_id == previous if previous else ThreadRun.run_id.is_(None))
+                    .where(or_(ThreadRun.locked_until.is_(None), ThreadRun.locked_until < now))
+                    .values(locked_until=now + timedelta(seconds=self.lease_seconds))
+                    # The row we just read is discarded with the session; skip syncing it
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    self._claims += 1
+                    return previous
+
+            self._waits += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_wait)
+
+    async def record(self, session_factory: async_sessionmaker, thread_id: str, run_id: str) -> None:
+        """Store the run we started and release the claim."""
+        async with session_factory() as db:
+            await db.execute(
+                update(ThreadRun)
+                .where(ThreadRun.thread_id == thread_id)
+                .values(run_id=run_id, locked_until=None)
+            )
+            await db.commit()
+        self._recorded += 1
+
+    async def release(self, session_factory: async_sessionmaker, thread_id: str) -> None:
+        """Give up a claim without starting a run (the previous run was already cancelled)."""
+        async with session_factory() as db:
+            await db.execute(
+                update(ThreadRun)
+                .where(ThreadRun.thread_id == thread_id)
+                .values(run_id=None, locked_until=None)
+            )
+            await db.commit()
+
+    async def clear(self, session_factory: async_sessionmaker, thread_id: str, run_id: str) -> None:
+        """Forget a run once it has settled (no-op if a newer run replaced it)."""
+        try:
+            async with session_factory() as db:
+                await db.execute(
+                    delete(ThreadRun)
+                    .where(ThreadRun.thread_id == thread_id)
+                    .where(ThreadRun.run_id == run_id)
+                    .where(ThreadRun.locked_until.is_(None))
+                )
+                await db.commit()
+        except Exception as e:
+            # A stale row only costs one cancel call on the next message
+            logger.warning(f"Could not clear run {run_id} for thread {thread_id}: {e}")
+
+    def record_cancel(self) -> None:
+        self._cancelled += 1
+
+    def record_fallback(self) -> None:
+        self._fallbacks += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return claim and cancellation counters for this process."""
+        return {
+            "claims": self._claims,
+            "claim_waits": self._waits,
+            "recorded_runs": self._recorded,
+            "cancelled_known_runs": self._cancelled,
+            "remote_listing_fallbacks": self._fallbacks,
+        }
+
+
+run_registry = RunRegistry()
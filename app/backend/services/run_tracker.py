@@ -0,0 +1,240 @@
+"""Process-wide tracker that polls in-flight OpenAI Assistants runs"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from app.backend.core.config import settings
+from app.backend.core.openai_utils import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which a run will not change again without our intervention
+SETTLED_RUN_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete", "requires_action"}
+
+
+@dataclass
+class _TrackedRun:
+    """A pending run and the future its callers are waiting on"""
+    thread_id: str
+    run_id: str
+    future: asyncio.Future
+    started_at: float
+    next_poll_at: float
+    polls: int = 0
+    errors: int = 0
+    waiters: int = 0
+    polling: bool = False  # A retrieve for this run is queued or in flight
+
+
+class RunTracker:
+    """
+    Poll every pending (thread_id, run_id) from a single background task.
+
+    Callers register a run and await a future instead of running their own
+    retrieve loop. Each run is polled quickly at first and then backs off
+    exponentially (with jitter) so long runs cost fewer requests. Each due
+    run is retrieved in its own task under a shared limit, so one slow
+    request only delays the run it belongs to.
+    """
+
+    def __init__(
+        self,
+        initial_interval: float = settings.RUN_POLL_INITIAL_INTERVAL,
+        max_interval: float = settings.RUN_POLL_MAX_INTERVAL,
+        backoff_factor: float = 1.5,
+        jitter: float = 0.2,
+        max_concurrent_polls: int = settings.RUN_POLL_MAX_CONCURRENCY,
+        max_consecutive_errors: int = 5,
+        history_size: int = 500,
+    ):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.max_concurrent_polls = max_concurrent_polls
+        self.max_consecutive_errors = max_consecutive_errors
+
+        self._runs: Dict[tuple[str, str], _TrackedRun] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._poll_tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._total_polls = 0
+        self._total_runs = 0
+        self._poll_history: deque[int] = deque(maxlen=history_size)
+        self._duration_history: deque[float] = deque(maxlen=history_size)
+
+    def start(self) -> None:
+        """Start the polling task on the running event loop if it is not already running."""
+        loop = asyncio.get_running_loop()
+        if self._task and not self._task.done() and self._loop is loop:
+            return
+        if self._loop is not loop:
+            # Futures from another (closed) loop can never be resolved here
+            self._runs.clear()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run_loop(), name="openai-run-tracker")
+        logger.info("Run tracker started")
+
+    async def stop(self) -> None:
+        """Stop polling and fail any runs still being waited on."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._poll_tasks):
+            task.cancel()
+        await asyncio.gather(*self._poll_tasks, return_exceptions=True)
+        self._poll_tasks.clear()
+        for entry in self._runs.values():
+            if not entry.future.done():
+                entry.future.set_exception(RuntimeError("Run tracker stopped before run finished"))
+        self._runs.clear()
+        logger.info("Run tracker stopped")
+
+    async def wait_for_run(self, thread_id: str, run_id: str, timeout: Optional[float] = None) -> Any:
+        """
+        Wait until a run settles and return its final run object.
+
+        Args:
+            thread_id: OpenAI thread ID
+            run_id: OpenAI run ID
+            timeout: Optional number of seconds to wait before giving up
+
+        Returns:
+            The run object from the last retrieve call
+        """
+        self.start()
+        key = (thread_id, run_id)
+        entry = self._runs.get(key)
+        if entry is None:
+            now = time.monotonic()
+            entry = _TrackedRun(
+                thread_id=thread_id,
+                run_id=run_id,
+                future=self._loop.create_future(),
+                started_at=now,
+                next_poll_at=now + self.initial_interval,
+            )
+            self._runs[key] = entry
+            self._total_runs += 1
+            self._wakeup.set()
+
+        # Several callers may wait on the same run; one giving up must not
+        # cancel the others, so the run is only dropped when the last one leaves
+        entry.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.future.done():
+                entry.future.cancel()
+                if self._runs.get(key) is entry:
+                    del self._runs[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return in-flight counts and polls-per-run statistics."""
+        polls = sorted(self._poll_history)
+        durations = sorted(self._duration_history)
+        now = time.monotonic()
+        return {
+            "in_flight": len(self._runs),
+            "in_flight_polls": {f"{t}:{r}": e.polls for (t, r), e in self._runs.items()},
+            "oldest_in_flight_seconds": round(max((now - e.started_at for e in self._runs.values()), default=0.0), 3),
+            "total_runs": self._total_runs,
+            "total_polls": self._total_polls,
+            "completed_runs": len(polls),
+            "polls_per_run_avg": round(sum(polls) / len(polls), 2) if polls else 0.0,
+            "polls_per_run_p50": polls[len(polls) // 2] if polls else 0,
+            "polls_per_run_max": polls[-1] if polls else 0,
+            "run_seconds_p50": round(durations[len(durations) // 2], 3) if durations else 0.0,
+        }
+
+    def _next_interval(self, polls: int) -> float:
+        """Exponential backoff capped at max_interval, spread by +/- jitter."""
+        interval = min(self.max_interval, self.initial_interval * (self.backoff_factor ** polls))
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run_loop(self) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrent_polls)
+        while True:
+            # Drop runs nobody is waiting on any more
+            for key in [k for k, e in self._runs.items() if e.future.done()]:
+                self._runs.pop(key, None)
+
+            # Runs with a retrieve already in flight are rescheduled when it returns
+            idle = [e for e in self._runs.values() if not e.polling]
+            if not idle:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            next_due = min(e.next_poll_at for e in idle)
+            if next_due > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), next_due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for entry in idle:
+                if entry.next_poll_at <= now:
+                    entry.polling = True
+                    task = self._loop.create_task(self._poll(entry, semaphore))
+                    self._poll_tasks.add(task)
+                    task.add_done_callback(self._poll_tasks.discard)
+
+    async def _poll(self, entry: _TrackedRun, semaphore: asyncio.Semaphore) -> None:
+        try:
+            async with semaphore:
+                try:
+                    client = get_openai_client()
+                    run = await client.beta.threads.runs.retrieve(thread_id=entry.thread_id, run_id=entry.run_id)
+                except Exception as e:
+                    entry.errors += 1
+                    logger.warning(f"Error polling run {entry.run_id} ({entry.errors} in a row): {e}")
+                    if entry.errors >= self.max_consecutive_errors:
+                        self._settle(entry, error=e)
+                    else:
+                        entry.next_poll_at = time.monotonic() + self._next_interval(entry.polls)
+                    return
+
+            entry.polls += 1
+            entry.errors = 0
+            self._total_polls += 1
+
+            if run.status in SETTLED_RUN_STATUSES:
+                self._settle(entry, run=run)
+            else:
+                entry.next_poll_at = time.monotonic() + self._next_interval(entry.polls)
+        finally:
+            entry.polling = False
+            self._wakeup.set()
+
+    def _settle(self, entry: _TrackedRun, run: Any = None, error: Optional[Exception] = None) -> None:
+        key = (entry.thread_id, entry.run_id)
+        if self._runs.get(key) is entry:
+            del self._runs[key]
+        self._poll_history.append(entry.polls)
+        self._duration_history.append(time.monotonic() - entry.started_at)
+        if entry.future.done():
+            return
+        if error is not None:
+            entry.future.set_exception(error)
+        else:
+            entry.future.set_result(run)
+
+
+# Shared tracker used by every request in this process
+run_tracker = RunTracker()
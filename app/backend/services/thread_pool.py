@@ -0,0 +1,218 @@
+"""Background pool of pre-created OpenAI threads for new conversations"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from openai import NotFoundError
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.core.openai_utils import get_openai_client
+from app.backend.models.pooled_thread import PooledThread
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPool:
+    """
+    Keep a stock of empty OpenAI threads so a conversation's first message skips threads.create.
+
+    The stock lives in pooled_threads, so every app process claims from and
+    refills the same pool. Claiming deletes the row; only one claimer can
+    delete it. Each process refills up to target_size when fewer than
+    low_water threads are left, so concurrent refills can overshoot by a few
+    threads. Threads nobody claimed within max_age are deleted remotely.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        enabled: bool = settings.THREAD_POOL_ENABLED,
+        low_water: int = settings.THREAD_POOL_LOW_WATER,
+        target_size: int = settings.THREAD_POOL_TARGET_SIZE,
+        refill_interval: float = settings.THREAD_POOL_REFILL_INTERVAL_SECONDS,
+        max_age: float = settings.THREAD_POOL_MAX_AGE_SECONDS,
+        create_concurrency: int = 4,
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.low_water = low_water
+        self.target_size = target_size
+        self.refill_interval = refill_interval
+        self.max_age = max_age
+        self.create_concurrency = create_concurrency
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._claimed = 0
+        self._misses = 0
+        self._created = 0
+        self._expired = 0
+
+    def start(self) -> None:
+        """Start the refill loop on the running event loop."""
+        if self._task and not self._task.done():
+            return
+        if self.session_factory is None:
+            from app.backend.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run_loop(), name="openai-thread-pool")
+        logger.info("Thread pool started")
+
+    async def stop(self) -> None:
+        """Stop refilling; unclaimed threads stay in the pool for the next start."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Thread pool stopped")
+
+    async def claim(self, db: AsyncSession, attempts: int = 3) -> Optional[str]:
+        """
+        Take an unclaimed thread from the pool (commits db).
+
+        Returns:
+            The thread ID, or None if the pool is empty or disabled
+        """
+        if not self.enabled:
+            return None
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        for _ in range(attempts):
+            result = await db.execute(
+                select(PooledThread.id, PooledThread.thread_id)
+                .where(PooledThread.created_at >= cutoff)
+                .order_by(PooledThread.created_at)
+                .limit(5)
+            )
+            candidates = result.all()
+            if not candidates:
+                break
+            # Spread concurrent claimers over the oldest few rows
+            row = random.choice(candidates)
+            deleted = await db.execute(
+                delete(PooledThread)
+                .where(PooledThread.id == row.id)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if deleted.rowcount == 1:
+                self._claimed += 1
+                self._notify()
+                return row.thread_id
+
+        await db.commit()
+        self._misses += 1
+        self._notify()
+        return None
+
+    async def refill(self) -> int:
+        """
+        Create threads until the pool holds target_size, if it is below low_water.
+
+        Returns:
+            Number of threads added
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        async with self.session_factory() as db:
+            available = await db.scalar(
+                select(func.count(PooledThread.id)).where(PooledThread.created_at >= cutoff)
+            )
+        if available >= self.low_water:
+            return 0
+
+        client = get_openai_client()
+        semaphore = asyncio.Semaphore(self.create_concurrency)
+
+        async def _create() -> Optional[str]:
+            async with semaphore:
+                try:
+                    thread = await client.beta.threads.create()
+                    return thread.id
+                except Exception as e:
+                    logger.warning(f"Could not pre-create thread: {e}")
+                    return None
+
+        created = await asyncio.gather(*(_create() for _ in range(self.target_size - available)))
+        thread_ids = [thread_id for thread_id in created if thread_id]
+        if thread_ids:
+            async with self.session_factory() as db:
+                db.add_all(PooledThread(thread_id=thread_id) for thread_id in thread_ids)
+                await db.commit()
+            self._created += len(thread_ids)
+        return len(thread_ids)
+
+    async def collect_garbage(self, batch_size: int = 100) -> int:
+        """
+        Delete threads that stayed unclaimed longer than max_age.
+
+        Returns:
+            Number of threads removed from the pool
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        removed: List[str] = []
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(PooledThread.id, PooledThread.thread_id)
+                .where(PooledThread.created_at < cutoff)
+                .limit(batch_size)
+            )
+            for row in result.all():
+                # A row another process claimed or collected meanwhile deletes nothing
+                deleted = await db.execute(
+                    delete(PooledThread)
+                    .where(PooledThread.id == row.id)
+                    .execution_options(synchronize_session=False)
+                )
+                if deleted.rowcount == 1:
+                    removed.append(row.thread_id)
+            await db.commit()
+
+        if removed:
+            client = get_openai_client()
+            for thread_id in removed:
+                try:
+                    await client.beta.threads.delete(thread_id)
+                except NotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Could not delete expired pooled thread {thread_id}: {e}")
+            self._expired += len(removed)
+        return len(removed)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return claim and refill counters for this process."""
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "claimed": self._claimed,
+            "misses": self._misses,
+            "created": self._created,
+            "expired": self._expired,
+        }
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                await self.collect_garbage()
+                await self.refill()
+            except Exception as e:
+                logger.error(f"Thread pool pass failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+thread_pool = ThreadPool()
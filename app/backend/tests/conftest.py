@@ -2,8 +2,10 @@
 import sys
 from pathlib import Path
 
+import httpx
 import pytest
 from httpx import AsyncClient
+from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -11,7 +13,7 @@ ROOT_DIR = Path(__file__).resolve().parents[3]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from app.backend.core.database import Base, get_db
+from app.backend.core.database import Base, get_db, get_session_factory
 from app.backend.main import app
 from app.backend.models.user import User, UserRole
 from app.backend.models.module import Module, Track
@@ -19,6 +21,11 @@ from app.backend.models.assessment import Assessment, QuestionType
 from app.backend.models.cohort import Cohort, CohortMember, CohortRole
 from app.backend.models.progress import QuizAttempt, ReviewStatus
 from app.backend.core.security import create_access_token
+from app.backend.core.config import settings
+from app.backend.fake_llm_provider import create_app as create_fake_llm_provider
+from app.backend.services import llm_service
+from app.backend.services.admission import AdmissionController
+from app.backend.api.v1.endpoints import ai_assistant as ai_assistant_endpoints
 
 # Use in-memory SQLite for testing
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -118,8 +125,20 @@ def _apply_db_override(db_session: AsyncSession):
         yield db_session
 
     app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
     yield
     app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_session_factory, None)
+
+
+@pytest.fixture(autouse=True)
+def _unlimited_chat_admission(monkeypatch):
+    """Tests send many chats as one user; admission limits are tested in test_admission.py"""
+    monkeypatch.setattr(
+        ai_assistant_endpoints,
+        "chat_admission",
+        AdmissionController(rate_per_minute=1_000_000, burst=1000, max_concurrent=1000),
+    )
 
 
 @pytest.fixture
@@ -155,6 +174,30 @@ async def test_instructor_token(test_instructor: User):
     return create_access_token(data={"sub": str(test_instructor.id)})
 
 
+@pytest.fixture
+async def test_admin(db_session: AsyncSession):
+    """Create a test admin user"""
+    admin = User(
+        email="admin@example.com",
+        hashed_password="hashed_password",
+        username="admin",
+        full_name="Test Admin",
+        role=UserRole.ADMIN,
+        is_active=True,
+        is_verified=True,
+    )
+    db_session.add(admin)
+    await db_session.commit()
+    await db_session.refresh(admin)
+    return admin
+
+
+@pytest.fixture
+async def test_admin_token(test_admin: User):
+    """Create a test JWT token for admin"""
+    return create_access_token(data={"sub": str(test_admin.id)})
+
+
 @pytest.fixture
 async def test_cohort(db_session: AsyncSession, test_instructor: User):
     """Create a test cohort"""
@@ -226,3 +269,23 @@ async def async_client():
     async with AsyncClient(app=app, base_url="http://test") as client:
         yield client
 
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    """Route chat through the chat completions backend to the fake provider, in-process"""
+    provider = create_fake_llm_provider()
+    backend = llm_service.ChatCompletionsBackend()
+    backend._client = AsyncOpenAI(
+        api_key="unused",
+        base_url="http://fake-provider/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=provider)),
+    )
+    monkeypatch.setattr(settings, "CHAT_BACKEND", "chat_completions")
+    monkeypatch.setitem(llm_service._backend_instances, "chat_completions", backend)
+
+    def _no_openai():
+        raise AssertionError("the chat completions backend must not use the Assistants client")
+
+    monkeypatch.setattr(llm_service, "get_openai_client", _no_openai)
+    return provider
@@ -0,0 +1,142 @@
+"""Tests for the activity event stream and its monthly day bitmaps"""
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.activity import ActivityEvent, ActivityKind, UserActivityMonth
+from app.backend.models.assessment import Assessment
+from app.backend.models.module import Lesson, Module
+from app.backend.models.user import User, UserRole
+from app.backend.services.activity import (
+    current_streak_days,
+    month_masks,
+    pack_days,
+    rebuild_activity_months,
+    record_activity,
+    streak_at,
+    utc_day,
+)
+
+
+def _at(day: date) -> datetime:
+    return datetime.combine(day, time(12), timezone.utc)
+
+
+def test_bitmaps_span_month_boundaries():
+    """Masks split a range by month; packed months line up day by day"""
+    assert month_masks(date(2026, 1, 30), date(2026, 2, 2)) == {
+        date(2026, 1, 1): 0b11 << 29,
+        date(2026, 2, 1): 0b11,
+    }
+    # Active Jan 29-31 and Feb 1-2, then Feb 4
+    bits = pack_days([(date(2026, 1, 1), 0b111 << 28), (date(2026, 2, 1), 0b1011)], date(2026, 1, 1))
+    assert streak_at(bits, (date(2026, 2, 2) - date(2026, 1, 1)).days) == 5
+    assert streak_at(bits, (date(2026, 2, 4) - date(2026, 1, 1)).days) == 1
+    assert streak_at(bits, (date(2026, 2, 3) - date(2026, 1, 1)).days) == 0
+
+
+@pytest.mark.asyncio
+async def test_record_activity_marks_each_day_once(db_session: AsyncSession, test_user: User):
+    """Every event is kept; the month row only gains a bit per new day"""
+    days = [date(2026, 2, 27), date(2026, 2, 28), date(2026, 2, 28), date(2026, 3, 1), date(2026, 3, 2)]
+    for day in days:
+        await record_activity(db_session, test_user.id, ActivityKind.LESSON_VIEW, _at(day))
+    await db_session.commit()
+
+    assert await db_session.scalar(select(func.count()).select_from(ActivityEvent)) == 5
+    result = await db_session.execute(
+        select(UserActivityMonth.month, UserActivityMonth.active_days).order_by(UserActivityMonth.month)
+    )
+    months = result.all()
+    assert months == [(date(2026, 2, 1), 0b11 << 26), (date(2026, 3, 1), 0b11)]
+
+    # The streak runs across the month boundary, and survives a day without activity yet
+    assert await current_streak_days(db_session, test_user.id, today=date(2026, 3, 2)) == 4
+    assert await current_streak_days(db_session, test_user.id, today=date(2026, 3, 3)) == 4
+    assert await current_streak_days(db_session, test_user.id, today=date(2026, 3, 4)) == 0
+
+    # Rebuilding from the event stream gives the same bitmaps
+    assert await rebuild_activity_months(db_session) == 2
+    result = await db_session.execute(
+        select(UserActivityMonth.month, UserActivityMonth.active_days).order_by(UserActivityMonth.month)
+    )
+    assert result.all() == months
+
+
+@pytest.mark.asyncio
+async def test_learner_actions_are_recorded(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_module: Module,
+    test_assessment: Assessment,
+    fake_provider,
+):
+    """Submissions, lesson views, forum posts and chat turns each append an event"""
+    lesson = Lesson(module_id=test_module.id, title="Ledgers", content="...", order_index=1)
+    db_session.add(lesson)
+    await db_session.commit()
+    headers = {"Authorization": f"Bearer {test_token}"}
+
+    response = await async_client.post(
+        f"/api/v1/assessments/{test_assessment.id}/submit", headers=headers, json={"user_answer": "B"}
+    )
+    assert response.status_code == 200
+    assert (await async_client.get(f"/api/v1/lessons/{lesson.id}", headers=headers)).status_code == 200
+    response = await async_client.post(
+        "/api/v1/forums/posts", headers=headers, json={"module_id": test_module.id, "title": "Hi", "content": "Hello"}
+    )
+    assert response.status_code == 201
+    assert (await async_client.post("/api/v1/chat", headers=headers, json={"message": "Hi"})).status_code == 201
+
+    result = await db_session.execute(select(ActivityEvent.kind).where(ActivityEvent.user_id == test_user.id))
+    assert sorted(result.scalars().all()) == sorted(kind.value for kind in ActivityKind)
+    today = utc_day()
+    month = await db_session.get(UserActivityMonth, (test_user.id, today.replace(day=1)))
+    assert month.active_days == 1 << (today.day - 1)
+
+
+@pytest.mark.asyncio
+async def test_activity_endpoint_counts_and_retention(
+    async_client: AsyncClient, db_session: AsyncSession, test_admin_token: str
+):
+    """DAU/WAU/MAU, the daily series and signup retention come from the bitmaps"""
+    base = utc_day() - timedelta(days=40)
+    users = {}
+    for name, signup in (("first", base), ("second", base + timedelta(days=1)), ("earlier", base - timedelta(days=10))):
+        users[name] = User(
+            email=f"{name}@example.com", username=name, hashed_password="x",
+            role=UserRole.STUDENT, created_at=_at(signup),
+        )
+    db_session.add_all(users.values())
+    await db_session.flush()
+    for name, offset in (("first", 0), ("first", 8), ("second", 1), ("earlier", 3)):
+        await record_activity(db_session, users[name].id, ActivityKind.CHAT_TURN, _at(base + timedelta(days=offset)))
+    await db_session.commit()
+
+    headers = {"Authorization": f"Bearer {test_admin_token}"}
+    end = base + timedelta(days=6)
+    response = await async_client.get(
+        "/api/v1/analytics/activity",
+        headers=headers,
+        params={"start": base.isoformat(), "end": end.isoformat(), "retention_weeks": 3},
+    )
+    assert response.status_code == 200
+    body = response.json()
+
+    assert (body["dau"], body["wau"], body["mau"]) == (0, 3, 3)
+    assert [d["active_users"] for d in body["daily_active_users"]] == [1, 1, 0, 1, 0, 0, 0]
+    # Week 1 after signup: "first" came back on day 8, "second" did not
+    assert body["retention"] == [
+        {"week": 0, "users": 2, "retained": 2, "rate": 100.0},
+        {"week": 1, "users": 2, "retained": 1, "rate": 50.0},
+        {"week": 2, "users": 2, "retained": 0, "rate": 0.0},
+    ]
+
+    for params in ({"start": end.isoformat(), "end": base.isoformat()}, {"start": "2020-01-01"}):
+        response = await async_client.get("/api/v1/analytics/activity", headers=headers, params=params)
+        assert response.status_code == 400
@@ -0,0 +1,87 @@
+"""Tests for AI chat admission control"""
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.backend.api.v1.endpoints import ai_assistant as ai_assistant_endpoints
+from app.backend.services.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.mark.asyncio
+async def test_user_bucket_allows_burst_then_rejects():
+    """A user gets `burst` turns at once; the next is refused with a Retry-After from the refill rate"""
+    controller = AdmissionController(rate_per_minute=6, burst=2, max_concurrent=10)
+
+    for _ in range(2):
+        (await controller.acquire(1)).release()
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire(1)
+    assert rejected.value.reason == "rate_limited"
+    assert 1 <= rejected.value.retry_after <= 10
+
+    # Other users have their own bucket
+    (await controller.acquire(2)).release()
+    assert controller.metrics()["rejected"]["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_global_slots_queue_then_fail_fast():
+    """Turns past max_concurrent wait in a bounded queue; a full queue is refused immediately"""
+    controller = AdmissionController(rate_per_minute=600, burst=10, max_concurrent=1, max_queued=1)
+
+    first = await controller.acquire(1)
+    queued = asyncio.create_task(controller.acquire(2))
+    await asyncio.sleep(0.01)
+    assert controller.metrics()["queue_depth"] == 1
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire(3)
+    assert rejected.value.reason == "queue_full"
+
+    first.release()
+    second = await asyncio.wait_for(queued, 1)
+    metrics = controller.metrics()
+    assert metrics["active"] == 1
+    assert metrics["queue_depth"] == 0
+    assert metrics["wait_seconds_max"] > 0
+
+    second.release()
+    second.release()
+    assert controller.metrics()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_refunds_the_token():
+    """A turn that never got a slot is refused and does not count against the user's rate"""
+    controller = AdmissionController(rate_per_minute=0.001, burst=1, max_concurrent=1, queue_timeout=0.05)
+    held = await controller.acquire(1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire(2)
+    assert rejected.value.reason == "queue_timeout"
+
+    held.release()
+    (await controller.acquire(2)).release()
+    assert controller.metrics()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_returns_429_with_retry_after(
+    async_client: AsyncClient, test_token: str, fake_provider, monkeypatch
+):
+    """Over-limit chats fail fast with 429 and Retry-After instead of a 500"""
+    monkeypatch.setattr(
+        ai_assistant_endpoints, "chat_admission", AdmissionController(rate_per_minute=1, burst=1)
+    )
+    headers = {"Authorization": f"Bearer {test_token}"}
+
+    response = await async_client.post("/api/v1/chat", headers=headers, json={"message": "Hi"})
+    assert response.status_code == 201
+
+    for path in ("/api/v1/chat", "/api/v1/chat/stream"):
+        response = await async_client.post(path, headers=headers, json={"message": "Hi again"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    assert ai_assistant_endpoints.chat_admission.metrics()["active"] == 0
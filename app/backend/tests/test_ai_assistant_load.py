@@ -0,0 +1,197 @@
+"""Load test: chat requests must not hold pooled DB connections while waiting on OpenAI"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.backend.main import app
+from app.backend.core import openai_utils
+from app.backend.core.database import Base, get_db, get_session_factory
+from app.backend.core.security import create_access_token
+from app.backend.models.user import User, UserRole
+from app.backend.models.notification import ChatMessage
+from app.backend.services import llm_service
+from app.backend.services import run_tracker as run_tracker_module
+from app.backend.services.run_registry import run_registry
+
+CONCURRENT_CHATS = 50
+
+
+class FakeRunStream:
+    """Async iterator mimicking an Assistants run event stream"""
+
+    def __init__(self, fake: "FakeOpenAI", run_id: str):
+        self.fake = fake
+        self.run_id = run_id
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        yield SimpleNamespace(event="thread.run.created", data=SimpleNamespace(id=self.run_id))
+        await self.fake.gate.wait()
+        delta = SimpleNamespace(content=[SimpleNamespace(type="text", text=SimpleNamespace(value="A ledger."))])
+        yield SimpleNamespace(event="thread.message.delta", data=SimpleNamespace(delta=delta))
+        yield SimpleNamespace(event="thread.run.completed", data=SimpleNamespace(id=self.run_id))
+
+    async def close(self):
+        pass
+
+
+class FakeOpenAI:
+    """Just enough of AsyncOpenAI for the chat pipeline; runs finish when the gate opens"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.runs_started = 0
+        self.runs_listed = 0
+        self._ids = itertools.count(1)
+        self.beta = SimpleNamespace(threads=SimpleNamespace(
+            create=self._create_thread,
+            messages=SimpleNamespace(create=self._create_message, list=self._list_messages),
+            runs=SimpleNamespace(
+                create=self._create_run,
+                retrieve=self._retrieve_run,
+                list=self._list_runs,
+                cancel=self._cancel_run,
+            ),
+        ))
+
+    async def _create_thread(self):
+        return SimpleNamespace(id=f"thread_{next(self._ids)}")
+
+    async def _create_message(self, **kwargs):
+        return SimpleNamespace(id=f"msg_{next(self._ids)}")
+
+    async def _list_messages(self, thread_id, limit=1):
+        content = SimpleNamespace(type="text", text=SimpleNamespace(value="A ledger."))
+        return SimpleNamespace(data=[SimpleNamespace(content=[content])])
+
+    async def _create_run(self, thread_id, assistant_id, additional_instructions=None, stream=False):
+        self.runs_started += 1
+        run_id = f"run_{next(self._ids)}"
+        if stream:
+            return FakeRunStream(self, run_id)
+        return SimpleNamespace(id=run_id, status="queued")
+
+    async def _retrieve_run(self, thread_id, run_id):
+        status = "completed" if self.gate.is_set() else "in_progress"
+        return SimpleNamespace(id=run_id, status=status, last_error=None)
+
+    async def _list_runs(self, thread_id, limit=10):
+        self.runs_listed += 1
+        return SimpleNamespace(data=[])
+
+    async def _cancel_run(self, thread_id, run_id):
+        return None
+
+
+@pytest.fixture
+async def pooled_engine(tmp_path):
+    """File-backed database behind a production-sized connection pool"""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'load.db'}",
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=2,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    fake = FakeOpenAI()
+
+    async def _no_vector_store(db, user):
+        return None
+
+    async def _assistant(user, db=None, vector_store_id=None):
+        return "asst_test"
+
+    monkeypatch.setattr(llm_service, "get_openai_client", lambda: fake)
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: fake)
+    monkeypatch.setattr(run_tracker_module, "get_openai_client", lambda: fake)
+    monkeypatch.setattr(llm_service, "sync_vector_store", _no_vector_store)
+    monkeypatch.setattr(llm_service, "get_assistant_for_user", _assistant)
+    monkeypatch.setattr(run_tracker_module.run_tracker, "initial_interval", 0.01)
+    monkeypatch.setattr(run_tracker_module.run_tracker, "max_interval", 0.05)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_non_chat_endpoints_stay_responsive_during_chat_load(
+    async_client: AsyncClient,
+    pooled_engine,
+    fake_openai,
+):
+    """50 in-flight chats must leave the 15-connection pool free for other endpoints"""
+    session_factory = async_sessionmaker(pooled_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as db:
+        user = User(
+            email="load@example.com",
+            hashed_password="hashed_password",
+            username="loaduser",
+            role=UserRole.STUDENT,
+            is_active=True,
+            is_verified=True,
+        )
+        db.add(user)
+        await db.commit()
+        token = create_access_token(data={"sub": str(user.id)})
+
+    async def _get_db():
+        async with session_factory() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def chat(conversation_id: int):
+        path = "/api/v1/chat/stream" if conversation_id % 2 else "/api/v1/chat"
+        return await async_client.post(
+            path,
+            headers=headers,
+            json={"message": "What is a distributed ledger?", "conversation_id": conversation_id},
+        )
+
+    recorded_before = run_registry.metrics()["recorded_runs"]
+    chats = [asyncio.create_task(chat(i)) for i in range(1, CONCURRENT_CHATS + 1)]
+    try:
+        # Wait until every chat has registered its run and is blocked inside it
+        async with asyncio.timeout(10):
+            while run_registry.metrics()["recorded_runs"] - recorded_before < CONCURRENT_CHATS:
+                await asyncio.sleep(0.01)
+
+        assert fake_openai.runs_started == CONCURRENT_CHATS
+
+        assert pooled_engine.sync_engine.pool.checkedout() == 0
+
+        async with asyncio.timeout(5):
+            response = await async_client.get("/api/v1/documents/list", headers=headers)
+        assert response.status_code == 200
+    finally:
+        fake_openai.gate.set()
+        responses = await asyncio.gather(*chats)
+
+    assert all(r.status_code in (200, 201) for r in responses)
+    assert all('"type": "done"' in r.text for r in responses if r.status_code == 200)
+
+    async with session_factory() as db:
+        stored = await db.scalar(select(func.count()).select_from(ChatMessage))
+    assert stored == CONCURRENT_CHATS
+    # Active runs come from the local registry, not a runs.list per message
+    assert fake_openai.runs_listed == 0
@@ -0,0 +1,215 @@
+"""Tests for cohort performance exports (streamed downloads and queued report files)"""
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core.config import settings
+from app.backend.models.analytics_export import AnalyticsExport
+from app.backend.models.assessment import Assessment
+from app.backend.models.cohort import Cohort, CohortMember, CohortRole
+from app.backend.models.user import User, UserRole
+from app.backend.services import analytics_export
+from app.backend.services.analytics_export import ExportFormatUnavailable, ExportWorker
+
+
+@pytest.fixture
+async def cohort_with_students(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_cohort: Cohort,
+    test_assessment: Assessment,
+):
+    """Three student members; test_user has two graded attempts"""
+    for name in ("ada", "grace"):
+        student = User(
+            email=f"{name}@example.com", username=name, hashed_password="x",
+            role=UserRole.STUDENT, is_active=True, is_verified=True,
+        )
+        db_session.add(student)
+        await db_session.flush()
+        db_session.add(CohortMember(cohort_id=test_cohort.id, user_id=student.id, role=CohortRole.STUDENT.value))
+    await db_session.commit()
+
+    headers = {"Authorization": f"Bearer {test_token}"}
+    assert (await async_client.post(f"/api/v1/cohorts/{test_cohort.id}/join", headers=headers)).status_code == 201
+    for answer in ("A", "B"):
+        response = await async_client.post(
+            f"/api/v1/assessments/{test_assessment.id}/submit", headers=headers, json={"user_answer": answer}
+        )
+        assert response.status_code == 200
+    return test_cohort
+
+
+@pytest.mark.asyncio
+async def test_csv_export_streams_in_pages(
+    async_client: AsyncClient,
+    monkeypatch,
+    test_user: User,
+    test_instructor_token: str,
+    cohort_with_students: Cohort,
+):
+    """Pages of one row still produce every student and attempt exactly once"""
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_ROWS", 1)
+    headers = {"Authorization": f"Bearer {test_instructor_token}"}
+    url = f"/api/v1/analytics/cohort/{cohort_with_students.id}/export"
+
+    response = await async_client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert f'filename="cohort-{cohort_with_students.id}-students.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    # Instructors are members but not exported
+    assert sorted(row["username"] for row in rows) == ["ada", "grace", "testuser"]
+    mine = next(row for row in rows if row["user_id"] == str(test_user.id))
+    assert (mine["attempts"], mine["graded_attempts"], float(mine["average_score"])) == ("2", "2", 50.0)
+    idle = next(row for row in rows if row["username"] == "ada")
+    assert (idle["attempts"], idle["average_score"], idle["last_activity_at"]) == ("0", "", "")
+
+    response = await async_client.get(url, headers=headers, params={"dataset": "attempts"})
+    assert response.status_code == 200
+    attempts = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["points_earned"] for row in attempts] == ["0", "10"]
+    assert [float(row["score"]) for row in attempts] == [0.0, 100.0]
+
+    for params in ({"format": "xlsx"}, {"dataset": "grades"}):
+        assert (await async_client.get(url, headers=headers, params=params)).status_code == 422
+    assert (await async_client.get("/api/v1/analytics/cohort/999/export", headers=headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_parquet_export(async_client: AsyncClient, test_instructor_token: str, cohort_with_students: Cohort):
+    """Parquet downloads are typed columns, readable by any Parquet reader"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    response = await async_client.get(
+        f"/api/v1/analytics/cohort/{cohort_with_students.id}/export",
+        headers={"Authorization": f"Bearer {test_instructor_token}"},
+        params={"format": "parquet", "dataset": "attempts"},
+    )
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 2
+    assert str(table.schema.field("attempted_at").type) == "timestamp[us, tz=UTC]"
+    assert table.column("score").to_pylist() == [0.0, 100.0]
+
+
+@pytest.mark.asyncio
+async def test_parquet_unavailable_without_pyarrow(
+    async_client: AsyncClient, monkeypatch, test_instructor_token: str, test_cohort: Cohort
+):
+    """Without the optional dependency Parquet is refused up front; CSV still works"""
+    def _missing():
+        raise ExportFormatUnavailable("Parquet exports need the pyarrow package")
+
+    monkeypatch.setattr(analytics_export, "_load_pyarrow", _missing)
+    headers = {"Authorization": f"Bearer {test_instructor_token}"}
+    url = f"/api/v1/analytics/cohort/{test_cohort.id}/export"
+    assert (await async_client.get(url, headers=headers, params={"format": "parquet"})).status_code == 501
+    assert (await async_client.get(url, headers=headers)).status_code == 200
+    response = await async_client.post(
+        f"/api/v1/analytics/cohort/{test_cohort.id}/exports", headers=headers, json={"format": "parquet"}
+    )
+    assert response.status_code == 501
+
+
+@pytest.mark.asyncio
+async def test_queued_report_pipeline(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    monkeypatch,
+    tmp_path,
+    test_token: str,
+    test_instructor_token: str,
+    cohort_with_students: Cohort,
+):
+    """A queued report is written by the worker with progress recorded, then downloaded"""
+    monkeypatch.setattr(settings, "DOCUMENT_STORAGE_PATH", str(tmp_path))
+    headers = {"Authorization": f"Bearer {test_instructor_token}"}
+    response = await async_client.post(
+        f"/api/v1/analytics/cohort/{cohort_with_students.id}/exports", headers=headers, json={"dataset": "students"}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert (job["status"], job["progress"], job["download_url"]) == ("pending", None, None)
+    status_url = f"/api/v1/analytics/exports/{job['id']}"
+    assert (await async_client.get(f"{status_url}/download", headers=headers)).status_code == 409
+
+    progress = []
+    worker = ExportWorker(
+        session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False), chunk_rows=1
+    )
+    report_progress = worker._report_progress
+
+    async def _record_progress(export_id, token, rows_written):
+        progress.append(rows_written)
+        await report_progress(export_id, token, rows_written)
+
+    monkeypatch.setattr(worker, "_report_progress", _record_progress)
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 0
+    assert progress == [1, 2, 3]
+
+    job = (await async_client.get(status_url, headers=headers)).json()
+    assert job["status"] == "completed"
+    assert (job["rows_total"], job["rows_written"], job["progress"]) == (3, 3, 100.0)
+    assert job["download_url"] == f"{status_url}/download"
+    assert not list(tmp_path.rglob("*.part"))
+
+    response = await async_client.get(f"{status_url}/download", headers=headers)
+    assert response.status_code == 200
+    assert len(list(csv.DictReader(io.StringIO(response.text)))) == 3
+    assert int(response.headers["content-length"]) == job["size_bytes"]
+
+    # Students cannot queue reports or see other people's
+    student = {"Authorization": f"Bearer {test_token}"}
+    assert (await async_client.get(status_url, headers=student)).status_code == 403
+    assert (await async_client.get("/api/v1/analytics/exports/999", headers=headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_worker_that_lost_its_lease_stops_writing(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    monkeypatch,
+    tmp_path,
+    test_instructor_token: str,
+    cohort_with_students: Cohort,
+):
+    """A stalled worker whose report was re-claimed stops and never overwrites the new holder's state"""
+    monkeypatch.setattr(settings, "DOCUMENT_STORAGE_PATH", str(tmp_path))
+    headers = {"Authorization": f"Bearer {test_instructor_token}"}
+    response = await async_client.post(
+        f"/api/v1/analytics/cohort/{cohort_with_students.id}/exports", headers=headers, json={"dataset": "students"}
+    )
+    export_id = response.json()["id"]
+    session_factory = async_sessionmaker(db_session.bind, expire_on_commit=False)
+    stale = ExportWorker(session_factory=session_factory, chunk_rows=1)
+    fresh = ExportWorker(session_factory=session_factory, chunk_rows=1)
+    report_progress = stale._report_progress
+
+    async def _stall_then_report(export_id, token, rows_written):
+        if rows_written == 1:
+            # The lease expires while this worker stalls, and another worker takes the report
+            async with session_factory() as db:
+                await db.execute(
+                    update(AnalyticsExport)
+                    .where(AnalyticsExport.id == export_id)
+                    .values(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+                )
+                await db.commit()
+                assert await fresh._claim(db, export_id) is not None
+        await report_progress(export_id, token, rows_written)
+
+    monkeypatch.setattr(stale, "_report_progress", _stall_then_report)
+    assert await stale.run_once() == 1
+    assert stale.metrics()["completed"] == 0 and stale.metrics()["failed"] == 0
+    assert not list(tmp_path.rglob("*.part"))
+
+    job = (await async_client.get(f"/api/v1/analytics/exports/{export_id}", headers=headers)).json()
+    assert (job["status"], job["rows_written"]) == ("running", 0)
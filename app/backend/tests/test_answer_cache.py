@@ -0,0 +1,124 @@
+"""Tests for the opt-in answer cache"""
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core.config import settings
+from app.backend.core.security import create_access_token
+from app.backend.models.module import Lesson
+from app.backend.models.query_log import QueryLog
+from app.backend.models.user import User, UserRole
+from app.backend.services import context_service, llm_service
+from app.backend.services.answer_cache import answer_cache, normalize_prompt
+
+
+@pytest.fixture(autouse=True)
+def _enable_cache(monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    answer_cache.clear()
+    context_service.module_catalog_cache.clear()
+    yield
+    answer_cache.clear()
+    context_service.module_catalog_cache.clear()
+
+
+def _stream_text(body: str) -> str:
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert events[-1] == {"type": "done"}
+    return "".join(e["content"] for e in events if e["type"] == "chunk")
+
+
+async def _ask(client: AsyncClient, headers, message: str, module_id=None, conversation_id=None, stream=False):
+    body = {"message": message, "context": {"current_module_id": module_id}}
+    if conversation_id:
+        body["conversation_id"] = conversation_id
+    path = "/api/v1/ai-assistant/chat/stream" if stream else "/api/v1/ai-assistant/chat"
+    response = await client.post(path, headers=headers, json=body)
+    assert response.status_code in (200, 201)
+    return _stream_text(response.text) if stream else response.json()["response"]
+
+
+async def _cache_statuses(db: AsyncSession) -> list:
+    return (await db.execute(select(QueryLog.cache_status).order_by(QueryLog.id))).scalars().all()
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  What is a   Distributed Ledger?? ") == "what is a distributed ledger"
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_is_served_from_cache(
+    async_client: AsyncClient, db_session: AsyncSession, test_token: str, test_module, fake_provider
+):
+    """Same normalized question and module: one model call, replayed over JSON and SSE"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+
+    first = await _ask(async_client, headers, "What is a distributed ledger?", test_module.id)
+    again = await _ask(async_client, headers, "what is a  distributed ledger", test_module.id)
+    streamed = await _ask(async_client, headers, "What is a distributed ledger?", test_module.id, stream=True)
+    await _ask(async_client, headers, "What is a distributed ledger?", None)
+
+    assert again == streamed == first
+    assert len(fake_provider.state.requests) == 2
+    assert await _cache_statuses(db_session) == ["miss", "hit", "hit", "miss"]
+
+    # Editing lesson content changes the curriculum version and the key
+    db_session.add(Lesson(module_id=test_module.id, title="Ledgers", content="Updated", order_index=1))
+    await db_session.commit()
+    context_service.module_catalog_cache.clear()
+    await _ask(async_client, headers, "What is a distributed ledger?", test_module.id)
+    assert len(fake_provider.state.requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_personal_and_follow_up_messages_bypass_cache(
+    async_client: AsyncClient, db_session: AsyncSession, test_token: str, test_module, fake_provider
+):
+    """Questions about the student and follow-ups always reach the model"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+
+    await _ask(async_client, headers, "Why did I fail the quiz?", test_module.id)
+    await _ask(async_client, headers, "Why did I fail the quiz?", test_module.id)
+    await _ask(async_client, headers, "What is gas?", test_module.id, conversation_id=4242)
+    await _ask(async_client, headers, "What is gas?", test_module.id, conversation_id=4242)
+
+    assert len(fake_provider.state.requests) == 4
+    assert await _cache_statuses(db_session) == ["bypass", "bypass", "miss", "bypass"]
+
+
+@pytest.mark.asyncio
+async def test_cached_answers_carry_no_student_context(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_module,
+    fake_provider,
+    monkeypatch,
+):
+    """A model that repeats its whole prompt still cannot leak one student's details to another"""
+    backend = llm_service._backend_instances["chat_completions"]
+
+    async def _repeat_prompt(turn, session_factory):
+        return f"Prompt was: {turn.system_instructions}"
+
+    monkeypatch.setattr(backend, "complete", _repeat_prompt)
+    other = User(
+        email="other@example.com", username="otherstudent", hashed_password="x",
+        role=UserRole.STUDENT, is_active=True, is_verified=True,
+    )
+    db_session.add(other)
+    await db_session.commit()
+
+    first = await _ask(async_client, {"Authorization": f"Bearer {test_token}"}, "What is a block?", test_module.id)
+    other_headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(other.id)})}"}
+    served = await _ask(async_client, other_headers, "What is a block?", test_module.id)
+
+    assert served == first
+    assert "Currently viewing: Module" in first
+    assert test_user.username not in served
+    assert f"ID: {test_user.id}" not in served
+    assert await _cache_statuses(db_session) == ["miss", "hit"]
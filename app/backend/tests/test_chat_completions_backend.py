@@ -0,0 +1,62 @@
+"""Chat completions backend against the local fake provider"""
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.notification import ChatMessage
+from app.backend.models.thread_map import ThreadMap
+
+
+def _stream_text(body: str) -> str:
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert events[-1] == {"type": "done"}
+    return "".join(e["content"] for e in events if e["type"] == "chunk")
+
+
+@pytest.mark.asyncio
+async def test_chat_replays_history_from_stored_messages(
+    async_client: AsyncClient, db_session: AsyncSession, test_user, test_token: str, fake_provider
+):
+    """Each message is one completion call carrying the system prompt and earlier turns"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+
+    response = await async_client.post(
+        "/api/v1/ai-assistant/chat", headers=headers, json={"message": "What is a hash?"}
+    )
+    assert response.status_code == 201
+    first = response.json()
+    assert first["response"] == "Echo: What is a hash? (history: 0 messages)"
+    conversation_id = first["conversation_id"]
+
+    response = await async_client.post(
+        "/api/v1/ai-assistant/chat/stream",
+        headers=headers,
+        json={"message": "And a Merkle tree?", "conversation_id": conversation_id},
+    )
+    assert response.status_code == 200
+    assert _stream_text(response.text) == "Echo: And a Merkle tree? (history: 2 messages)"
+
+    requests = fake_provider.state.requests
+    assert [r.get("stream", False) for r in requests] == [False, True]
+    messages = requests[1]["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1:] == [
+        {"role": "user", "content": "What is a hash?"},
+        {"role": "assistant", "content": first["response"]},
+        {"role": "user", "content": "And a Merkle tree?"},
+    ]
+
+    stored = (await db_session.execute(
+        select(ChatMessage.response).where(ChatMessage.conversation_id == conversation_id).order_by(ChatMessage.id)
+    )).scalars().all()
+    assert stored == [first["response"], "Echo: And a Merkle tree? (history: 2 messages)"]
+
+    thread_map = (await db_session.execute(select(ThreadMap))).scalar_one()
+    assert thread_map.thread_id is None
+
+    response = await async_client.get("/api/v1/ai-assistant/conversations", headers=headers)
+    assert response.status_code == 200
+    assert [c["conversation_id"] for c in response.json()["conversations"]] == [conversation_id]
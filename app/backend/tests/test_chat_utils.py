@@ -0,0 +1,162 @@
+"""Tests for chat utilities"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.document import Document
+from app.backend.core.chat_utils import (
+    StreamingCitationFormatter,
+    citation_title_cache,
+    format_citations_in_response,
+    invalidate_citation_titles,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clear_citation_titles():
+    citation_title_cache.clear()
+    yield
+    citation_title_cache.clear()
+
+
+@contextmanager
+def count_statements(db: AsyncSession):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture
+async def test_document(db_session: AsyncSession, test_user):
+    """Create a document that citations can resolve to"""
+    document = Document(
+        title="Course Syllabus",
+        filename="syllabus.pdf",
+        storage_path="/tmp/storage/documents/abc123.pdf",
+        file_size=1024,
+        category="user-upload",
+        uploader_id=test_user.id,
+    )
+    db_session.add(document)
+    await db_session.commit()
+    await db_session.refresh(document)
+    return document
+
+
+@pytest.mark.asyncio
+async def test_streaming_formatter_holds_back_split_citation(
+    db_session: AsyncSession,
+    test_user,
+    test_document,
+):
+    """A citation split across deltas is only emitted once it is complete"""
+    formatter = StreamingCitationFormatter(db_session, user_id=test_user.id)
+
+    first = await formatter.feed("See the outline 【4:0+sylla")
+    second = await formatter.feed("bus.pdf】 for dates.")
+    rest = await formatter.flush()
+
+    assert first == "See the outline "
+    assert second == '[Document: "Course Syllabus"] for dates.'
+    assert rest == ""
+
+
+@pytest.mark.asyncio
+async def test_streaming_formatter_passes_plain_text_through(db_session: AsyncSession):
+    """Text without citations is released immediately and unchanged"""
+    formatter = StreamingCitationFormatter(db_session)
+
+    assert await formatter.feed("A blockchain is ") == "A blockchain is "
+    assert await formatter.feed("a distributed ledger.") == "a distributed ledger."
+    assert await formatter.flush() == ""
+
+
+@pytest.mark.asyncio
+async def test_streaming_formatter_flushes_unterminated_bracket(db_session: AsyncSession):
+    """An opening bracket that never closes is released at the end of the stream"""
+    formatter = StreamingCitationFormatter(db_session)
+
+    assert await formatter.feed("Odd text 【 with no close") == "Odd text "
+    assert await formatter.flush() == "【 with no close"
+
+
+@pytest.mark.asyncio
+async def test_citations_resolve_in_one_query_and_are_cached(
+    db_session: AsyncSession,
+    test_user,
+    test_document,
+):
+    """All cited names are looked up together; repeats come from the title cache"""
+    db_session.add(Document(
+        title="Whitepaper", filename="bitcoin.pdf", storage_path="/tmp/storage/blobs/ff/ff00.pdf",
+        file_size=10, category="standard",
+    ))
+    await db_session.commit()
+    text = "See 【1:0+syllabus.pdf】, 【1:1+ff00.pdf】, 【1:2+storage/documents/abc123.pdf】 and 【1:3+notes.txt】."
+
+    with count_statements(db_session) as statements:
+        first = await format_citations_in_response(text, db_session, user_id=test_user.id)
+    assert len(statements) == 1
+    assert first == (
+        'See [Document: "Course Syllabus"], [Document: "Whitepaper"], '
+        '[Document: "Course Syllabus"] and [Document: "notes"].'
+    )
+
+    with count_statements(db_session) as statements:
+        assert await format_citations_in_response(text, db_session, user_id=test_user.id) == first
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_new_document_invalidates_cached_miss(db_session: AsyncSession, test_user):
+    """A citation that missed resolves once the document exists and the name is invalidated"""
+    assert await format_citations_in_response("【2:0+notes.txt】", db_session, user_id=test_user.id) == '[Document: "notes"]'
+
+    document = Document(
+        title="Lecture Notes", filename="notes.txt", storage_path="/tmp/storage/blobs/aa/aa11.txt",
+        file_size=10, category="user-upload", uploader_id=test_user.id,
+    )
+    db_session.add(document)
+    await db_session.commit()
+    assert document.storage_name == "aa11.txt"
+    await invalidate_citation_titles(document.uploader_id, document.filename, document.storage_name)
+
+    assert (
+        await format_citations_in_response("【2:0+notes.txt】", db_session, user_id=test_user.id)
+        == '[Document: "Lecture Notes"]'
+    )
+
+
+@pytest.mark.asyncio
+async def test_citations_never_resolve_to_another_users_document(
+    db_session: AsyncSession, test_user, test_admin
+):
+    """Shared blob names only resolve to documents the citing user can see"""
+    db_session.add(Document(
+        title="Admin Salary Review", filename="review.txt", storage_path="/tmp/storage/blobs/cc/cc33.txt",
+        file_size=10, category="user-upload", uploader_id=test_admin.id,
+    ))
+    await db_session.commit()
+    text = "【3:0+cc33.txt】"
+
+    # The admin's lookup is cached first; the student's must not reuse it
+    assert await format_citations_in_response(text, db_session, user_id=test_admin.id) == '[Document: "Admin Salary Review"]'
+    assert await format_citations_in_response(text, db_session, user_id=test_user.id) == '[Document: "cc33"]'
+
+    db_session.add(Document(
+        title="My Copy", filename="mine.txt", storage_path="/tmp/storage/blobs/cc/cc33.txt",
+        file_size=10, category="user-upload", uploader_id=test_user.id,
+    ))
+    await db_session.commit()
+    await invalidate_citation_titles(test_user.id, "mine.txt", "cc33.txt")
+    assert await format_citations_in_response(text, db_session, user_id=test_user.id) == '[Document: "My Copy"]'
+    assert await format_citations_in_response(text, db_session, user_id=test_admin.id) == '[Document: "Admin Salary Review"]'
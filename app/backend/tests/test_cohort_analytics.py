@@ -0,0 +1,120 @@
+"""Tests for cohort analytics served from the rollup tables"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.analytics_rollup import CohortStats, StudentDailyStats
+from app.backend.models.assessment import Assessment
+from app.backend.models.cohort import Cohort, CohortMember, CohortRole
+from app.backend.models.module import Module, Track
+from app.backend.models.user import User, UserRole
+from app.backend.services.analytics_rollups import rebuild_rollups
+
+
+async def _student_activity(async_client: AsyncClient, token: str, cohort: Cohort, assessment: Assessment) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await async_client.post(f"/api/v1/cohorts/{cohort.id}/join", headers=headers)
+    assert response.status_code == 201
+    response = await async_client.post(
+        f"/api/v1/assessments/{assessment.id}/submit", headers=headers, json={"user_answer": "B"}
+    )
+    assert response.status_code == 200
+    # Viewing results syncs the module's progress (all questions answered, 100% -> completed)
+    response = await async_client.get(f"/api/v1/assessments/results/{assessment.module_id}", headers=headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_cohort_analytics_from_rollups(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_instructor_token: str,
+    test_cohort: Cohort,
+    test_assessment: Assessment,
+):
+    """Submissions and progress updates keep the rollups current; the endpoint reads only them"""
+    idle = User(
+        email="idle@example.com", username="idle", hashed_password="x",
+        role=UserRole.STUDENT, is_active=True, is_verified=True,
+    )
+    db_session.add(idle)
+    # A second published module: the denominator comes from the catalog, not a constant
+    db_session.add(Module(id=2, title="Hashing", track=Track.USER, order_index=2, duration_hours=1.0, is_published=True))
+    await db_session.flush()
+    db_session.add(CohortMember(cohort_id=test_cohort.id, user_id=idle.id, role=CohortRole.STUDENT.value))
+    await db_session.commit()
+
+    await _student_activity(async_client, test_token, test_cohort, test_assessment)
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    headers = {"Authorization": f"Bearer {test_instructor_token}"}
+    url = f"/api/v1/analytics/cohort/{test_cohort.id}"
+    assert (await async_client.get(url, headers=headers)).status_code == 200
+
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", _record)
+    try:
+        response = await async_client.get(url, headers=headers)
+    finally:
+        event.remove(db_session.bind.sync_engine, "before_cursor_execute", _record)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["total_students"] == 2
+    assert body["active_students"] == 1
+    assert body["average_score"] == 100.0
+    assert body["completion_rate"] == 25.0
+    assert body["students_by_progress"] == {"completed": 1, "in_progress": 0, "not_started": 1}
+    assert body["top_performers"] == [{"user_id": test_user.id, "modules_completed": 1}]
+    assert body["at_risk_students"] == [{"user_id": idle.id, "reason": "No activity"}]
+    # Member rows, attempts and progress are never scanned on read
+    assert not [s for s in statements if "quiz_attempts" in s or "user_progress" in s]
+
+    # A full rebuild from the base tables reproduces the incremental totals
+    counts = await rebuild_rollups(db_session)
+    assert counts == {"student_daily_stats": 1, "cohort_stats": 1}
+    assert (await async_client.get(url, headers=headers)).json() == body
+
+
+@pytest.mark.asyncio
+async def test_membership_change_rebuilds_cohort_totals(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_instructor_token: str,
+    test_cohort: Cohort,
+    test_assessment: Assessment,
+):
+    """Activity from before joining counts once the student joins, and stops when they leave"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    response = await async_client.post(
+        f"/api/v1/assessments/{test_assessment.id}/submit", headers=headers, json={"user_answer": "B"}
+    )
+    assert response.status_code == 200
+    url = f"/api/v1/analytics/cohort/{test_cohort.id}"
+    instructor = {"Authorization": f"Bearer {test_instructor_token}"}
+    assert (await async_client.get(url, headers=instructor)).json()["total_students"] == 0
+
+    await async_client.post(f"/api/v1/cohorts/{test_cohort.id}/join", headers=headers)
+    body = (await async_client.get(url, headers=instructor)).json()
+    assert (body["total_students"], body["average_score"]) == (1, 100.0)
+
+    # New activity updates the stored totals in place
+    await async_client.post(
+        f"/api/v1/assessments/{test_assessment.id}/submit", headers=headers, json={"user_answer": "C"}
+    )
+    stats = await db_session.get(CohortStats, test_cohort.id, populate_existing=True)
+    assert (stats.attempts, stats.graded_attempts, stats.score_sum) == (2, 2, 100.0)
+
+    response = await async_client.delete(f"/api/v1/cohorts/{test_cohort.id}/leave", headers=headers)
+    assert response.status_code == 204
+    body = (await async_client.get(url, headers=instructor)).json()
+    assert (body["total_students"], body["average_score"]) == (0, 0.0)
+    assert await db_session.scalar(select(func.count()).select_from(StudentDailyStats)) == 1
@@ -0,0 +1,54 @@
+"""Tests for the token-budgeted context encoder"""
+from app.backend.services import context_encoder
+from app.backend.services.context_encoder import count_tokens, encode_context
+
+
+def _context(version: str = "v1") -> dict:
+    modules = [{"id": i, "title": f"Module title {i}", "track": "user" if i < 10 else "developer", "order_index": i} for i in range(1, 20)]
+    return {
+        "user": {"id": 7, "username": "satoshi", "role": "student"},
+        "current_context": {"module_id": 3},
+        "catalog_version": version,
+        "available_modules": modules,
+        "progress": [{"module_id": i, "status": "in_progress", "completion_percentage": 10.0 * i} for i in range(1, 8)],
+        "recent_assessments": [{"module_id": i % 4 + 1, "is_correct": i % 3 == 0, "review_status": "graded"} for i in range(20)],
+        "achievements": [{"name": f"Badge {i}", "description": "Earned for consistency " * 3} for i in range(8)],
+        "recent_forum_activity": [{"title": f"Question about gas {i}", "is_solved": i % 2 == 0} for i in range(10)],
+        "notes": [{"summary": "Merkle trees let light clients verify inclusion. " * 8} for _ in range(4)],
+        "assignments": [{"title": f"Problem set {i}", "due": "2026-11-01"} for i in range(6)],
+        "calendar_events": [],
+    }
+
+
+def test_budget_drops_lowest_priority_sections_first():
+    """The student header and high-priority sections survive; the tail is cut deterministically"""
+    full = encode_context(_context(), budget=10_000)
+    assert full.dropped == {}
+
+    tight = encode_context(_context(), budget=200)
+    assert tight.tokens <= 200
+    assert tight.text.startswith("Student: satoshi (ID: 7)")
+    assert "Currently viewing: Module 3 (Module title 3)" in tight.text
+    assert "progress" in tight.sections
+    assert "recent_forum_activity" not in tight.sections
+    assert tight.dropped["recent_forum_activity"] == 3
+    assert tight == encode_context(_context(), budget=200)
+
+
+def test_section_report_adds_up():
+    encoded = encode_context(_context(), budget=10_000)
+    assert sum(encoded.sections.values()) == encoded.tokens
+    assert abs(count_tokens(encoded.text) - encoded.tokens) <= len(encoded.text.splitlines())
+
+
+def test_curriculum_rendered_once_per_catalog_version():
+    context_encoder._curriculum_cache.clear()
+    renders = context_encoder._curriculum_renders
+
+    for _ in range(3):
+        encode_context(_context("v1"))
+    assert context_encoder._curriculum_renders == renders + 1
+
+    encoded = encode_context(_context("v2"))
+    assert context_encoder._curriculum_renders == renders + 2
+    assert "- user track (9 modules): 1 Module title 1; 2 Module title 2" in encoded.text
@@ -0,0 +1,145 @@
+"""Single-round-trip context loading: equivalence with the per-section queries and a latency benchmark"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.achievement import Achievement, UserAchievement
+from app.backend.models.assessment import Assessment, QuestionType
+from app.backend.models.forum import ForumPost
+from app.backend.models.module import Module, Track
+from app.backend.models.progress import QuizAttempt, UserProgress, ProgressStatus, ReviewStatus
+from app.backend.models.user import User
+from app.backend.services import context_service
+from app.backend.services.context_service import SNAPSHOT_SECTIONS, load_context_sections
+
+MODULES = 30
+ATTEMPTS = 5000
+POSTS = 300
+ACHIEVEMENTS = 25
+ITERATIONS = 30
+ROUND_TRIP_SECONDS = 0.002
+
+
+async def _seed_history(db: AsyncSession, user: User) -> None:
+    """A long-time student: progress everywhere, thousands of attempts, hundreds of posts"""
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1, 9, 0, 0)
+    await db.execute(insert(Module), [
+        {"id": m, "title": f"Module {m}", "description": "About blocks", "track": Track.USER, "order_index": m, "duration_hours": 2.0, "is_published": True}
+        for m in range(1, MODULES + 1)
+    ])
+    question_types = list(QuestionType)
+    await db.execute(insert(Assessment), [
+        {
+            "id": a, "module_id": (a % MODULES) + 1, "question_text": f"Question {a}",
+            "question_type": question_types[a % len(question_types)], "order_index": a, "points": 10,
+            "correct_answer": "A", "is_active": True,
+        }
+        for a in range(1, MODULES * 5 + 1)
+    ])
+    statuses = list(ProgressStatus)
+    await db.execute(insert(UserProgress), [
+        {
+            "user_id": user.id, "module_id": m, "status": statuses[m % 3], "completion_percentage": (m * 7) % 100 + 0.5,
+            "started_at": None if m % 3 == 0 else start + timedelta(days=m),
+            "completed_at": start + timedelta(days=m, hours=3) if m % 3 == 2 else None,
+            # Some modules share a last-accessed time so the id tie-break matters
+            "last_accessed_at": start + timedelta(days=m // 2),
+        }
+        for m in range(1, MODULES + 1)
+    ])
+    review_statuses = list(ReviewStatus)
+    await db.execute(insert(QuizAttempt), [
+        {
+            "user_id": user.id, "assessment_id": rng.randint(1, MODULES * 5), "user_answer": "A",
+            "is_correct": rng.choice([True, False, None]), "points_earned": rng.choice([0, 10, None]),
+            "review_status": rng.choice(review_statuses), "feedback": rng.choice([None, "Good", "Revisit hashing"]),
+            "attempted_at": start + timedelta(minutes=i // 3),
+        }
+        for i in range(ATTEMPTS)
+    ])
+    await db.execute(insert(Achievement), [
+        {"id": a, "name": f"Badge {a}", "description": None if a % 4 else "Earned", "category": "score", "points": a}
+        for a in range(1, ACHIEVEMENTS + 1)
+    ])
+    await db.execute(insert(UserAchievement), [
+        {"user_id": user.id, "achievement_id": a, "earned_at": start + timedelta(days=a // 3)}
+        for a in range(1, ACHIEVEMENTS + 1)
+    ])
+    await db.execute(insert(ForumPost), [
+        {
+            "module_id": (p % MODULES) + 1, "user_id": user.id, "title": f"Post {p}",
+            "content": "Ünïcode proof-of-stake " * (p % 20), "is_solved": p % 2 == 0, "upvotes": p % 9,
+            "created_at": start + timedelta(hours=p // 2),
+        }
+        for p in range(POSTS)
+    ])
+    await db.commit()
+
+
+async def _load_per_section(db: AsyncSession, user_id: int):
+    return {name: await context_service._SECTION_LOADERS[name](db, user_id) for name in SNAPSHOT_SECTIONS}
+
+
+@contextmanager
+def simulated_round_trip(db: AsyncSession, seconds: float):
+    """Add a fixed delay to every statement, like a database across the network"""
+    def _delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", _delay)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", _delay)
+
+
+async def _latencies(load, db: AsyncSession, user_id: int) -> list[float]:
+    samples = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await load(db, user_id)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _summary(samples: list[float]) -> str:
+    cuts = statistics.quantiles(samples, n=100)
+    return f"p50 {cuts[49] * 1000:.1f}ms p99 {cuts[98] * 1000:.1f}ms"
+
+
+@pytest.mark.asyncio
+async def test_single_query_matches_per_section_queries(db_session: AsyncSession, test_user: User):
+    """Same sections, ordering and value types as the per-section loaders"""
+    await _seed_history(db_session, test_user)
+
+    fast = await load_context_sections(db_session, test_user.id)
+    expected = await _load_per_section(db_session, test_user.id)
+
+    assert fast == expected
+    assert [len(fast[name]) for name in SNAPSHOT_SECTIONS] == [MODULES, 20, ACHIEVEMENTS, 10]
+
+
+@pytest.mark.asyncio
+async def test_context_query_benchmark(db_session: AsyncSession, test_user: User):
+    """One round trip beats four once each statement pays network latency"""
+    await _seed_history(db_session, test_user)
+
+    report = []
+    for round_trip in (0.0, ROUND_TRIP_SECONDS):
+        with simulated_round_trip(db_session, round_trip):
+            per_section = await _latencies(_load_per_section, db_session, test_user.id)
+            single = await _latencies(load_context_sections, db_session, test_user.id)
+        report.append(
+            f"{round_trip * 1000:.0f}ms RTT: per-section {_summary(per_section)}, single query {_summary(single)}"
+        )
+    summary = f"context load for {ATTEMPTS} attempts / {POSTS} posts / {MODULES} modules:\n" + "\n".join(report)
+
+    assert statistics.median(single) < statistics.median(per_section), summary
@@ -0,0 +1,107 @@
+"""Tests for the materialized per-user learning context"""
+from contextlib import contextmanager
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, async_sessionmaker
+
+from app.backend.models.forum import ForumPost
+from app.backend.models.user import User
+from app.backend.services import context_service
+from app.backend.services.context_service import check_context_snapshots, gather_user_context
+
+
+@contextmanager
+def count_statements(engine: AsyncEngine):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture(autouse=True)
+def _clear_catalog():
+    context_service.module_catalog_cache.clear()
+    yield
+    context_service.module_catalog_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_chat_context_reads_one_row_once_built(db_session: AsyncSession, test_user: User, test_module):
+    """The first call builds the snapshot; later calls read it without the per-section queries"""
+    first = await gather_user_context(test_user, db_session)
+    assert [m["id"] for m in first["available_modules"]] == [test_module.id]
+    assert set(first["available_modules"][0]) == {"id", "title", "track", "order_index"}
+
+    # Chat turns use a fresh session, so the snapshot is not in the identity map
+    async with async_sessionmaker(db_session.bind, expire_on_commit=False)() as db:
+        with count_statements(db_session.bind) as statements:
+            second = await gather_user_context(test_user, db)
+
+    assert len(statements) == 1
+    assert "user_context_snapshots" in statements[0]
+    assert second == first
+
+
+@pytest.mark.asyncio
+async def test_triggers_refresh_snapshot_sections(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    test_module,
+    test_assessment,
+):
+    """Submissions, progress syncs and forum posts update the snapshot in place"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    await gather_user_context(test_user, db_session)
+
+    response = await async_client.post(
+        f"/api/v1/assessments/{test_assessment.id}/submit",
+        headers=headers,
+        json={"user_answer": "B", "time_spent_seconds": 30},
+    )
+    assert response.status_code == 200
+    response = await async_client.get(f"/api/v1/assessments/results/{test_module.id}", headers=headers)
+    assert response.status_code == 200
+    response = await async_client.post(
+        "/api/v1/forums/posts",
+        headers=headers,
+        json={"module_id": test_module.id, "title": "Merkle roots", "content": "How are they computed?"},
+    )
+    assert response.status_code == 201
+
+    context = await gather_user_context(test_user, db_session)
+    assert [a["is_correct"] for a in context["recent_assessments"]] == [True]
+    assert [p["status"] for p in context["progress"]] == ["completed"]
+    assert [p["title"] for p in context["recent_forum_activity"]] == ["Merkle roots"]
+
+    report = await check_context_snapshots(db_session)
+    assert report == {"checked": 1, "mismatched": {}, "repaired": False}
+
+
+@pytest.mark.asyncio
+async def test_consistency_checker_reports_and_repairs_drift(db_session: AsyncSession, test_user: User, test_module):
+    """Changes made without a refresh are found by the checker and fixed with repair=True"""
+    db_session.add(ForumPost(module_id=test_module.id, user_id=test_user.id, title="Gas fees", content="Why so high?", is_solved=False))
+    await db_session.commit()
+    await gather_user_context(test_user, db_session)
+
+    await db_session.execute(update(ForumPost).values(is_solved=True))
+    await db_session.commit()
+
+    report = await check_context_snapshots(db_session)
+    assert report["mismatched"] == {test_user.id: ["recent_forum_activity"]}
+
+    report = await check_context_snapshots(db_session, repair=True)
+    assert report["repaired"] is True
+    assert (await check_context_snapshots(db_session))["mismatched"] == {}
+    context = await gather_user_context(test_user, db_session)
+    assert context["recent_forum_activity"][0]["is_solved"] is True
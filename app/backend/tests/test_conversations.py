@@ -0,0 +1,144 @@
+"""Tests for the conversation list and its denormalized summaries"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.notification import ChatMessage
+from app.backend.models.thread_map import ThreadMap
+from app.backend.models.user import User
+
+
+@contextmanager
+def count_statements(db: AsyncSession):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _record)
+
+
+@pytest.mark.asyncio
+async def test_conversation_list_is_one_query(
+    async_client: AsyncClient, db_session: AsyncSession, test_token: str, fake_provider
+):
+    """Counts and last-message times come from thread_maps, not a query per conversation"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    for conversation_id, messages in ((101, 3), (102, 1), (103, 2)):
+        for i in range(messages):
+            response = await async_client.post(
+                "/api/v1/ai-assistant/chat",
+                headers=headers,
+                json={"message": f"Question {i}", "conversation_id": conversation_id},
+            )
+            assert response.status_code == 201
+
+    with count_statements(db_session) as statements:
+        response = await async_client.get("/api/v1/ai-assistant/conversations?limit=2", headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["total"] == 3
+    assert len(body["conversations"]) == 2
+    assert [(c["conversation_id"], c["message_count"]) for c in body["conversations"]] == [(103, 2), (102, 1)]
+    assert all(c["last_message_at"] for c in body["conversations"])
+    assert [s for s in statements if "chat_messages" in s] == []
+    assert len([s for s in statements if "thread_maps" in s]) == 1
+
+    response = await async_client.get("/api/v1/ai-assistant/conversations?offset=10", headers=headers)
+    assert response.json() == {"conversations": [], "total": 3}
+
+    response = await async_client.patch(
+        "/api/v1/ai-assistant/conversations/101/title", headers=headers, json={"title": "Hashes"}
+    )
+    assert response.status_code == 200
+    assert response.json()["message_count"] == 3
+
+
+async def _seed_messages(db: AsyncSession, user: User) -> list[int]:
+    """Seven messages in conversation 7 and two elsewhere; several share a timestamp"""
+    start = datetime(2026, 10, 1, 9, 0, 0)
+    db.add(ThreadMap(conversation_id=7, thread_id=None, user_id=user.id, message_count=7))
+    for i in range(9):
+        db.add(ChatMessage(
+            user_id=user.id, message=f"Q{i}", response=f"A{i}",
+            conversation_id=7 if i < 7 else 8,
+            created_at=start + timedelta(minutes=i // 3),
+        ))
+    await db.commit()
+    return list(range(1, 10))
+
+
+@pytest.mark.asyncio
+async def test_history_cursor_pages_cover_every_message_once(
+    async_client: AsyncClient, db_session: AsyncSession, test_user: User, test_token: str
+):
+    """Cursor pages walk (created_at, id) newest first without gaps or repeats, ties included"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    ids = await _seed_messages(db_session, test_user)
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/v1/ai-assistant/history?limit=4" + (f"&cursor={cursor}" if cursor else "")
+        with count_statements(db_session) as statements:
+            body = (await async_client.get(url, headers=headers)).json()
+        seen.extend(m["id"] for m in body["messages"])
+        # Only the first page pays for the count
+        assert body["total"] == (None if cursor else 9)
+        assert any("count(" in s.lower() for s in statements) == (cursor is None)
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ids[::-1]
+
+    # Offset mode is unchanged
+    body = (await async_client.get("/api/v1/ai-assistant/history?limit=4&offset=4", headers=headers)).json()
+    assert [m["id"] for m in body["messages"]] == [5, 4, 3, 2]
+    assert body["total"] == 9
+
+    # One conversation's total comes from its thread map, not a count
+    with count_statements(db_session) as statements:
+        body = (await async_client.get("/api/v1/ai-assistant/history?conversation_id=7", headers=headers)).json()
+    assert body["total"] == 7
+    assert not any("count(" in s.lower() for s in statements)
+
+    response = await async_client.get("/api/v1/ai-assistant/history?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+    # Out-of-range paging is rejected up front instead of failing the query
+    for params in ("limit=0", "limit=-1", "limit=201", "offset=-1"):
+        response = await async_client.get(f"/api/v1/ai-assistant/history?{params}", headers=headers)
+        assert response.status_code == 422, params
+    response = await async_client.get("/api/v1/ai-assistant/conversations/7?limit=0", headers=headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_conversation_detail_pages_back_from_newest(
+    async_client: AsyncClient, db_session: AsyncSession, test_user: User, test_token: str
+):
+    """With a limit, detail returns the newest messages first page and earlier ones via next_cursor"""
+    headers = {"Authorization": f"Bearer {test_token}"}
+    await _seed_messages(db_session, test_user)
+
+    full = (await async_client.get("/api/v1/ai-assistant/conversations/7", headers=headers)).json()
+    assert [m["id"] for m in full["messages"]] == [1, 2, 3, 4, 5, 6, 7]
+    assert full["next_cursor"] is None
+
+    pages, cursor = [], None
+    while True:
+        url = "/api/v1/ai-assistant/conversations/7?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        body = (await async_client.get(url, headers=headers)).json()
+        pages.append([m["id"] for m in body["messages"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert pages == [[5, 6, 7], [2, 3, 4], [1]]
@@ -0,0 +1,176 @@
+"""Tests for content-addressed document storage"""
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core import openai_utils
+from app.backend.core.config import settings
+from app.backend.core.security import create_access_token
+from app.backend.models.document_blob import DocumentBlob
+from app.backend.models.user import User, UserRole
+from app.backend.services.ingestion_worker import IngestionWorker
+
+SYLLABUS = b"%PDF-1.4 Week 1: hashing. Week 2: consensus."
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "DOCUMENT_STORAGE_PATH", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+async def classmate_token(db_session: AsyncSession):
+    classmate = User(
+        email="classmate@example.com",
+        hashed_password="hashed_password",
+        username="classmate",
+        role=UserRole.STUDENT,
+        is_active=True,
+        is_verified=True,
+    )
+    db_session.add(classmate)
+    await db_session.commit()
+    return create_access_token(data={"sub": str(classmate.id)})
+
+
+async def _upload(async_client: AsyncClient, token: str, content: bytes, name: str = "syllabus.pdf") -> dict:
+    response = await async_client.post(
+        "/api/v1/documents/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": (name, content, "application/pdf")},
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def _blob_files(storage: Path) -> list[Path]:
+    return [p for p in (storage / "blobs").rglob("*") if p.is_file()]
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_one_blob_until_last_delete(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_token: str,
+    classmate_token: str,
+    storage: Path,
+):
+    """Same content is stored once, and the file is removed only when its last document is deleted"""
+    first = await _upload(async_client, test_token, SYLLABUS)
+    second = await _upload(async_client, classmate_token, SYLLABUS, name="Syllabus (1).pdf")
+    await _upload(async_client, test_token, b"%PDF-1.4 something else", name="other.pdf")
+
+    assert len(_blob_files(storage)) == 2
+    assert not list(storage.glob(".upload-*"))
+    blob = (await db_session.execute(DocumentBlob.__table__.select().where(DocumentBlob.ref_count == 2))).one()
+    assert blob.file_size == len(SYLLABUS)
+
+    response = await async_client.delete(f"/api/v1/documents/{first['id']}", headers={"Authorization": f"Bearer {test_token}"})
+    assert response.status_code == 204
+    assert Path(blob.storage_path).exists()
+
+    response = await async_client.delete(f"/api/v1/documents/{second['id']}", headers={"Authorization": f"Bearer {classmate_token}"})
+    assert response.status_code == 204
+    assert not Path(blob.storage_path).exists()
+    assert await db_session.get(DocumentBlob, blob.sha256) is None
+
+
+@pytest.mark.asyncio
+async def test_identical_content_is_uploaded_to_openai_once(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_token: str,
+    classmate_token: str,
+    storage: Path,
+    monkeypatch,
+):
+    """The second copy reuses the first copy's OpenAI file"""
+    uploads = []
+
+    async def _create_file(file, purpose):
+        uploads.append(file.name)
+        return SimpleNamespace(id=f"file_{len(uploads)}")
+
+    async def _noop(**kwargs):
+        return SimpleNamespace(id="vs_1")
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(create=_create_file),
+        beta=SimpleNamespace(vector_stores=SimpleNamespace(create=_noop, files=SimpleNamespace(create=_noop))),
+    )
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    monkeypatch.setattr("app.backend.services.ingestion_worker.get_openai_client", lambda: client)
+    openai_utils.openai_resource_cache.clear()
+
+    worker = IngestionWorker(session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False))
+    await _upload(async_client, test_token, SYLLABUS)
+    await worker.run_once()
+    await _upload(async_client, classmate_token, SYLLABUS)
+    await worker.run_once()
+
+    assert len(uploads) == 1
+    assert worker.metrics()["completed"] == 2
+    openai_utils.openai_resource_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_rejected_without_leftovers(
+    async_client: AsyncClient,
+    test_token: str,
+    storage: Path,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE_MB", 0)
+    response = await async_client.post(
+        "/api/v1/documents/upload",
+        headers={"Authorization": f"Bearer {test_token}"},
+        files={"file": ("big.pdf", SYLLABUS, "application/pdf")},
+    )
+    assert response.status_code == 413
+    assert list(storage.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_racing_last_delete_gets_its_own_blob(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_token: str,
+    classmate_token: str,
+    storage: Path,
+):
+    """If the blob's last reference is released between lookup and increment, the upload stores a new one"""
+    first = await _upload(async_client, test_token, SYLLABUS)
+    released = await db_session.get(DocumentBlob, (await db_session.execute(DocumentBlob.__table__.select())).one().sha256)
+    released_path = Path(released.storage_path)
+
+    raced = []
+
+    def _release_concurrently(conn, cursor, statement, parameters, context, executemany):
+        # What a concurrent delete of the first document commits just before our increment runs
+        if statement.startswith("UPDATE document_blobs SET ref_count") and not raced:
+            raced.append(statement)
+            cursor.execute("UPDATE documents SET is_deleted = 1, content_hash = NULL WHERE id = ?", (first["id"],))
+            cursor.execute("DELETE FROM document_blobs WHERE sha256 = ?", (released.sha256,))
+
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", _release_concurrently)
+    try:
+        second = await _upload(async_client, classmate_token, SYLLABUS)
+    finally:
+        event.remove(db_session.bind.sync_engine, "before_cursor_execute", _release_concurrently)
+    assert raced
+    # The releasing request deletes its file after committing
+    released_path.unlink()
+
+    blob = await db_session.get(DocumentBlob, released.sha256, populate_existing=True)
+    assert blob.ref_count == 1
+    assert Path(blob.storage_path) != released_path
+    assert Path(blob.storage_path).read_bytes() == SYLLABUS
+    response = await async_client.get(
+        f"/api/v1/documents/download/{second['id']}", headers={"Authorization": f"Bearer {classmate_token}"}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,122 @@
+"""Tests for the background document ingestion worker"""
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core import openai_utils
+from app.backend.core.config import settings
+from app.backend.models.user import User
+from app.backend.services.ingestion_worker import IngestionWorker
+
+
+@pytest.fixture
+def flaky_openai(monkeypatch, tmp_path):
+    """OpenAI stand-in whose file uploads fail until `healthy` is set"""
+    state = SimpleNamespace(healthy=False, uploads=0, attached=[])
+
+    async def _upload(file, purpose):
+        state.uploads += 1
+        if not state.healthy:
+            raise RuntimeError("upstream unavailable")
+        return SimpleNamespace(id="file_1")
+
+    async def _create_store(**kwargs):
+        return SimpleNamespace(id="vs_1")
+
+    async def _attach(vector_store_id, file_id):
+        state.attached.append((vector_store_id, file_id))
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(create=_upload),
+        beta=SimpleNamespace(vector_stores=SimpleNamespace(
+            create=_create_store,
+            files=SimpleNamespace(create=_attach),
+        )),
+    )
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    monkeypatch.setattr("app.backend.services.ingestion_worker.get_openai_client", lambda: client)
+    monkeypatch.setattr(settings, "DOCUMENT_STORAGE_PATH", str(tmp_path))
+    openai_utils.openai_resource_cache.clear()
+    yield state
+    openai_utils.openai_resource_cache.clear()
+
+
+async def _ingestion_status(async_client: AsyncClient, token: str, document_id: int) -> dict:
+    response = await async_client.get(
+        f"/api/v1/documents/{document_id}/ingestion",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_upload_returns_before_ingestion_and_retries_with_backoff(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    flaky_openai,
+):
+    """Upload only enqueues; failed ingestion is retried later and the status is pollable"""
+    response = await async_client.post(
+        "/api/v1/documents/upload",
+        headers={"Authorization": f"Bearer {test_token}"},
+        files={"file": ("guide.pdf", b"%PDF-1.4 consensus", "application/pdf")},
+    )
+    assert response.status_code == 201
+    assert response.json()["ingestion_status"] == "pending"
+    assert flaky_openai.uploads == 0
+    document_id = response.json()["id"]
+
+    worker = IngestionWorker(
+        session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False),
+        retry_base_seconds=0,
+    )
+    await worker.run_once()
+    status = await _ingestion_status(async_client, test_token, document_id)
+    assert status["status"] == "pending"
+    assert status["attempts"] == 1
+    assert "to OpenAI failed" in status["last_error"]
+
+    flaky_openai.healthy = True
+    await worker.run_once()
+    status = await _ingestion_status(async_client, test_token, document_id)
+    assert status["status"] == "ready"
+    assert status["attempts"] == 2
+    # Vector store sync attaches the file on the next chat turn
+    assert flaky_openai.attached == []
+    assert worker.metrics()["retried"] == 1
+    assert worker.metrics()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ingestion_gives_up_after_max_attempts(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    flaky_openai,
+):
+    """A document that keeps failing is marked failed instead of retrying forever"""
+    response = await async_client.post(
+        "/api/v1/documents/upload",
+        headers={"Authorization": f"Bearer {test_token}"},
+        files={"file": ("notes.txt", b"Proof of stake", "text/plain")},
+    )
+    document_id = response.json()["id"]
+
+    worker = IngestionWorker(
+        session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False),
+        retry_base_seconds=0,
+        max_attempts=2,
+    )
+    await worker.run_once()
+    await worker.run_once()
+    assert await worker.run_once() == 0
+
+    status = await _ingestion_status(async_client, test_token, document_id)
+    assert status["status"] == "failed"
+    assert flaky_openai.uploads == 2
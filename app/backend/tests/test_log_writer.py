@@ -0,0 +1,167 @@
+"""Tests for the write-behind query log writer"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.models.query_log import QueryLog
+from app.backend.models.user import User
+from app.backend.services.log_writer import WriteBehindWriter
+
+
+def _row(user: User, i: int) -> dict:
+    return {
+        "user_id": user.id,
+        "query": f"Question {i}",
+        "response": "Answer",
+        "operation_type": "chat",
+        "conversation_id": 1,
+        "ip_address": None,
+        "cache_status": None,
+        "created_at": datetime(2026, 10, 17, 12, 0, i % 60, tzinfo=timezone.utc),
+    }
+
+
+async def _count(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count(QueryLog.id)))).scalar_one()
+
+
+class _FailingSessions:
+    """Session factory whose sessions fail until healed"""
+
+    def __init__(self, factory: async_sessionmaker):
+        self.factory = factory
+        self.healthy = False
+
+    def __call__(self):
+        if not self.healthy:
+            raise ConnectionError("database unavailable")
+        return self.factory()
+
+
+@pytest.mark.asyncio
+async def test_rows_are_inserted_in_bulk(db_session: AsyncSession, test_user: User, tmp_path):
+    """Many submissions become a few multi-row INSERTs and the spool is cleaned up"""
+    writer = WriteBehindWriter(
+        async_sessionmaker(db_session.bind, expire_on_commit=False),
+        spool_dir=str(tmp_path), batch_size=100, flush_interval=3600,
+    )
+    writer.start()
+    inserts = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO query_logs"):
+            inserts.append(statement)
+
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", _record)
+    try:
+        for i in range(250):
+            await writer.submit(QueryLog, _row(test_user, i))
+        await writer.stop()
+    finally:
+        event.remove(db_session.bind.sync_engine, "before_cursor_execute", _record)
+
+    assert await _count(db_session) == 250
+    # A handful of flushes, not a statement per row
+    assert len(inserts) <= 6
+    assert list(tmp_path.iterdir()) == []
+    assert writer.metrics()["written"] == 250
+
+
+@pytest.mark.asyncio
+async def test_spooled_rows_survive_failures_and_crashes(db_session: AsyncSession, test_user: User, tmp_path):
+    """Rows that could not be committed are inserted by the next writer on the same spool"""
+    sessions = _FailingSessions(async_sessionmaker(db_session.bind, expire_on_commit=False))
+    crashed = WriteBehindWriter(sessions, spool_dir=str(tmp_path), batch_size=10, flush_interval=3600)
+    crashed.start()
+    for i in range(15):
+        await crashed.submit(QueryLog, _row(test_user, i))
+    assert await crashed.flush() == 0
+    assert crashed.metrics()["failed_flushes"] >= 1
+    # Crash: the loop dies without a final flush and leaves a torn line behind
+    crashed._task.cancel()
+    crashed._journal.write('{"table": "query_lo')
+    crashed._journal.close()
+
+    sessions.healthy = True
+    recovered = WriteBehindWriter(sessions, spool_dir=str(tmp_path), batch_size=10, flush_interval=3600)
+    recovered.start()
+    await recovered.stop()
+
+    assert recovered.metrics()["recovered"] == 15
+    assert await _count(db_session) == 15
+    stored = (await db_session.execute(select(QueryLog.created_at).order_by(QueryLog.id))).scalars().all()
+    assert stored[0].replace(tzinfo=None) == datetime(2026, 10, 17, 12, 0, 0)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_when_buffer_is_full(db_session: AsyncSession, test_user: User, tmp_path):
+    """Backpressure: a submit past max_pending waits for a flush instead of growing the buffer"""
+    sessions = _FailingSessions(async_sessionmaker(db_session.bind, expire_on_commit=False))
+    writer = WriteBehindWriter(sessions, spool_dir=str(tmp_path), batch_size=100, flush_interval=0.01, max_pending=5)
+    writer.start()
+    for i in range(5):
+        await writer.submit(QueryLog, _row(test_user, i))
+
+    blocked = asyncio.create_task(writer.submit(QueryLog, _row(test_user, 5)))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    assert writer.pending == 5
+
+    sessions.healthy = True
+    await asyncio.wait_for(blocked, 1)
+    await writer.stop()
+
+    assert writer.metrics()["blocked_submits"] >= 1
+    # An unavailable database is retried, never dead-lettered
+    assert writer.metrics()["dead_lettered"] == 0
+    assert await _count(db_session) == 6
+
+
+@pytest.mark.asyncio
+async def test_rejected_row_is_dead_lettered(db_session: AsyncSession, test_user: User, tmp_path):
+    """A row the database refuses does not hold up the rest of its spool file or the ones after it"""
+    writer = WriteBehindWriter(
+        async_sessionmaker(db_session.bind, expire_on_commit=False),
+        spool_dir=str(tmp_path), batch_size=100, flush_interval=3600, max_attempts=2,
+    )
+    writer.start()
+    for i in range(3):
+        row = _row(test_user, i)
+        if i == 1:
+            row["query"] = None
+        await writer.submit(QueryLog, row)
+    assert await writer.flush() == 0
+    await writer.submit(QueryLog, _row(test_user, 3))
+    assert await writer.flush() == 3
+    await writer.stop()
+
+    assert await _count(db_session) == 3
+    assert writer.metrics()["dead_lettered"] == 1
+    [dead_letter] = (tmp_path / "dead-letter").iterdir()
+    [record] = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert record["table"] == "query_logs"
+    assert record["row"]["query"] is None
+    assert [path.name for path in tmp_path.iterdir()] == ["dead-letter"]
+
+
+@pytest.mark.asyncio
+async def test_submit_gives_up_when_buffer_stays_full(db_session: AsyncSession, test_user: User, tmp_path):
+    """A stuck flush loop cannot hold a chat turn for longer than submit_timeout"""
+    sessions = _FailingSessions(async_sessionmaker(db_session.bind, expire_on_commit=False))
+    writer = WriteBehindWriter(
+        sessions, spool_dir=str(tmp_path), batch_size=100, flush_interval=0.01, max_pending=1, submit_timeout=0.05,
+    )
+    writer.start()
+    assert await writer.submit(QueryLog, _row(test_user, 0)) is True
+    assert await asyncio.wait_for(writer.submit(QueryLog, _row(test_user, 1)), 1) is False
+    assert writer.metrics()["rejected_submits"] == 1
+    assert writer.pending == 1
+
+    sessions.healthy = True
+    await writer.stop()
+    assert await _count(db_session) == 1
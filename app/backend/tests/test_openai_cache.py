@@ -0,0 +1,100 @@
+"""Tests for caching of verified OpenAI assistant and vector store IDs"""
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import NotFoundError
+
+from app.backend.core import openai_utils
+from app.backend.core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAssistants:
+    """Stand-in for client.beta.assistants that counts remote calls"""
+
+    def __init__(self):
+        self.retrieves = 0
+        self.updates = 0
+        self.missing: set[str] = set()
+
+    async def retrieve(self, assistant_id):
+        self.retrieves += 1
+        if assistant_id in self.missing:
+            request = httpx.Request("GET", f"https://api.openai.com/v1/assistants/{assistant_id}")
+            raise NotFoundError("No assistant found", response=httpx.Response(404, request=request), body=None)
+        return SimpleNamespace(id=assistant_id, tool_resources={"file_search": {"vector_store_ids": ["vs_1"]}})
+
+    async def update(self, assistant_id, **kwargs):
+        self.updates += 1
+        return SimpleNamespace(id=assistant_id)
+
+    async def create(self, **kwargs):
+        return SimpleNamespace(id="asst_new")
+
+
+@pytest.fixture
+def fake_assistants(monkeypatch):
+    assistants = FakeAssistants()
+    client = SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    openai_utils.openai_resource_cache.clear()
+    yield assistants
+    openai_utils.openai_resource_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_expires_and_evicts_lru():
+    """Entries expire after the TTL and the least recently used key is evicted first"""
+    clock = FakeClock()
+    cache = TTLCache("test", maxsize=2, ttl=10, timer=clock)
+
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # "b" is now least recently used
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is None
+    assert await cache.get("c") == 3
+
+    clock.now = 11
+    assert await cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_assistant_verified_once(fake_assistants):
+    """Repeat lookups reuse the verified assistant until instructions change"""
+    user = SimpleNamespace(id=1, openai_assistant_id="asst_1", username="u", email="u@example.com")
+
+    for _ in range(3):
+        assert await openai_utils.get_or_create_user_assistant(user, vector_store_id="vs_1") == "asst_1"
+    assert fake_assistants.retrieves == 1
+    assert fake_assistants.updates == 0
+
+    await openai_utils.update_user_assistant_instructions(user, "New instructions")
+    assert await openai_utils.get_or_create_user_assistant(user, vector_store_id="vs_1") == "asst_1"
+    assert fake_assistants.retrieves == 2
+
+
+@pytest.mark.asyncio
+async def test_global_assistant_not_found_is_not_cached(fake_assistants, monkeypatch):
+    """A 404 from OpenAI is reported on every call instead of being cached"""
+    monkeypatch.setattr(openai_utils.settings, "OPENAI_ASSISTANT_ID", "asst_global")
+
+    assert await openai_utils.get_global_assistant_id() == "asst_global"
+    assert await openai_utils.get_global_assistant_id() == "asst_global"
+    assert fake_assistants.retrieves == 1
+
+    fake_assistants.missing.add("asst_global")
+    await openai_utils.invalidate_openai_resource_cache(assistant_id="asst_global")
+    assert await openai_utils.get_global_assistant_id() is None
+    assert await openai_utils.get_global_assistant_id() is None
+    assert fake_assistants.retrieves == 3
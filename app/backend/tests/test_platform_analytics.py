@@ -0,0 +1,80 @@
+"""Tests for the cached platform analytics snapshot"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.activity import ActivityKind
+from app.backend.models.assessment import Assessment
+from app.backend.models.module import Module, Track
+from app.backend.models.progress import ProgressStatus, QuizAttempt, UserProgress
+from app.backend.models.user import User, UserRole
+from app.backend.services import analytics_service
+from app.backend.services.activity import record_activity
+
+
+@pytest.fixture(autouse=True)
+def _clear_snapshot():
+    analytics_service.platform_snapshot_cache.clear()
+    yield
+    analytics_service.platform_snapshot_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_platform_analytics_snapshot(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_assessment: Assessment,
+    test_admin_token: str,
+):
+    """Two aggregate queries build the snapshot; later reads skip them until a forced refresh"""
+    db_session.add(Module(id=2, title="Hashing", track=Track.DEVELOPER, order_index=2, duration_hours=1.0))
+    db_session.add_all([
+        UserProgress(user_id=test_user.id, module_id=test_assessment.module_id, status=ProgressStatus.COMPLETED),
+        UserProgress(user_id=test_user.id, module_id=2, status=ProgressStatus.IN_PROGRESS),
+        QuizAttempt(user_id=test_user.id, assessment_id=test_assessment.id, points_earned=10),
+        QuizAttempt(user_id=test_user.id, assessment_id=test_assessment.id, points_earned=5),
+        QuizAttempt(user_id=test_user.id, assessment_id=test_assessment.id, points_earned=None),
+    ])
+    await record_activity(db_session, test_user.id, ActivityKind.LESSON_VIEW)
+    await db_session.commit()
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    headers = {"Authorization": f"Bearer {test_admin_token}"}
+    url = "/api/v1/analytics/platform"
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", _record)
+    try:
+        response = await async_client.get(url, headers=headers)
+        aggregate_statements = [s for s in statements if "count(" in s.lower()]
+        statements.clear()
+        cached = await async_client.get(url, headers=headers)
+    finally:
+        event.remove(db_session.bind.sync_engine, "before_cursor_execute", _record)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total_users"], body["total_students"], body["total_instructors"]) == (2, 1, 0)
+    assert (body["total_modules"], body["total_assessments"], body["total_attempts"]) == (2, 1, 3)
+    # Graded attempts only: 100% and 50%
+    assert body["average_score"] == 75.0
+    assert body["average_completion_rate"] == 50.0
+    assert (body["active_users_last_30_days"], body["new_users_last_30_days"]) == (1, 2)
+    assert body["modules_by_track"] == {"USER": 1, "DEVELOPER": 1}
+    assert body["completion_by_track"] == {"USER": 100.0, "DEVELOPER": 0.0}
+    assert len(aggregate_statements) == 2
+
+    # The cached read only authenticates the admin
+    assert cached.json() == body
+    assert not [s for s in statements if "quiz_attempts" in s or "user_progress" in s]
+
+    db_session.add(User(email="new@example.com", username="new", hashed_password="x", role=UserRole.STUDENT))
+    await db_session.commit()
+    assert (await async_client.get(url, headers=headers)).json()["total_users"] == 2
+    refreshed = (await async_client.get(url, headers=headers, params={"refresh": "true"})).json()
+    assert refreshed["total_users"] == 3
+    assert refreshed["computed_at"] > body["computed_at"]
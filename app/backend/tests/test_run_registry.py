@@ -0,0 +1,76 @@
+"""Tests for the per-thread active-run registry"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.models.thread_run import ThreadRun
+from app.backend.services.run_registry import RunRegistry
+
+
+@pytest.fixture
+def sessions(db_session: AsyncSession) -> async_sessionmaker:
+    return async_sessionmaker(db_session.bind, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_claim_returns_the_recorded_run_to_cancel(sessions: async_sessionmaker):
+    """A fresh thread has nothing to cancel; the next sender gets the run we recorded"""
+    registry = RunRegistry(initial_wait=0.01)
+
+    assert await registry.claim(sessions, "thread_a") is None
+    await registry.record(sessions, "thread_a", "run_1")
+    assert await registry.claim(sessions, "thread_a") == "run_1"
+    await registry.release(sessions, "thread_a")
+    assert await registry.claim(sessions, "thread_a") is None
+
+
+@pytest.mark.asyncio
+async def test_second_sender_waits_for_the_claim(sessions: async_sessionmaker):
+    """Sends into one thread take turns: a claim waits until the holder records its run"""
+    registry = RunRegistry(initial_wait=0.01, max_wait=0.02)
+    assert await registry.claim(sessions, "thread_b") is None
+
+    waiting = asyncio.create_task(registry.claim(sessions, "thread_b"))
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+
+    await registry.record(sessions, "thread_b", "run_2")
+    assert await asyncio.wait_for(waiting, 1) == "run_2"
+    assert registry.metrics()["claim_waits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_clear_only_removes_a_settled_run(sessions: async_sessionmaker, db_session: AsyncSession):
+    """clear() forgets a finished run but leaves a newer claim or run alone"""
+    registry = RunRegistry(initial_wait=0.01)
+    await registry.claim(sessions, "thread_c")
+    await registry.record(sessions, "thread_c", "run_3")
+
+    # A newer sender has claimed the thread; the old run finishing must not drop the claim
+    assert await registry.claim(sessions, "thread_c") == "run_3"
+    await registry.clear(sessions, "thread_c", "run_3")
+    assert await db_session.get(ThreadRun, "thread_c", populate_existing=True) is not None
+
+    await registry.record(sessions, "thread_c", "run_4")
+    await registry.clear(sessions, "thread_c", "run_4")
+    assert await db_session.get(ThreadRun, "thread_c", populate_existing=True) is None
+
+
+@pytest.mark.asyncio
+async def test_expired_claim_is_taken_over(sessions: async_sessionmaker):
+    """A sender that crashed while holding the claim does not block the thread forever"""
+    registry = RunRegistry(initial_wait=0.01)
+    await registry.claim(sessions, "thread_d")
+
+    async with sessions() as db:
+        await db.execute(
+            update(ThreadRun)
+            .where(ThreadRun.thread_id == "thread_d")
+            .values(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+        await db.commit()
+
+    assert await asyncio.wait_for(registry.claim(sessions, "thread_d"), 1) is None
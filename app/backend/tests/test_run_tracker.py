@@ -0,0 +1,121 @@
+"""Tests for the shared Assistants run tracker"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.backend.services import run_tracker as run_tracker_module
+from app.backend.services.run_tracker import RunTracker
+
+
+class FakeRuns:
+    """Stand-in for client.beta.threads.runs that walks each run through statuses"""
+
+    def __init__(self, statuses_by_run: dict[str, list[str]]):
+        self.statuses_by_run = statuses_by_run
+        self.calls: dict[str, int] = {}
+        self.hung: set[str] = set()  # Runs whose retrieve never returns
+
+    async def retrieve(self, thread_id: str, run_id: str):
+        if run_id in self.hung:
+            await asyncio.Event().wait()
+        count = self.calls.get(run_id, 0)
+        self.calls[run_id] = count + 1
+        statuses = self.statuses_by_run[run_id]
+        return SimpleNamespace(id=run_id, status=statuses[min(count, len(statuses) - 1)], last_error=None)
+
+
+@pytest.fixture
+def fake_runs(monkeypatch):
+    runs = FakeRuns({
+        "run_fast": ["completed"],
+        "run_slow": ["queued", "in_progress", "in_progress", "completed"],
+        "run_bad": ["in_progress", "failed"],
+    })
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    monkeypatch.setattr(run_tracker_module, "get_openai_client", lambda: client)
+    return runs
+
+
+@pytest.mark.asyncio
+async def test_tracker_resolves_concurrent_runs(fake_runs):
+    """All runs are polled by one tracker and each waiter gets its own final run"""
+    tracker = RunTracker(initial_interval=0.01, max_interval=0.02, jitter=0.0)
+    try:
+        fast, slow, bad = await asyncio.gather(
+            tracker.wait_for_run("thread_1", "run_fast", timeout=5),
+            tracker.wait_for_run("thread_2", "run_slow", timeout=5),
+            tracker.wait_for_run("thread_3", "run_bad", timeout=5),
+        )
+    finally:
+        await tracker.stop()
+
+    assert fast.status == "completed"
+    assert slow.status == "completed"
+    assert bad.status == "failed"
+    assert fake_runs.calls == {"run_fast": 1, "run_slow": 4, "run_bad": 2}
+
+    metrics = tracker.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["total_runs"] == 3
+    assert metrics["total_polls"] == 7
+    assert metrics["polls_per_run_max"] == 4
+
+
+def test_tracker_backoff_is_capped():
+    """Poll interval grows with each poll but never exceeds the cap"""
+    tracker = RunTracker(initial_interval=0.25, max_interval=4.0, backoff_factor=2.0, jitter=0.0)
+
+    assert tracker._next_interval(0) == 0.25
+    assert tracker._next_interval(2) == 1.0
+    assert tracker._next_interval(10) == 4.0
+
+
+@pytest.mark.asyncio
+async def test_tracker_drops_run_when_waiter_times_out(fake_runs):
+    """A waiter that gives up stops the run from being polled"""
+    fake_runs.statuses_by_run["run_stuck"] = ["in_progress"]
+    tracker = RunTracker(initial_interval=0.01, max_interval=0.01, jitter=0.0)
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.wait_for_run("thread_4", "run_stuck", timeout=0.05)
+        await asyncio.sleep(0.03)
+        assert tracker.metrics()["in_flight"] == 0
+    finally:
+        await tracker.stop()
+
+
+@pytest.mark.asyncio
+async def test_hung_retrieve_does_not_stall_other_runs(fake_runs):
+    """A retrieve that never returns only holds up its own run"""
+    fake_runs.statuses_by_run["run_hung"] = ["in_progress"]
+    fake_runs.hung.add("run_hung")
+    tracker = RunTracker(initial_interval=0.01, max_interval=0.02, jitter=0.0)
+    try:
+        hung = asyncio.create_task(tracker.wait_for_run("thread_5", "run_hung"))
+        await asyncio.sleep(0.02)
+        slow = await tracker.wait_for_run("thread_2", "run_slow", timeout=1)
+        assert slow.status == "completed"
+        assert not hung.done()
+        assert tracker.metrics()["in_flight"] == 1
+    finally:
+        await tracker.stop()
+    with pytest.raises(RuntimeError):
+        await hung
+
+
+@pytest.mark.asyncio
+async def test_waiter_timeout_does_not_cancel_other_waiters(fake_runs):
+    """Callers sharing a run each get their own timeout; the run outlives the impatient one"""
+    tracker = RunTracker(initial_interval=0.01, max_interval=0.02, jitter=0.0)
+    try:
+        patient = asyncio.create_task(tracker.wait_for_run("thread_2", "run_slow", timeout=5))
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.wait_for_run("thread_2", "run_slow", timeout=0.001)
+        run = await patient
+    finally:
+        await tracker.stop()
+
+    assert run.status == "completed"
+    assert fake_runs.calls["run_slow"] == 4
+    assert tracker.metrics()["total_runs"] == 1
@@ -0,0 +1,138 @@
+"""Tests for the SQL-aggregated student analytics"""
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.models.achievement import Achievement, UserAchievement
+from app.backend.models.activity import ActivityKind
+from app.backend.models.assessment import Assessment, QuestionType
+from app.backend.models.module import Module, Track
+from app.backend.models.progress import ProgressStatus, QuizAttempt, UserProgress
+from app.backend.models.user import User, UserRole
+from app.backend.services.activity import record_activity
+from app.backend.services.analytics_service import student_summary
+
+
+def _assessment(module_id: int, points: int) -> Assessment:
+    return Assessment(
+        module_id=module_id,
+        question_text="Question?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        order_index=1,
+        points=points,
+        correct_answer="A",
+    )
+
+
+@pytest.mark.asyncio
+async def test_student_analytics_aggregates(
+    async_client: AsyncClient, db_session: AsyncSession, test_user: User, test_token: str, test_module: Module
+):
+    """Counts, scores, streak and recent activity (with real module titles) come back from SQL"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    hashing = Module(id=2, title="Hashing", track=Track.USER, order_index=2, duration_hours=1.0, is_published=True)
+    db_session.add(hashing)
+    first, second = _assessment(test_module.id, 10), _assessment(2, 20)
+    db_session.add_all([first, second])
+    achievement = Achievement(name="First steps", points=50)
+    db_session.add(achievement)
+    await db_session.flush()
+
+    db_session.add_all([
+        UserProgress(user_id=test_user.id, module_id=test_module.id, status=ProgressStatus.COMPLETED, last_accessed_at=now),
+        UserProgress(user_id=test_user.id, module_id=2, status=ProgressStatus.IN_PROGRESS, last_accessed_at=now - timedelta(days=1)),
+        QuizAttempt(user_id=test_user.id, assessment_id=first.id, points_earned=10, attempted_at=now - timedelta(days=2)),
+        QuizAttempt(user_id=test_user.id, assessment_id=first.id, points_earned=0, attempted_at=now - timedelta(days=5)),
+        QuizAttempt(user_id=test_user.id, assessment_id=first.id, points_earned=None, attempted_at=now),
+        QuizAttempt(user_id=test_user.id, assessment_id=second.id, points_earned=15, attempted_at=now),
+        UserAchievement(user_id=test_user.id, achievement_id=achievement.id),
+    ])
+    # Streaks come from the activity stream: three days in a row, then a gap
+    for days_ago in (0, 1, 1, 2, 5):
+        await record_activity(db_session, test_user.id, ActivityKind.SUBMISSION, now - timedelta(days=days_ago))
+    await db_session.commit()
+
+    start = (now - timedelta(days=3)).date()
+    response = await async_client.get(
+        f"/api/v1/analytics/student/{test_user.id}",
+        headers={"Authorization": f"Bearer {test_token}"},
+        params={"start": start.isoformat()},
+    )
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["total_modules_completed"] == 1
+    assert body["total_modules_started"] == 2
+    assert body["modules_by_status"] == {"completed": 1, "in_progress": 1, "not_started": 0}
+    assert body["total_attempts"] == 4
+    # Graded attempts only: 100%, 0% and 75%
+    assert body["average_score"] == 58.33
+    assert body["scores_by_module"] == [
+        {"module_id": 1, "module_title": "Test Module", "best_score": 100.0},
+        {"module_id": 2, "module_title": "Hashing", "best_score": 75.0},
+    ]
+    assert body["current_streak_days"] == 3
+    assert body["active_days"] == 3
+    assert (body["total_achievements"], body["total_points"]) == (1, 50)
+    assert [a["module_title"] for a in body["recent_activity"]] == ["Test Module", "Hashing"]
+
+
+async def _student_with_attempts(db: AsyncSession, assessment_id: int, attempts: int, n: int) -> int:
+    user = User(
+        email=f"bench{n}@example.com", username=f"bench{n}", hashed_password="x",
+        role=UserRole.STUDENT, is_active=True, is_verified=True,
+    )
+    db.add(user)
+    await db.flush()
+    start = datetime(2026, 1, 1)
+    await db.execute(insert(QuizAttempt), [
+        {
+            "user_id": user.id,
+            "assessment_id": assessment_id,
+            "points_earned": i % 11,
+            "attempted_at": start + timedelta(minutes=37 * i),
+        }
+        for i in range(attempts)
+    ])
+    await db.commit()
+    return user.id
+
+
+async def _measure(db: AsyncSession, user_id: int) -> tuple[int, int]:
+    """Peak Python allocation and statement count for one summary"""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", _record)
+    tracemalloc.start()
+    try:
+        await student_summary(db, user_id, date(2026, 1, 1), date(2026, 1, 31))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        event.remove(db.bind.sync_engine, "before_cursor_execute", _record)
+    return peak, len(statements)
+
+
+@pytest.mark.asyncio
+async def test_summary_memory_does_not_grow_with_history(db_session: AsyncSession, test_module: Module):
+    """Benchmark: a student with 10k attempts costs the same queries and memory as one with 100"""
+    assessment = _assessment(test_module.id, 10)
+    db_session.add(assessment)
+    await db_session.flush()
+    light = await _student_with_attempts(db_session, assessment.id, 100, 1)
+    heavy = await _student_with_attempts(db_session, assessment.id, 10_000, 2)
+
+    await _measure(db_session, light)  # warm up statement caches
+    light_peak, light_statements = await _measure(db_session, light)
+    heavy_peak, heavy_statements = await _measure(db_session, heavy)
+
+    assert heavy_statements == light_statements
+    # Loading 10k ORM rows would cost several MB; aggregates stay within noise
+    assert heavy_peak < light_peak * 1.5 + 64 * 1024
@@ -0,0 +1,126 @@
+"""Tests for the pre-created thread pool and conversation ID allocation"""
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.models.pooled_thread import PooledThread
+from app.backend.models.thread_map import ThreadMap, CONVERSATION_ID_START
+from app.backend.models.user import User
+from app.backend.services import llm_service
+from app.backend.services import thread_pool as thread_pool_module
+from app.backend.services.thread_pool import ThreadPool
+
+
+class FakeThreads:
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.created = 0
+        self.deleted = []
+
+    async def create(self, **kwargs):
+        self.created += 1
+        return SimpleNamespace(id=f"thread_{next(self._ids)}")
+
+    async def delete(self, thread_id):
+        self.deleted.append(thread_id)
+
+
+@pytest.fixture
+def fake_threads(monkeypatch) -> FakeThreads:
+    threads = FakeThreads()
+    client = SimpleNamespace(beta=SimpleNamespace(threads=threads))
+    monkeypatch.setattr(thread_pool_module, "get_openai_client", lambda: client)
+    monkeypatch.setattr(llm_service, "get_openai_client", lambda: client)
+    return threads
+
+
+@pytest.fixture
+def sessions(db_session: AsyncSession) -> async_sessionmaker:
+    return async_sessionmaker(db_session.bind, expire_on_commit=False)
+
+
+async def _pool_size(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count(PooledThread.id)))
+
+
+@pytest.mark.asyncio
+async def test_refill_tops_up_below_low_water(sessions, db_session: AsyncSession, fake_threads: FakeThreads):
+    """The pool is refilled to target_size only once it drops below low_water"""
+    pool = ThreadPool(sessions, enabled=True, low_water=2, target_size=5)
+
+    assert await pool.refill() == 5
+    assert await pool.refill() == 0
+    for _ in range(4):
+        assert await pool.claim(db_session)
+    assert await pool.refill() == 4
+    assert await _pool_size(db_session) == 5
+    assert fake_threads.created == 9
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_never_share_a_thread(sessions, fake_threads: FakeThreads):
+    """Each pooled thread goes to exactly one claimer; the rest miss"""
+    pool = ThreadPool(sessions, enabled=True, low_water=1, target_size=4)
+    await pool.refill()
+
+    async def _claim():
+        async with sessions() as db:
+            return await pool.claim(db, attempts=10)
+
+    claimed = await asyncio.gather(*(_claim() for _ in range(8)))
+    taken = [thread_id for thread_id in claimed if thread_id]
+    assert len(taken) == 4
+    assert len(set(taken)) == 4
+    assert pool.metrics()["misses"] == 4
+
+
+@pytest.mark.asyncio
+async def test_expired_threads_are_collected(sessions, db_session: AsyncSession, fake_threads: FakeThreads):
+    """Unclaimed threads past max_age are deleted remotely and never handed out"""
+    pool = ThreadPool(sessions, enabled=True, max_age=3600)
+    stale = datetime.now(timezone.utc) - timedelta(hours=2)
+    db_session.add(PooledThread(thread_id="thread_old", created_at=stale))
+    db_session.add(PooledThread(thread_id="thread_new"))
+    await db_session.commit()
+
+    assert await pool.collect_garbage() == 1
+    assert fake_threads.deleted == ["thread_old"]
+    assert await pool.claim(db_session) == "thread_new"
+    assert await pool.claim(db_session) is None
+
+
+@pytest.mark.asyncio
+async def test_first_message_uses_pooled_thread(
+    sessions, db_session: AsyncSession, test_user: User, fake_threads: FakeThreads, monkeypatch
+):
+    """A new conversation gets a pooled thread without calling threads.create"""
+    pool = ThreadPool(sessions, enabled=True, low_water=1, target_size=1)
+    await pool.refill()
+    monkeypatch.setattr(llm_service, "thread_pool", pool)
+
+    thread_id = await llm_service.get_or_create_thread(db_session, test_user, 42)
+
+    assert thread_id == "thread_1"
+    assert fake_threads.created == 1
+    stored = await db_session.scalar(select(ThreadMap.thread_id).where(ThreadMap.conversation_id == 42))
+    assert stored == "thread_1"
+
+
+@pytest.mark.asyncio
+async def test_conversation_ids_do_not_collide(sessions, db_session: AsyncSession, test_user: User):
+    """Allocated IDs are unique and start above the old 9-digit range and any stored ID"""
+    db_session.add(ThreadMap(conversation_id=CONVERSATION_ID_START + 10, thread_id=None, user_id=test_user.id))
+    await db_session.commit()
+
+    async def _allocate():
+        async with sessions() as db:
+            return await llm_service.next_conversation_id(db)
+
+    ids = await asyncio.gather(*(_allocate() for _ in range(20)))
+    assert len(set(ids)) == 20
+    assert min(ids) > CONVERSATION_ID_START + 10
@@ -0,0 +1,196 @@
+"""Request concurrency, batching and failure isolation of the vector store reconcile"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from openai import AsyncOpenAI
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.core import openai_utils
+from app.backend.models.document import Document
+from app.backend.models.user import User
+
+LATENCY_SECONDS = 0.02
+DOCUMENTS_TO_UPLOAD = 20
+DOCUMENTS_TO_ATTACH = 20
+STALE_FILES = 10
+
+
+class FakeOpenAIServer:
+    """Local stand-in for the OpenAI files/vector store HTTP API with fixed latency per request"""
+
+    def __init__(self, latency: float = LATENCY_SECONDS):
+        self.latency = latency
+        self.attached: set[str] = set()
+        self.requests: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_uploads: set[str] = set()  # Filenames whose upload returns 400
+        self.missing_files: set[str] = set()  # File IDs that 404 on delete/attach
+        self._ids = itertools.count(1)
+        self.app = self._build_app()
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def _latency(request: Request, call_next):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.latency)
+                return await call_next(request)
+            finally:
+                self.in_flight -= 1
+
+        def _count(name: str):
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+        def _error(code: int, message: str):
+            return JSONResponse(status_code=code, content={"error": {"message": message, "type": "invalid_request_error"}})
+
+        @app.get("/v1/vector_stores/{vector_store_id}")
+        async def retrieve_store(vector_store_id: str):
+            _count("retrieve_store")
+            return {"id": vector_store_id, "object": "vector_store"}
+
+        @app.get("/v1/vector_stores/{vector_store_id}/files")
+        async def list_files(vector_store_id: str):
+            _count("list_files")
+            data = [{"id": file_id, "object": "vector_store.file"} for file_id in sorted(self.attached)]
+            return {"object": "list", "data": data, "has_more": False, "last_id": data[-1]["id"] if data else None}
+
+        @app.post("/v1/files")
+        async def upload(request: Request):
+            _count("upload")
+            form = await request.form()
+            if form["file"].filename in self.fail_uploads:
+                return _error(400, "Unsupported file")
+            return {"id": f"file-new-{next(self._ids)}", "object": "file"}
+
+        @app.post("/v1/vector_stores/{vector_store_id}/file_batches")
+        async def create_batch(vector_store_id: str, request: Request):
+            _count("file_batch")
+            file_ids = (await request.json())["file_ids"]
+            if any(file_id in self.missing_files for file_id in file_ids):
+                return _error(404, "File not found")
+            self.attached.update(file_ids)
+            return {"id": f"vsfb_{next(self._ids)}", "object": "vector_store.file_batch", "status": "in_progress"}
+
+        @app.post("/v1/vector_stores/{vector_store_id}/files")
+        async def attach(vector_store_id: str, request: Request):
+            _count("attach")
+            file_id = (await request.json())["file_id"]
+            if file_id in self.missing_files:
+                return _error(404, "File not found")
+            self.attached.add(file_id)
+            return {"id": file_id, "object": "vector_store.file"}
+
+        @app.delete("/v1/vector_stores/{vector_store_id}/files/{file_id}")
+        async def detach(vector_store_id: str, file_id: str):
+            _count("delete")
+            if file_id in self.missing_files:
+                return _error(404, "File not found")
+            self.attached.discard(file_id)
+            return {"id": file_id, "object": "vector_store.file.deleted", "deleted": True}
+
+        return app
+
+    def client(self):
+        """Real SDK client talking HTTP to this server, shaped like the client openai_utils expects"""
+        sdk = AsyncOpenAI(
+            api_key="test",
+            base_url="http://fake-openai/v1",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app)),
+        )
+        return SimpleNamespace(files=sdk.files, beta=SimpleNamespace(vector_stores=sdk.vector_stores))
+
+
+async def _seed(db: AsyncSession, user: User, server: FakeOpenAIServer, tmp_path) -> None:
+    """Documents needing upload, documents needing attach, and stale remote files"""
+    user.openai_vector_store_id = "vs_bench"
+    for i in range(DOCUMENTS_TO_UPLOAD + DOCUMENTS_TO_ATTACH):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"Document {i} about consensus")
+        db.add(Document(
+            title=f"Doc {i}",
+            filename=path.name,
+            storage_path=str(path),
+            file_size=path.stat().st_size,
+            uploader_id=user.id,
+            openai_file_id=f"file-old-{i}" if i >= DOCUMENTS_TO_UPLOAD else None,
+            ingestion_status="ready" if i >= DOCUMENTS_TO_UPLOAD else "pending",
+        ))
+    await db.commit()
+    server.attached.update(f"file-stale-{i}" for i in range(STALE_FILES))
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = FakeOpenAIServer()
+    client = server.client()
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    openai_utils.openai_resource_cache.clear()
+    yield server
+    openai_utils.openai_resource_cache.clear()
+
+
+async def _fresh_reconcile(db: AsyncSession, user: User, tmp_path, monkeypatch, concurrency: int):
+    """Seed a fresh fake server and database, then run one full reconcile"""
+    server = FakeOpenAIServer()
+    client = server.client()
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    openai_utils.openai_resource_cache.clear()
+
+    await db.execute(delete(Document))
+    db.expunge_all()
+    user = await db.get(User, user.id)
+    await _seed(db, user, server, tmp_path)
+
+    result = await openai_utils.reconcile_vector_store(db, user, concurrency=concurrency)
+    return result, server
+
+
+@pytest.mark.asyncio
+async def test_reconcile_concurrent_vs_serial(db_session: AsyncSession, test_user: User, tmp_path, monkeypatch):
+    """Requests overlap up to the limit and attaches go in one batch; the outcome matches a serial run"""
+    serial_result, serial_server = await _fresh_reconcile(db_session, test_user, tmp_path, monkeypatch, concurrency=1)
+    result, server = await _fresh_reconcile(db_session, test_user, tmp_path, monkeypatch, concurrency=8)
+
+    for outcome in (serial_result, result):
+        assert outcome.errors == []
+        assert len(outcome.uploaded) == DOCUMENTS_TO_UPLOAD
+        assert len(outcome.attached) == DOCUMENTS_TO_UPLOAD + DOCUMENTS_TO_ATTACH
+        assert len(outcome.removed) == STALE_FILES
+    # One batch instead of a request per file, and the same requests either way
+    assert server.requests == serial_server.requests == {
+        "retrieve_store": 1,
+        "list_files": 1,
+        "upload": DOCUMENTS_TO_UPLOAD,
+        "delete": STALE_FILES,
+        "file_batch": 1,
+    }
+    assert serial_server.max_in_flight == 1
+    assert 1 < server.max_in_flight <= 8
+
+
+@pytest.mark.asyncio
+async def test_reconcile_isolates_failures(db_session: AsyncSession, test_user: User, tmp_path, fake_server):
+    """A failed upload or delete is reported without stopping the rest of the reconcile"""
+    await _seed(db_session, test_user, fake_server, tmp_path)
+    fake_server.fail_uploads.add("doc0.txt")
+    fake_server.missing_files.update({"file-stale-0", "file-old-39"})
+
+    result = await openai_utils.reconcile_vector_store(db_session, test_user, concurrency=4)
+
+    assert len(result.uploaded) == DOCUMENTS_TO_UPLOAD  # doc0 failed once, doc39's missing file was re-uploaded
+    assert len(result.removed) == STALE_FILES - 1
+    assert len(result.attached) == DOCUMENTS_TO_UPLOAD + DOCUMENTS_TO_ATTACH - 1
+    assert len(result.errors) == 2
+    assert fake_server.requests["attach"] == DOCUMENTS_TO_UPLOAD + DOCUMENTS_TO_ATTACH - 1  # Batch rejected, retried per file
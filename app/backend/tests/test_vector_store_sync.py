@@ -0,0 +1,249 @@
+"""Tests for incremental vector store sync driven by document changes"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backend.core import openai_utils
+from app.backend.core.config import settings
+from app.backend.models.document import Document
+from app.backend.models.user import User
+from app.backend.models.vector_store_sync import VectorStoreSyncOp, VectorStoreSyncState
+from app.backend.services.ingestion_worker import IngestionWorker, enqueue_ingestion
+
+
+class FakeVectorStores:
+    """Stand-in for client.beta.vector_stores recording every remote call"""
+
+    def __init__(self):
+        self.attached: set[str] = set()
+        self.calls: list[str] = []
+        self.files = SimpleNamespace(list=self._list, create=self._attach, delete=self._detach)
+
+    async def create(self, **kwargs):
+        self.calls.append("create_store")
+        return SimpleNamespace(id="vs_1")
+
+    async def retrieve(self, vector_store_id):
+        self.calls.append("retrieve_store")
+        return SimpleNamespace(id=vector_store_id)
+
+    async def _list(self, vector_store_id, limit=100, after=None):
+        self.calls.append("list")
+        return SimpleNamespace(data=[SimpleNamespace(id=f) for f in self.attached], has_more=False, last_id=None)
+
+    async def _attach(self, vector_store_id, file_id):
+        self.calls.append(f"attach:{file_id}")
+        self.attached.add(file_id)
+
+    async def _detach(self, vector_store_id, file_id):
+        self.calls.append(f"detach:{file_id}")
+        self.attached.discard(file_id)
+
+
+@pytest.fixture
+def fake_vector_stores(monkeypatch, tmp_path):
+    stores = FakeVectorStores()
+    uploads = iter(range(1, 100))
+
+    async def _upload(file, purpose):
+        return SimpleNamespace(id=f"file_{next(uploads)}")
+
+    client = SimpleNamespace(
+        beta=SimpleNamespace(vector_stores=stores),
+        files=SimpleNamespace(create=_upload),
+    )
+    monkeypatch.setattr(openai_utils, "get_openai_client", lambda: client)
+    monkeypatch.setattr("app.backend.services.ingestion_worker.get_openai_client", lambda: client)
+    monkeypatch.setattr(settings, "DOCUMENT_STORAGE_PATH", str(tmp_path))
+    openai_utils.openai_resource_cache.clear()
+    yield stores
+    openai_utils.openai_resource_cache.clear()
+
+
+async def _upload(async_client: AsyncClient, token: str, name: str, content: bytes) -> int:
+    response = await async_client.post(
+        "/api/v1/documents/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": (name, content, "text/plain")},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_chat_sync_only_applies_recorded_changes(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    fake_vector_stores: FakeVectorStores,
+):
+    """After the first full reconcile, syncs touch only documents that changed"""
+    worker = IngestionWorker(session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False))
+    await _upload(async_client, test_token, "notes.txt", b"Blocks link to the previous block hash.")
+    assert await worker.run_once() == 1
+    # The worker only uploads; attaching is left to sync
+    assert fake_vector_stores.calls == []
+
+    # First sync has no watermark yet, so it reconciles everything
+    assert await openai_utils.sync_vector_store(db_session, test_user) == "vs_1"
+    assert fake_vector_stores.calls == ["create_store", "list", "attach:file_1"]
+
+    # Nothing changed: no remote calls at all
+    fake_vector_stores.calls.clear()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == []
+
+    # New uploads wait for the worker, then the next sync attaches them
+    second_id = await _upload(async_client, test_token, "more.txt", b"Validators stake tokens.")
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == []
+    await worker.run_once()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == ["attach:file_2"]
+
+    fake_vector_stores.calls.clear()
+    response = await async_client.delete(
+        f"/api/v1/documents/{second_id}",
+        headers={"Authorization": f"Bearer {test_token}"},
+    )
+    assert response.status_code == 204
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == ["detach:file_2"]
+    assert fake_vector_stores.attached == {"file_1"}
+
+    # Deleting a duplicate keeps the shared file attached for the remaining copy
+    copy_id = await _upload(async_client, test_token, "notes copy.txt", b"Blocks link to the previous block hash.")
+    await worker.run_once()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    fake_vector_stores.calls.clear()
+    await async_client.delete(f"/api/v1/documents/{copy_id}", headers={"Authorization": f"Bearer {test_token}"})
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == []
+    assert fake_vector_stores.attached == {"file_1"}
+
+
+@pytest.mark.asyncio
+async def test_shared_document_added_after_first_sync(
+    db_session: AsyncSession,
+    test_user: User,
+    fake_vector_stores: FakeVectorStores,
+    tmp_path,
+):
+    """A standard document reaches stores that were reconciled while it was still ingesting"""
+    worker = IngestionWorker(session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False))
+    assert await openai_utils.sync_vector_store(db_session, test_user) == "vs_1"
+
+    path = tmp_path / "whitepaper.txt"
+    path.write_bytes(b"Shared reading for every learner.")
+    document = Document(
+        title="whitepaper", filename=path.name, storage_path=str(path),
+        file_size=path.stat().st_size, category="standard",
+    )
+    db_session.add(document)
+    await db_session.flush()
+    enqueue_ingestion(db_session, document)
+    await db_session.commit()
+
+    # A full reconcile before ingestion finishes must not skip past the document
+    await openai_utils.update_vector_store(db_session, test_user, upload_missing=False)
+    assert fake_vector_stores.attached == set()
+
+    await worker.run_once()
+    fake_vector_stores.calls.clear()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == ["attach:file_1"]
+
+
+@pytest.mark.asyncio
+async def test_document_deleted_during_ingestion_is_never_attached(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    test_user: User,
+    test_token: str,
+    fake_vector_stores: FakeVectorStores,
+    monkeypatch,
+):
+    """The delete and its sync land while the upload is in flight; the file stays detached"""
+    worker = IngestionWorker(session_factory=async_sessionmaker(db_session.bind, expire_on_commit=False))
+    await openai_utils.sync_vector_store(db_session, test_user)
+    document_id = await _upload(async_client, test_token, "draft.txt", b"Work in progress.")
+    client = openai_utils.get_openai_client()
+    upload = client.files.create
+
+    async def _upload_while_deleting(file, purpose):
+        response = await async_client.delete(
+            f"/api/v1/documents/{document_id}", headers={"Authorization": f"Bearer {test_token}"}
+        )
+        assert response.status_code == 204
+        await openai_utils.sync_vector_store(db_session, test_user)
+        return await upload(file=file, purpose=purpose)
+
+    monkeypatch.setattr(client.files, "create", _upload_while_deleting)
+    assert await worker.run_once() == 1
+    document = await db_session.get(Document, document_id, populate_existing=True)
+    assert document.ingestion_status != "ready"
+
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.attached == set()
+
+
+@pytest.mark.asyncio
+async def test_ops_committed_out_of_id_order_are_applied(
+    db_session: AsyncSession,
+    test_user: User,
+    fake_vector_stores: FakeVectorStores,
+    tmp_path,
+):
+    """A lower op ID that commits after a sync applied a higher one is still picked up"""
+    assert await openai_utils.sync_vector_store(db_session, test_user) == "vs_1"
+    documents = []
+    for name in ("early", "late"):
+        path = tmp_path / f"{name}.txt"
+        path.write_bytes(name.encode())
+        document = Document(
+            title=name, filename=path.name, storage_path=str(path), file_size=path.stat().st_size,
+            uploader_id=test_user.id, ingestion_status="ready", openai_file_id=f"file_{name}",
+        )
+        db_session.add(document)
+        documents.append(document)
+    await db_session.flush()
+    base = await db_session.scalar(select(func.coalesce(func.max(VectorStoreSyncOp.id), 0)))
+
+    # Op base+2 commits first and is applied; op base+1 commits afterwards
+    db_session.add(VectorStoreSyncOp(id=base + 2, user_id=test_user.id, document_id=documents[0].id, operation="add"))
+    await db_session.commit()
+    fake_vector_stores.calls.clear()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == ["attach:file_early"]
+
+    db_session.add(VectorStoreSyncOp(id=base + 1, user_id=test_user.id, document_id=documents[1].id, operation="add"))
+    await db_session.commit()
+    fake_vector_stores.calls.clear()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == ["attach:file_late"]
+
+    # Once the ops settle the watermark moves past both without replaying them
+    await db_session.execute(
+        update(VectorStoreSyncOp).values(created_at=datetime.now(timezone.utc) - timedelta(hours=1))
+    )
+    await db_session.commit()
+    fake_vector_stores.calls.clear()
+    await openai_utils.sync_vector_store(db_session, test_user)
+    assert fake_vector_stores.calls == []
+    state = await db_session.get(VectorStoreSyncState, test_user.id, populate_existing=True)
+    assert (state.last_op_id, state.applied_op_ids) == (base + 2, [])
+
+
+@pytest.mark.asyncio
+async def test_reconcile_requires_admin(async_client: AsyncClient, test_token: str):
+    """Full reconcile is an admin-only maintenance operation"""
+    response = await async_client.post(
+        "/api/v1/documents/vector-store/reconcile",
+        headers={"Authorization": f"Bearer {test_token}"},
+    )
+    assert response.status_code == 403